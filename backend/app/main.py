@@ -1,7 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from .routers import chat, games, websocket
+from .routers.sse import sse_encoder, sse_replay
+from .services.provider_registry import registry
+from .services.response_cache import response_cache
+from .services.single_flight import single_flight
+from .services.hedging import hedger
+from .services.admission import Overloaded, admission
+from .services.resilience import resilience
+from .services.metrics import metrics
+from .services.session_db import session_db
 
 load_dotenv()
 
@@ -19,10 +29,75 @@ app.include_router(chat.router)
 app.include_router(games.router)
 app.include_router(websocket.router)
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """프로바이더 대기열이 가득 찬 경우 타임아웃을 기다리지 않고 즉시 503 응답"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "provider": exc.provider},
+        headers={"Retry-After": str(max(int(exc.retry_after), 1))}
+    )
+
 @app.get("/")
 async def root():
     return {"message": "AI Chat Service API"}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    # 서킷이 열린 프로바이더가 있으면 degraded
+    breakers = resilience.health()
+    status = "healthy" if all(state == "closed" for state in breakers.values()) else "degraded"
+    return {"status": status, "providers": breakers}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 텍스트 형식 지표 (TTFT, 토큰 간 지연, 토큰 수, 오류, 활성 스트림 등)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/stats")
+async def get_stats():
+    """내부 컴포넌트 통계 (커넥션 풀, 응답 캐시, 사전 생성 풀 등)"""
+    return {
+        "providers": registry.stats(),
+        "response_cache": response_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "hedging": hedger.stats(),
+        "admission": admission.stats(),
+        "resilience": resilience.stats(),
+        "sse": sse_encoder.stats(),
+        "sse_replay": sse_replay.stats(),
+        "mystery_pool": games.mystery_service.pool.stats(),
+        "story_opening_pool": games.story_service.opening_pool.stats(),
+        "story_context": games.story_service.context_builder.stats(),
+        "story_sessions": games.story_service.story_contexts.stats(),
+        "mystery_sessions": games.mystery_service.mystery_contexts.stats(),
+        "session_db": session_db.stats() if session_db is not None else None,
+        "ws_backplane": websocket.manager.backplane.stats(),
+        "websocket": websocket.manager.stats()
+    }
+
+@app.on_event("startup")
+async def startup():
+    # 백그라운드에서 추리 사건 / 스토리 오프닝 풀 채우기 시작
+    games.mystery_service.pool.start(games.mystery_service.pool_prewarm_keys)
+    games.story_service.opening_pool.start(games.story_service.opening_pool_prewarm_keys)
+    # 유휴 게임 세션 정리
+    games.story_service.story_contexts.start()
+    games.mystery_service.mystery_contexts.start()
+    if session_db is not None:
+        session_db.start()
+    # 다른 워커가 발행한 방 메시지 수신
+    websocket.manager.backplane.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await games.mystery_service.pool.stop()
+    await games.story_service.opening_pool.stop()
+    await games.story_service.story_contexts.stop()
+    await games.mystery_service.mystery_contexts.stop()
+    await websocket.manager.stop()
+    await websocket.manager.backplane.stop()
+    if session_db is not None:
+        # 남은 세션 변경을 기록한 뒤 종료
+        await session_db.stop()
+    await registry.aclose()
@@ -1,31 +1,36 @@
-from fastapi import APIRouter, HTTPException, Query, Form
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Query, Form, Header
 from ..models import ChatRequest, ChatMessage
-from ..services.ai_service import AIService
+from ..services.ai_service import ai_service
+from ..services.admission import Overloaded
+from ..services.resilience import request_deadline
+from .sse import resume_response, sse_response
 import json
 from typing import List, Optional
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
 @router.post("/stream")
-async def stream_chat(request: ChatRequest):
+async def stream_chat(request: ChatRequest, last_event_id: Optional[str] = Header(None)):
+    if last_event_id:
+        # 끊긴 스트림 재연결: 새 프로바이더 호출 없이 버퍼에서 이어받음
+        return resume_response(last_event_id, route="chat")
     try:
-        ai_service = AIService()
-        def generate():
-            for chunk in ai_service.stream_chat(request.message, request.history, request.model):
-                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-            yield f"data: {json.dumps({'done': True})}\n\n"
+        # 요청 마감 시각은 라우터에서 정해 프로바이더 호출까지 전달
+        deadline = request_deadline()
         
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "*"
-            }
-        )
+        async def generate():
+            try:
+                async for chunk in ai_service.stream_chat(request.message, request.history, request.model, route="chat", deadline=deadline):
+                    yield {'chunk': chunk}
+                yield {'done': True}
+            except Overloaded as e:
+                # 대기열이 가득 차면 즉시 과부하 이벤트 전송
+                yield {'error': str(e), 'overloaded': True, 'retry_after': e.retry_after}
+            except Exception as e:
+                # 차단/시간 초과 등은 응답 본문이 아닌 error 이벤트로 전송
+                yield {'error': str(e)}
+        
+        return sse_response(generate(), route="chat", resumable=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -33,9 +38,14 @@ async def stream_chat(request: ChatRequest):
 async def stream_chat_get(
     message: str = Query(...),
     history: str = Query("[]"),
-    model: str = Query("openai-gpt3.5")
+    model: str = Query("openai-gpt3.5"),
+    last_event_id: Optional[str] = Header(None)
 ):
+    if last_event_id:
+        # EventSource는 자동 재연결 시 마지막 id를 Last-Event-ID 헤더로 보냄
+        return resume_response(last_event_id, route="chat")
     try:
+        deadline = request_deadline()
         print(f"Received message: {message}")
         print(f"Received history: {history}")
         print(f"Selected model: {model}")
@@ -46,31 +56,20 @@ async def stream_chat_get(
             history_data = json.loads(history)
             history_list = [ChatMessage(**item) for item in history_data]
         
-        print("Creating AI service...")
-        ai_service = AIService()
-        print("AI service created successfully")
-        
-        def generate():
+        async def generate():
             try:
                 print("Starting stream generation...")
-                for chunk in ai_service.stream_chat(message, history_list, model):
-                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-                yield f"data: {json.dumps({'done': True})}\n\n"
+                async for chunk in ai_service.stream_chat(message, history_list, model, route="chat", deadline=deadline):
+                    yield {'chunk': chunk}
+                yield {'done': True}
                 print("Stream generation completed")
+            except Overloaded as e:
+                yield {'error': str(e), 'overloaded': True, 'retry_after': e.retry_after}
             except Exception as gen_error:
                 print(f"Error in generate: {str(gen_error)}")
-                yield f"data: {json.dumps({'error': str(gen_error)})}\n\n"
+                yield {'error': str(gen_error)}
         
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "*"
-            }
-        )
+        return sse_response(generate(), route="chat", resumable=True)
     except Exception as e:
         print(f"Error in stream_chat_get: {str(e)}")
         import traceback
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
 from typing import Optional
 import json
 import uuid
 from ..services.story_game_service import StoryGameService
 from ..services.mystery_game_service import MysteryGameService
+from ..services.admission import Overloaded
+from ..services.resilience import request_deadline
+from .sse import resume_response, sse_response
 
 router = APIRouter(prefix="/api/games", tags=["games"])
 
@@ -41,9 +43,14 @@ class MakeAccusationRequest(BaseModel):
 async def start_story(request: StartStoryRequest):
     """새로운 스토리 어드벤처 시작"""
     try:
+        # 요청 마감 시각은 라우터에서 정해 프로바이더 호출까지 전달
+        deadline = request_deadline()
         session_id = str(uuid.uuid4())
-        result = story_service.start_new_story(session_id, request.genre, request.model)
+        result = await story_service.start_new_story(session_id, request.genre, request.model, deadline=deadline)
         return result
+    except Overloaded:
+        # main.py의 예외 핸들러가 503 + Retry-After로 응답
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -51,26 +58,21 @@ async def start_story(request: StartStoryRequest):
 async def start_story_stream(request: StartStoryRequest):
     """새로운 스토리 어드벤처 시작 (스트리밍)"""
     try:
+        deadline = request_deadline()
         session_id = str(uuid.uuid4())
         
-        def generate():
+        async def generate():
             try:
-                for chunk in story_service.start_new_story_stream(session_id, request.genre, request.model):
-                    yield f"data: {json.dumps({'chunk': chunk, 'session_id': session_id})}\n\n"
-                yield f"data: {json.dumps({'done': True, 'session_id': session_id})}\n\n"
+                async for chunk in story_service.start_new_story_stream(session_id, request.genre, request.model, deadline=deadline):
+                    yield {'chunk': chunk, 'session_id': session_id}
+                yield {'done': True, 'session_id': session_id}
+            except Overloaded as e:
+                # 대기열이 가득 차면 즉시 과부하 이벤트 전송
+                yield {'error': str(e), 'overloaded': True, 'retry_after': e.retry_after}
             except Exception as e:
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                yield {'error': str(e)}
         
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "*"
-            }
-        )
+        return sse_response(generate(), route="story.start")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -78,41 +80,48 @@ async def start_story_stream(request: StartStoryRequest):
 async def continue_story(request: ContinueStoryRequest):
     """스토리 진행"""
     try:
-        result = story_service.continue_story(
+        deadline = request_deadline()
+        result = await story_service.continue_story(
             request.session_id, 
             request.choice, 
-            request.custom_action
+            request.custom_action,
+            deadline=deadline
         )
         return result
+    except Overloaded:
+        # main.py의 예외 핸들러가 503 + Retry-After로 응답
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/story/continue/stream")
-async def continue_story_stream(request: ContinueStoryRequest):
-    """스토리 진행 (스트리밍)"""
+async def continue_story_stream(request: ContinueStoryRequest, last_event_id: Optional[str] = Header(None)):
+    """스토리 진행 (스트리밍)
+
+    Last-Event-ID로 재연결하면 이미 story_history에 반영된 턴을 다시 생성하지 않고 버퍼에서 이어받습니다.
+    """
+    if last_event_id:
+        return resume_response(last_event_id, route="story.continue")
     try:
-        def generate():
+        deadline = request_deadline()
+        
+        async def generate():
             try:
-                for chunk in story_service.continue_story_stream(
+                async for chunk in story_service.continue_story_stream(
                     request.session_id, 
                     request.choice, 
-                    request.custom_action
+                    request.custom_action,
+                    deadline=deadline
                 ):
-                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-                yield f"data: {json.dumps({'done': True})}\n\n"
+                    yield {'chunk': chunk}
+                yield {'done': True}
+            except Overloaded as e:
+                # 대기열이 가득 차면 즉시 과부하 이벤트 전송
+                yield {'error': str(e), 'overloaded': True, 'retry_after': e.retry_after}
             except Exception as e:
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                yield {'error': str(e)}
         
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "*"
-            }
-        )
+        return sse_response(generate(), route="story.continue", resumable=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -120,7 +129,7 @@ async def continue_story_stream(request: ContinueStoryRequest):
 async def get_story_summary(session_id: str):
     """스토리 요약 조회"""
     try:
-        result = story_service.get_story_summary(session_id)
+        result = await story_service.get_story_summary(session_id)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -130,9 +139,34 @@ async def get_story_summary(session_id: str):
 async def create_mystery(request: CreateMysteryRequest):
     """새로운 추리 게임 생성"""
     try:
+        deadline = request_deadline()
         session_id = str(uuid.uuid4())
-        result = mystery_service.create_new_mystery(session_id, request.difficulty, request.model)
+        result = await mystery_service.create_new_mystery(session_id, request.difficulty, request.model, deadline=deadline)
         return result
+    except Overloaded:
+        # main.py의 예외 핸들러가 503 + Retry-After로 응답
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/mystery/create/stream")
+async def create_mystery_stream(request: CreateMysteryRequest):
+    """새로운 추리 게임 생성 (스트리밍: 사건 정보와 용의자를 완성되는 대로 전송)"""
+    try:
+        deadline = request_deadline()
+        session_id = str(uuid.uuid4())
+        
+        async def generate():
+            try:
+                async for event in mystery_service.create_new_mystery_stream(session_id, request.difficulty, request.model, deadline=deadline):
+                    yield {**event, 'session_id': session_id}
+            except Overloaded as e:
+                # 대기열이 가득 차면 즉시 과부하 이벤트 전송
+                yield {'error': str(e), 'overloaded': True, 'retry_after': e.retry_after}
+            except Exception as e:
+                yield {'error': str(e)}
+        
+        return sse_response(generate(), route="mystery.create")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -140,8 +174,12 @@ async def create_mystery(request: CreateMysteryRequest):
 async def ask_question(request: AskQuestionRequest):
     """추리 게임에서 질문하기"""
     try:
-        result = mystery_service.ask_question(request.session_id, request.question)
+        deadline = request_deadline()
+        result = await mystery_service.ask_question(request.session_id, request.question, deadline=deadline)
         return result
+    except Overloaded:
+        # main.py의 예외 핸들러가 503 + Retry-After로 응답
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -149,24 +187,20 @@ async def ask_question(request: AskQuestionRequest):
 async def ask_question_stream(request: AskQuestionRequest):
     """추리 게임에서 질문하기 (스트리밍)"""
     try:
-        def generate():
+        deadline = request_deadline()
+        
+        async def generate():
             try:
-                for chunk in mystery_service.ask_question_stream(request.session_id, request.question):
-                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-                yield f"data: {json.dumps({'done': True})}\n\n"
+                async for chunk in mystery_service.ask_question_stream(request.session_id, request.question, deadline=deadline):
+                    yield {'chunk': chunk}
+                yield {'done': True}
+            except Overloaded as e:
+                # 대기열이 가득 차면 즉시 과부하 이벤트 전송
+                yield {'error': str(e), 'overloaded': True, 'retry_after': e.retry_after}
             except Exception as e:
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                yield {'error': str(e)}
         
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "*"
-            }
-        )
+        return sse_response(generate(), route="mystery.question")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -174,7 +208,7 @@ async def ask_question_stream(request: AskQuestionRequest):
 async def make_accusation(request: MakeAccusationRequest):
     """범인 지목하기"""
     try:
-        result = mystery_service.make_accusation(
+        result = await mystery_service.make_accusation(
             request.session_id, 
             request.accused_name, 
             request.reasoning
@@ -187,7 +221,7 @@ async def make_accusation(request: MakeAccusationRequest):
 async def get_mystery_status(session_id: str):
     """추리 게임 상태 조회"""
     try:
-        result = mystery_service.get_game_status(session_id)
+        result = await mystery_service.get_game_status(session_id)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
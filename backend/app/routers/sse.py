@@ -0,0 +1,416 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, AsyncGenerator, AsyncIterator, Deque, Dict, Optional, Tuple
+from fastapi.responses import StreamingResponse
+from ..services.metrics import (
+    SSE_ACTIVE, SSE_BYTES, SSE_DELTAS, SSE_FRAMES, SSE_STREAMS,
+    SSE_REPLAY_BYTES, SSE_REPLAY_EVICTIONS, SSE_RESUMES,
+)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "*"
+}
+
+
+# 인코더 내부 큐에서 업스트림 종료와 flush 시각 도달을 알리는 표식
+_END = object()
+_FLUSH = object()
+
+
+class SSEEncoder:
+    """generate()가 내보내는 이벤트 딕셔너리를 SSE 프레임으로 인코딩
+
+    연속된 {'chunk': ...} 이벤트(나머지 키가 같은 것)는 flush_interval 또는 flush_bytes까지 모아
+    한 프레임으로 보냅니다. 첫 청크는 TTFT가 늘지 않도록 항상 바로 보냅니다.
+    """
+
+    def __init__(self, flush_interval: float = 0.02, flush_bytes: int = 512):
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.started_at = time.monotonic()
+        self.frames = 0
+        self.bytes = 0
+        self.deltas = 0
+
+    @classmethod
+    def from_env(cls) -> "SSEEncoder":
+        return cls(
+            flush_interval=float(os.getenv("SSE_FLUSH_INTERVAL_MS", "20")) / 1000,
+            flush_bytes=int(os.getenv("SSE_FLUSH_BYTES", "512")),
+        )
+
+    async def encode(self, events: AsyncIterator[Dict[str, Any]], route: str) -> AsyncIterator[str]:
+        frames_metric = SSE_FRAMES.labels(route)
+        bytes_metric = SSE_BYTES.labels(route)
+        deltas_metric = SSE_DELTAS.labels(route)
+
+        def frame(payload: Dict[str, Any]) -> str:
+            data = f"data: {json.dumps(payload)}\n\n"
+            self.frames += 1
+            self.bytes += len(data)
+            frames_metric.inc()
+            bytes_metric.inc(len(data))
+            return data
+
+        # 업스트림은 스트림당 태스크 하나가 큐로 옮기고, flush 시각은 call_later 타이머가 큐에 알림
+        iterator = events.__aiter__()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+        failure: Optional[BaseException] = None
+
+        async def pump():
+            nonlocal failure
+            try:
+                async for event in iterator:
+                    await queue.put(event)
+            except Exception as e:
+                failure = e
+            await queue.put(_END)
+
+        def request_flush():
+            nonlocal timer
+            timer = None
+            try:
+                queue.put_nowait(_FLUSH)
+            except asyncio.QueueFull:
+                # 큐가 차 있으면 소비자가 다음 이벤트를 꺼낼 때 flush 시각을 확인함
+                pass
+
+        loop = asyncio.get_running_loop()
+        reader = asyncio.ensure_future(pump())
+        timer: Optional[asyncio.TimerHandle] = None
+        # 모으는 중인 청크: (나머지 키, 텍스트 조각들, 바이트 수, 첫 조각 시각)
+        buffered_rest: Optional[Dict[str, Any]] = None
+        buffered_parts = []
+        buffered_size = 0
+        buffered_at = 0.0
+        first_chunk = True
+
+        def flush_buffer() -> str:
+            nonlocal buffered_rest, buffered_parts, buffered_size, timer
+            if timer is not None:
+                timer.cancel()
+                timer = None
+            payload = {"chunk": "".join(buffered_parts), **buffered_rest}
+            buffered_rest, buffered_parts, buffered_size = None, [], 0
+            return frame(payload)
+
+        try:
+            while True:
+                event = await queue.get()
+                if buffered_rest is not None and time.monotonic() - buffered_at >= self.flush_interval:
+                    yield flush_buffer()
+                if event is _FLUSH:
+                    # 이미 보낸 버퍼에 대한 늦은 알림은 무시
+                    continue
+                if event is _END:
+                    break
+
+                chunk = event.get("chunk") if isinstance(event, dict) else None
+                if not isinstance(chunk, str):
+                    if buffered_rest is not None:
+                        yield flush_buffer()
+                    yield frame(event)
+                    continue
+
+                self.deltas += 1
+                deltas_metric.inc()
+                rest = {key: value for key, value in event.items() if key != "chunk"}
+                if first_chunk:
+                    first_chunk = False
+                    yield frame(event)
+                    continue
+                if buffered_rest is not None and rest != buffered_rest:
+                    yield flush_buffer()
+                if buffered_rest is None:
+                    buffered_rest = rest
+                    buffered_at = time.monotonic()
+                    timer = loop.call_later(self.flush_interval, request_flush)
+                buffered_parts.append(chunk)
+                buffered_size += len(chunk.encode("utf-8"))
+                if buffered_size >= self.flush_bytes:
+                    yield flush_buffer()
+
+            if buffered_rest is not None:
+                yield flush_buffer()
+            if failure is not None:
+                raise failure
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if not reader.done():
+                reader.cancel()
+                # 취소가 끝나야 제너레이터를 닫을 수 있음
+                await asyncio.wait((reader,))
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "flush_interval_ms": round(self.flush_interval * 1000, 1),
+            "flush_bytes": self.flush_bytes,
+            "frames": self.frames,
+            "deltas": self.deltas,
+            "frames_per_sec": round(self.frames / elapsed, 3) if elapsed > 0 else 0.0,
+            "bytes_per_frame": round(self.bytes / self.frames, 1) if self.frames else 0.0,
+            "deltas_per_frame": round(self.deltas / self.frames, 2) if self.frames else 0.0,
+        }
+
+
+# 전역 SSEEncoder 인스턴스
+sse_encoder = SSEEncoder.from_env()
+
+
+class _ReplayBuffer:
+    """생성 하나의 SSE 프레임 링 버퍼 (id: "<stream_id>:<seq>")
+
+    생성은 응답과 분리된 태스크에서 버퍼로 쓰고, 응답(처음 연결과 재연결 모두)은 버퍼를 따라 읽습니다.
+    """
+
+    def __init__(self, stream_id: str, route: str, max_events: int):
+        self.stream_id = stream_id
+        self.route = route
+        self.max_events = max_events
+        self.frames: Deque[Tuple[int, str]] = deque()
+        self.next_seq = 1
+        self.size = 0
+        self.done = False
+        self.registered = True
+        self.finished_at = 0.0
+        self.followers = 0
+        self.task: Optional[asyncio.Task] = None
+        self.orphan_timer: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.Event()
+
+    def append(self, frame: str) -> int:
+        """프레임에 id를 붙여 보관하고 늘어난 바이트 수를 반환 (오래된 프레임은 밀려남)"""
+        seq = self.next_seq
+        self.next_seq += 1
+        data = f"id: {self.stream_id}:{seq}\n{frame}"
+        self.frames.append((seq, data))
+        delta = len(data)
+        while len(self.frames) > self.max_events:
+            delta -= len(self.frames.popleft()[1])
+        self.size += delta
+        self._notify()
+        return delta
+
+    def finish(self):
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    def _notify(self):
+        # 기다리는 모든 구독자를 깨우고 다음 변경용 이벤트로 교체
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self, after: int) -> AsyncIterator[str]:
+        """seq가 after보다 큰 프레임부터 생성이 끝날 때까지 전달"""
+        cursor = after + 1
+        while True:
+            changed = self._changed
+            while cursor < self.next_seq:
+                if not self.frames or cursor < self.frames[0][0]:
+                    # 링 버퍼에서 이미 밀려난 구간은 이어 붙일 수 없음
+                    yield _plain_frame({'error': "연결이 끊긴 동안의 응답을 더 이상 이어받을 수 없습니다. 다시 요청해주세요.", 'resume_failed': True})
+                    return
+                yield self.frames[cursor - self.frames[0][0]][1]
+                cursor += 1
+            if self.done:
+                return
+            await changed.wait()
+
+
+def _plain_frame(payload: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+class SSEReplayRegistry:
+    """재연결(Last-Event-ID)로 이어받을 수 있도록 진행 중/완료된 생성의 버퍼를 보관
+
+    - 생성마다 최근 max_events개 프레임만 유지
+    - 완료된 버퍼는 ttl초 후 정리
+    - 전체 바이트가 max_bytes를 넘으면 완료된 버퍼부터, 그다음 오래된 진행 중 버퍼를 등록 해제
+      (등록 해제된 진행 중 버퍼는 이미 붙어 있는 연결에만 계속 전달)
+    - 붙어 있는 연결이 모두 끊긴 뒤 grace초 안에 재연결이 없으면 생성을 취소해 업스트림 스트림을 닫음
+    """
+
+    def __init__(self, max_events: int = 512, max_bytes: int = 8 * 1024 * 1024, ttl: float = 120.0, grace: float = 10.0):
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.grace = grace
+        self.cancelled = 0
+        self.buffers: "OrderedDict[str, _ReplayBuffer]" = OrderedDict()
+        self.total_bytes = 0
+        self.resumed: Dict[str, int] = {"live": 0, "replay": 0, "expired": 0}
+        self.evicted = {"ttl": 0, "memory": 0}
+        self._bytes_gauge = SSE_REPLAY_BYTES.labels()
+
+    @classmethod
+    def from_env(cls) -> "SSEReplayRegistry":
+        return cls(
+            max_events=int(os.getenv("SSE_REPLAY_MAX_EVENTS", "512")),
+            max_bytes=int(os.getenv("SSE_REPLAY_MAX_BYTES", str(8 * 1024 * 1024))),
+            ttl=float(os.getenv("SSE_REPLAY_TTL", "120")),
+            grace=float(os.getenv("SSE_RESUME_GRACE", "10")),
+        )
+
+    def start(self, frames: AsyncGenerator[str, None], route: str) -> _ReplayBuffer:
+        """인코딩된 프레임 스트림을 백그라운드 태스크로 버퍼에 기록 시작"""
+        self._sweep()
+        buffer = _ReplayBuffer(uuid.uuid4().hex, route, self.max_events)
+        self.buffers[buffer.stream_id] = buffer
+        buffer.task = asyncio.ensure_future(self._produce(buffer, frames))
+        return buffer
+
+    async def _produce(self, buffer: _ReplayBuffer, frames: AsyncGenerator[str, None]):
+        try:
+            async for frame in frames:
+                self._account(buffer, buffer.append(frame))
+        except asyncio.CancelledError:
+            # 재연결 없이 버려진 생성: 늦게 다시 붙는 클라이언트가 잘린 응답임을 알 수 있게 표시
+            self._account(buffer, buffer.append(_plain_frame({'error': "연결이 끊겨 응답 생성을 중단했습니다.", 'truncated': True})))
+            raise
+        except Exception as e:
+            print(f"[sse] {buffer.route} stream {buffer.stream_id} failed: {e}")
+            self._account(buffer, buffer.append(_plain_frame({'error': str(e)})))
+        finally:
+            buffer.finish()
+            await frames.aclose()
+
+    async def subscribe(self, buffer: _ReplayBuffer, after: int) -> AsyncIterator[str]:
+        """버퍼를 따라 읽는 응답 하나 (마지막 연결이 끊기면 grace 후 생성 취소 예약)"""
+        buffer.followers += 1
+        if buffer.orphan_timer is not None:
+            buffer.orphan_timer.cancel()
+            buffer.orphan_timer = None
+        frames = buffer.follow(after)
+        try:
+            async for frame in frames:
+                yield frame
+        finally:
+            buffer.followers -= 1
+            await frames.aclose()
+            if buffer.followers == 0 and not buffer.done:
+                buffer.orphan_timer = asyncio.get_running_loop().call_later(self.grace, self._cancel_orphan, buffer)
+
+    def _cancel_orphan(self, buffer: _ReplayBuffer):
+        buffer.orphan_timer = None
+        if buffer.followers == 0 and not buffer.done and buffer.task is not None:
+            self.cancelled += 1
+            print(f"[sse] {buffer.route} stream {buffer.stream_id} abandoned, cancelling generation")
+            buffer.task.cancel()
+
+    def _account(self, buffer: _ReplayBuffer, delta: int):
+        if not buffer.registered:
+            return
+        self.total_bytes += delta
+        self._enforce_budget()
+        self._bytes_gauge.set(self.total_bytes)
+
+    def _unregister(self, buffer: _ReplayBuffer, reason: str):
+        self.buffers.pop(buffer.stream_id, None)
+        buffer.registered = False
+        self.total_bytes -= buffer.size
+        self.evicted[reason] += 1
+        SSE_REPLAY_EVICTIONS.labels(reason).inc()
+
+    def _sweep(self):
+        now = time.monotonic()
+        for buffer in [b for b in self.buffers.values() if b.done and now - b.finished_at > self.ttl]:
+            self._unregister(buffer, "ttl")
+        self._bytes_gauge.set(self.total_bytes)
+
+    def _enforce_budget(self):
+        while self.total_bytes > self.max_bytes and self.buffers:
+            # 생성 순서대로 보관하므로 앞쪽이 가장 오래된 버퍼
+            victim = next((b for b in self.buffers.values() if b.done), None)
+            if victim is None:
+                victim = next(iter(self.buffers.values()))
+            self._unregister(victim, "memory")
+
+    def resume(self, last_event_id: str, route: str) -> Optional[AsyncIterator[str]]:
+        """Last-Event-ID 다음 프레임부터 이어받기 (이어받을 버퍼가 없으면 None)"""
+        self._sweep()
+        stream_id, _, seq = last_event_id.strip().partition(":")
+        buffer = self.buffers.get(stream_id)
+        if buffer is None or buffer.route != route or not seq.isdigit():
+            self.resumed["expired"] += 1
+            SSE_RESUMES.labels(route, "expired").inc()
+            return None
+        outcome = "replay" if buffer.done else "live"
+        self.resumed[outcome] += 1
+        SSE_RESUMES.labels(route, outcome).inc()
+        return self.subscribe(buffer, int(seq))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffers": len(self.buffers),
+            "live": sum(1 for b in self.buffers.values() if not b.done),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "grace": self.grace,
+            "cancelled": self.cancelled,
+            "resumed": dict(self.resumed),
+            "evicted": dict(self.evicted),
+        }
+
+
+# 전역 SSEReplayRegistry 인스턴스
+sse_replay = SSEReplayRegistry.from_env()
+
+
+async def _tracked(frames: AsyncGenerator[str, None], route: str) -> AsyncIterator[str]:
+    """열린 SSE 응답 수를 route별로 집계"""
+    active = SSE_ACTIVE.labels(route)
+    SSE_STREAMS.labels(route).inc()
+    active.inc()
+    try:
+        async for frame in frames:
+            yield frame
+    finally:
+        active.dec()
+        await frames.aclose()
+
+
+def _streaming(frames: AsyncGenerator[str, None], route: str) -> StreamingResponse:
+    return StreamingResponse(
+        _tracked(frames, route),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]], route: str, resumable: bool = False) -> StreamingResponse:
+    """generate()가 만든 이벤트를 SSE 프레임으로 묶고 공통 헤더와 지표 집계를 붙여 응답으로 반환
+
+    resumable이 아니면 연결이 끊길 때 응답 제너레이터가 닫히면서 업스트림 스트림도 바로 닫힙니다.
+    resumable이면 프레임에 id를 붙여 버퍼에 보관하고, 재연결을 기다리는 grace 동안만 생성을 이어갑니다.
+    """
+    frames = sse_encoder.encode(events, route)
+    if resumable:
+        frames = sse_replay.subscribe(sse_replay.start(frames, route), 0)
+    return _streaming(frames, route)
+
+
+def resume_response(last_event_id: str, route: str) -> StreamingResponse:
+    """Last-Event-ID 재연결 응답: 진행 중이면 이어서 따라가고, 끝났으면 남은 프레임을 재전송
+
+    버퍼가 없으면 새 생성을 시작하지 않고 resume_failed 이벤트만 보냅니다 (스토리가 두 번 진행되지 않도록).
+    """
+    frames = sse_replay.resume(last_event_id, route)
+    if frames is None:
+        async def expired():
+            yield _plain_frame({'error': "이어받을 응답이 만료되었습니다. 다시 요청해주세요.", 'resume_failed': True})
+        frames = expired()
+    return _streaming(frames, route)
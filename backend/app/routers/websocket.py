@@ -22,7 +22,7 @@ async def websocket_endpoint(websocket: WebSocket, player_id: str):
             
             if message_type == 'create_room':
                 # 새 방 생성
-                room_id = manager.create_room(
+                room_id = await manager.create_room(
                     host_player_id=player_id,
                     player_name=message['player_name'],
                     game_settings=message['game_settings']
@@ -31,7 +31,7 @@ async def websocket_endpoint(websocket: WebSocket, player_id: str):
                 await manager.send_personal_message({
                     'type': 'room_created',
                     'room_id': room_id,
-                    'room_info': manager.get_room_info(room_id)
+                    'room_info': await manager.get_room_info(room_id)
                 }, player_id)
                 
             elif message_type == 'join_room':
@@ -55,7 +55,7 @@ async def websocket_endpoint(websocket: WebSocket, player_id: str):
                     
             elif message_type == 'start_game':
                 # 게임 시작
-                room_id = manager.get_player_room(player_id)
+                room_id = await manager.get_player_room(player_id)
                 if room_id:
                     result = await manager.start_game(player_id, room_id)
                     
@@ -67,7 +67,7 @@ async def websocket_endpoint(websocket: WebSocket, player_id: str):
                         
             elif message_type == 'submit_turn':
                 # 턴 제출
-                room_id = manager.get_player_room(player_id)
+                room_id = await manager.get_player_room(player_id)
                 if room_id:
                     result = await manager.submit_turn(
                         player_id=player_id,
@@ -83,27 +83,32 @@ async def websocket_endpoint(websocket: WebSocket, player_id: str):
                         
             elif message_type == 'leave_room':
                 # 방 나가기
-                room_id = manager.get_player_room(player_id)
+                room_id = await manager.get_player_room(player_id)
                 if room_id:
-                    manager.leave_room(player_id, room_id)
+                    event = await manager.leave_room(player_id, room_id)
                     
                     # 방의 다른 플레이어들에게 알림
-                    await manager.send_room_message({
-                        'type': 'player_left',
-                        'player_id': player_id,
-                        'room_info': manager.get_room_info(room_id)
-                    }, room_id)
+                    if event is not None:
+                        await manager.send_room_message(event, room_id)
                     
             elif message_type == 'get_room_info':
                 # 방 정보 조회
-                room_id = manager.get_player_room(player_id)
+                room_id = await manager.get_player_room(player_id)
                 if room_id:
-                    room_info = manager.get_room_info(room_id)
+                    room_info = await manager.get_room_info(room_id)
                     await manager.send_personal_message({
                         'type': 'room_info',
                         'room_info': room_info
                     }, player_id)
                     
+            elif message_type == 'sync_room':
+                # seq 공백을 발견한 클라이언트에게 since 이후 스냅샷 전송
+                room_id = await manager.get_player_room(player_id)
+                if room_id:
+                    snapshot = await manager.get_room_snapshot(room_id, int(message.get('since', 0)))
+                    if snapshot is not None:
+                        await manager.send_personal_message(snapshot, player_id)
+                    
             elif message_type == 'heartbeat':
                 # 연결 상태 확인
                 await manager.send_personal_message({
@@ -112,38 +117,41 @@ async def websocket_endpoint(websocket: WebSocket, player_id: str):
                 }, player_id)
                 
     except WebSocketDisconnect:
-        manager.disconnect(player_id)
-        
-        # 방의 다른 플레이어들에게 연결 해제 알림
-        room_id = manager.get_player_room(player_id)
-        if room_id:
-            await manager.send_room_message({
-                'type': 'player_disconnected',
-                'player_id': player_id,
-                'room_info': manager.get_room_info(room_id)
-            }, room_id)
+        # 방의 다른 플레이어들에게 연결 해제 알림(player_disconnected)은 disconnect에서 전송
+        manager.disconnect(player_id, websocket)
     except Exception as e:
         print(f"WebSocket error for player {player_id}: {e}")
-        manager.disconnect(player_id)
+        manager.disconnect(player_id, websocket)
 
 
 @router.get("/ws/rooms")
 async def get_active_rooms():
     """활성 방 목록 조회 (디버깅용)"""
+    rooms = await manager.get_rooms()
     return {
         'active_connections': len(manager.active_connections),
-        'active_rooms': len(manager.rooms),
+        'active_rooms': len(rooms),
         'rooms': {
             room_id: {
                 'player_count': len(room['players']),
                 'game_state': room['game_state'],
-                'created_at': room['created_at']
+                'created_at': room['created_at'],
+                'broadcast_latency': manager.get_broadcast_latency(room_id)
             }
-            for room_id, room in manager.rooms.items()
+            for room_id, room in rooms.items()
         }
     }
 
 
+@router.get("/ws/connections")
+async def get_connection_queues():
+    """연결별 전송 큐 깊이와 버린 메시지 수 (디버깅용)"""
+    return {
+        'summary': manager.stats(),
+        'connections': manager.get_connection_stats()
+    }
+
+
 @router.get("/ws/test")
 async def get_websocket_test_page():
     """WebSocket 테스트 페이지"""
@@ -0,0 +1,242 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .provider_registry import ProviderError, provider_for
+from .metrics import QUEUE_WAIT_SECONDS
+
+# 숫자가 작을수록 먼저 처리
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class Overloaded(ProviderError):
+    """프로바이더 대기열이 가득 차거나 대기 시간이 초과되어 요청을 받지 않음"""
+
+    def __init__(self, provider: str, retry_after: float = 1.0):
+        super().__init__("요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해주세요.")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """초당 rate개씩 채워지고 최대 burst개까지 쌓이는 토큰 버킷"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        if self.rate <= 0:
+            # rate가 0 이하이면 속도 제한 없음
+            return True
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        """토큰 하나가 채워질 때까지 남은 시간"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max((1.0 - self.tokens) / self.rate, 0.0)
+
+
+class AdmissionController:
+    """프로바이더 하나에 대한 동시 실행 수 제한 + 토큰 버킷 + 우선순위 대기열
+
+    - 동시 실행이 max_concurrency에 도달하거나 토큰이 없으면 대기열에서 우선순위 순으로 대기
+    - 대기열이 max_queue개로 가득 차면 더 낮은 우선순위 대기자를 밀어내거나 즉시 Overloaded
+    - max_wait 이상 기다린 요청도 Overloaded로 빠르게 실패
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 8, rate: float = 0.0, burst: float = 8.0, max_queue: int = 32, max_wait: float = 10.0):
+        self.name = name
+        self.max_concurrency = max(max_concurrency, 1)
+        self.bucket = TokenBucket(rate, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self.active = 0
+        # (우선순위, 순번, future) 힙; 취소된 대기자는 꺼낼 때 건너뜀
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._waiting = 0
+        self._counter = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.timed_out = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self._queue_waits: Deque[float] = deque(maxlen=500)
+        self._queue_wait_metric = QUEUE_WAIT_SECONDS.labels(name)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+        """실행 슬롯을 얻은 동안만 블록 안의 프로바이더 호출을 수행 (timeout: 요청 마감까지 남은 시간)"""
+        await self._acquire(priority, self.max_wait if timeout is None else min(self.max_wait, timeout))
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._dispatch()
+
+    async def _acquire(self, priority: int, max_wait: float):
+        if self._waiting == 0 and self.active < self.max_concurrency and self.bucket.try_take():
+            self.active += 1
+            self.admitted += 1
+            self._record_wait(0.0)
+            return
+
+        if self._waiting >= self.max_queue and not self._evict_lower(priority):
+            self.rejected += 1
+            raise Overloaded(self.name, retry_after=self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self._waiting += 1
+        self.queued += 1
+        started = time.monotonic()
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self._waiting -= 1
+                self.timed_out += 1
+                raise Overloaded(self.name, retry_after=self._retry_after())
+            # 시간 초과와 동시에 슬롯을 받은 경우
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # 슬롯을 받은 직후 호출자가 취소되면 슬롯 반환
+                self.active -= 1
+                self._dispatch()
+            elif not future.done():
+                future.cancel()
+                self._waiting -= 1
+            raise
+
+        if future.cancelled():
+            raise asyncio.CancelledError()
+        future.result()
+        self.admitted += 1
+        self._record_wait(time.monotonic() - started)
+
+    def _evict_lower(self, priority: int) -> bool:
+        """대기열에서 새 요청보다 우선순위가 낮은 대기자 하나를 Overloaded로 밀어냄"""
+        candidates = [entry for entry in self._waiters if not entry[2].done() and entry[0] > priority]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        victim[2].set_exception(Overloaded(self.name, retry_after=self._retry_after()))
+        self._waiting -= 1
+        self.evicted += 1
+        return True
+
+    def _dispatch(self):
+        """빈 슬롯과 토큰이 있는 만큼 대기자를 우선순위 순으로 깨움"""
+        while self._waiters and self.active < self.max_concurrency:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self.bucket.try_take():
+                self._schedule_dispatch(self.bucket.wait_time())
+                return
+            heapq.heappop(self._waiters)
+            self._waiting -= 1
+            self.active += 1
+            future.set_result(None)
+
+    def _schedule_dispatch(self, delay: float):
+        if self._timer is not None and not self._timer.cancelled():
+            return
+
+        def run():
+            self._timer = None
+            self._dispatch()
+
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0.001), run)
+
+    def _record_wait(self, seconds: float):
+        self.queue_wait_total += seconds
+        self.queue_wait_max = max(self.queue_wait_max, seconds)
+        self._queue_waits.append(seconds)
+        self._queue_wait_metric.observe(seconds)
+
+    def _retry_after(self) -> float:
+        # 최근 대기 시간 기준으로 재시도 권장 시간 제시
+        if not self._queue_waits:
+            return 1.0
+        return round(max(sum(self._queue_waits) / len(self._queue_waits), 1.0), 1)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._queue_waits)
+        return {
+            "active": self.active,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rate": self.bucket.rate,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "timed_out": self.timed_out,
+            "queue_wait_avg": round(self.queue_wait_total / self.admitted, 4) if self.admitted else 0.0,
+            "queue_wait_p95": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)], 4) if waits else 0.0,
+            "queue_wait_max": round(self.queue_wait_max, 4),
+        }
+
+
+class AdmissionRegistry:
+    """프로바이더별 AdmissionController 모음 (AI_ADMISSION_<PROVIDER>_* 로 개별 설정 가능)"""
+
+    def __init__(self):
+        self.controllers: Dict[str, AdmissionController] = {}
+
+    @staticmethod
+    def _setting(provider: str, name: str, default: str) -> str:
+        return os.getenv(f"AI_ADMISSION_{provider.upper()}_{name}", os.getenv(f"AI_ADMISSION_{name}", default))
+
+    def controller(self, provider: str) -> AdmissionController:
+        if provider not in self.controllers:
+            self.controllers[provider] = AdmissionController(
+                provider,
+                max_concurrency=int(self._setting(provider, "MAX_CONCURRENCY", "8")),
+                rate=float(self._setting(provider, "RATE", "0")),
+                burst=float(self._setting(provider, "BURST", "8")),
+                max_queue=int(self._setting(provider, "MAX_QUEUE", "32")),
+                max_wait=float(self._setting(provider, "MAX_WAIT", "10")),
+            )
+        return self.controllers[provider]
+
+    def slot(self, model: str, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+        """모델이 속한 프로바이더의 실행 슬롯"""
+        return self.controller(provider_for(model)).slot(priority, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {provider: controller.stats() for provider, controller in self.controllers.items()}
+
+
+# 전역 AdmissionRegistry 인스턴스
+admission = AdmissionRegistry()
@@ -1,30 +1,87 @@
-import os
+import json
+import time
+import asyncio
 import httpx
-from openai import OpenAI
-from anthropic import Anthropic
-from typing import Generator, List
+from typing import AsyncGenerator, Dict, List, Optional
 from ..models import ChatMessage
-from dotenv import load_dotenv
+from .provider_registry import ProviderError, ProviderNotConfigured, ProviderRegistry, provider_for, registry
+from .sse_parser import SSEDecoder
+from .response_cache import request_key
+from .single_flight import SingleFlight, single_flight
+from .story_context import estimate_tokens
+from .hedging import Hedger, hedger as hedger_instance
+from .admission import PRIORITY_INTERACTIVE, AdmissionRegistry, Overloaded, admission as admission_registry
+from .resilience import Deadline, Resilience, request_deadline, resilience as resilience_instance
+from .metrics import (
+    ACTIVE_STREAMS, ERRORS, INTER_TOKEN_SECONDS, OUTPUT_TOKENS_PER_SECOND, OUTPUT_TOKENS_SAVED,
+    STREAM_CANCELLATIONS, STREAM_DURATION_SECONDS, TTFT_SECONDS, model_label, record_token_usage,
+)
+
+def record_usage(usage: Optional[Dict[str, int]], input_tokens: int = 0, output_tokens: int = 0, cache_read_tokens: int = 0, cache_write_tokens: int = 0):
+    """호출자가 넘긴 usage 딕셔너리에 토큰 사용량을 누적"""
+    if usage is None:
+        return
+    usage["input_tokens"] = usage.get("input_tokens", 0) + (input_tokens or 0)
+    usage["output_tokens"] = usage.get("output_tokens", 0) + (output_tokens or 0)
+    usage["cache_read_tokens"] = usage.get("cache_read_tokens", 0) + (cache_read_tokens or 0)
+    usage["cache_write_tokens"] = usage.get("cache_write_tokens", 0) + (cache_write_tokens or 0)
+
+
+def record_openai_usage(usage: Optional[Dict[str, int]], openai_usage) -> None:
+    if openai_usage is None:
+        return
+    details = getattr(openai_usage, "prompt_tokens_details", None)
+    record_usage(
+        usage,
+        input_tokens=openai_usage.prompt_tokens,
+        output_tokens=openai_usage.completion_tokens,
+        cache_read_tokens=getattr(details, "cached_tokens", 0) if details else 0,
+    )
+
+
+def record_claude_usage(usage: Optional[Dict[str, int]], claude_usage) -> None:
+    if claude_usage is None:
+        return
+    record_usage(
+        usage,
+        input_tokens=claude_usage.input_tokens,
+        output_tokens=claude_usage.output_tokens,
+        cache_read_tokens=getattr(claude_usage, "cache_read_input_tokens", 0),
+        cache_write_tokens=getattr(claude_usage, "cache_creation_input_tokens", 0),
+    )
+
+
+def claude_system(system_content: str, cache_system: bool):
+    """Claude system 파라미터 (cache_system이면 프롬프트 캐시 브레이크포인트 지정)"""
+    if cache_system:
+        return [{"type": "text", "text": system_content, "cache_control": {"type": "ephemeral"}}]
+    return system_content
 
-# .env 파일 로드
-load_dotenv()
 
 class AIService:
-    def __init__(self):
-        # OpenAI 클라이언트
-        openai_key = os.getenv("OPENAI_API_KEY")
-        if openai_key:
-            self.openai_client = OpenAI(api_key=openai_key)
-        
-        # Anthropic 클라이언트
-        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-        if anthropic_key:
-            self.anthropic_client = Anthropic(api_key=anthropic_key)
-        
-        # DeepSeek API Key
-        self.deepseek_key = os.getenv("DEEPSEEK_API_KEY")
+    def __init__(self, providers: ProviderRegistry = None, flights: SingleFlight = None, hedger: Hedger = None, admission: AdmissionRegistry = None, resilience: Resilience = None):
+        # 프로세스 전역 커넥션 풀을 공유하는 프로바이더 레지스트리
+        self.providers = providers or registry
+        # 동일 요청 합치기 (single-flight)
+        self.flights = flights or single_flight
+        # 첫 토큰 지연 시 동급 모델로 헤지 요청
+        self.hedger = hedger or hedger_instance
+        # 프로바이더별 동시 실행/속도 제한과 우선순위 대기열
+        self.admission = admission or admission_registry
+        # 마감 시각 안의 지터 재시도와 프로바이더별 서킷 브레이커
+        self.resilience = resilience or resilience_instance
     
-    def stream_chat(self, message: str, history: List[ChatMessage] = [], model: str = "openai-gpt3.5", system_prompt: str = None) -> Generator[str, None, None]:
+    async def stream_chat(self, message: str, history: List[ChatMessage] = [], model: str = "openai-gpt3.5", system_prompt: str = None, cache_system: bool = False, usage: Optional[Dict[str, int]] = None, route: str = "default", hedge: Optional[bool] = None, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[Deadline] = None, max_tokens: int = 1000) -> AsyncGenerator[str, None]:
+        """cache_system: 고정된 system_prompt를 프로바이더 프롬프트 캐시 대상으로 지정
+        usage: 넘기면 토큰 사용량(캐시 적중 토큰 포함)을 누적해서 기록
+        route: 통계용 호출 경로 이름
+        hedge: 헤지 요청 사용 여부 (None이면 AI_HEDGE_ENABLED 설정을 따름)
+        priority: 프로바이더 대기열 우선순위 (PRIORITY_INTERACTIVE / PRIORITY_BACKGROUND)
+        대기열이 가득 차면 Overloaded를 그대로 발생시켜 호출자가 즉시 과부하 응답을 보낼 수 있게 함
+        차단(CircuitOpen)/시간 초과(DeadlineExceeded) 등 다른 실패도 청크가 아닌 예외로 발생 (라우터가 error 이벤트로 전송)
+        deadline: 라우터에서 만든 요청 마감 시각 (없으면 AI_REQUEST_DEADLINE 기준으로 생성)
+        max_tokens: 최대 출력 토큰 수 (긴 JSON 문서 생성 등에서 늘려 사용)
+        """
         messages = []
         
         # 시스템 프롬프트 추가
@@ -36,109 +93,222 @@ class AIService:
         
         messages.append({"role": "user", "content": message})
         
+        # 동일한 요청이 동시에 진행 중이면 업스트림 스트림 하나를 함께 사용
+        key = request_key(model, messages, cache_system=cache_system, max_tokens=max_tokens)
+        if deadline is None:
+            deadline = request_deadline()
+        if hedge is None:
+            hedge = self.hedger.enabled
+        
+        def upstream():
+            if hedge:
+                # 첫 토큰이 늦으면 동급 모델로 백업 요청을 보내 먼저 응답한 쪽을 사용
+                return self.hedger.stream(
+                    route, model,
+                    lambda candidate: self._stream_model(messages, candidate, cache_system, usage, priority, deadline, max_tokens),
+                    is_available=self.providers.has_provider,
+                )
+            return self._stream_model(messages, model, cache_system, usage, priority, deadline, max_tokens)
+        
+        # 토큰 루프에서는 미리 꺼낸 지표 child만 사용
+        label = model_label(model)
+        ttft = TTFT_SECONDS.labels(route, label)
+        inter_token = INTER_TOKEN_SECONDS.labels(route, label)
+        active = ACTIVE_STREAMS.labels(route)
+        output_before = usage.get("output_tokens", 0) if usage is not None else 0
+        started = time.monotonic()
+        first_at = last_at = 0.0
+        chunks = 0
+        
+        stream = self.flights.stream(key, upstream)
+        active.inc()
         try:
-            if model.startswith("openai-"):
-                yield from self._stream_openai(messages, model)
-            elif model.startswith("claude-"):
-                yield from self._stream_claude(messages, model)
-            elif model.startswith("deepseek-"):
-                yield from self._stream_deepseek(messages, model)
-            else:
-                yield "지원하지 않는 모델입니다."
-                
+            async for chunk in stream:
+                now = time.monotonic()
+                if chunks == 0:
+                    first_at = now
+                    ttft.observe(now - started)
+                else:
+                    inter_token.observe(now - last_at)
+                last_at = now
+                chunks += 1
+                yield chunk
+            
+            if chunks:
+                STREAM_DURATION_SECONDS.labels(route, label).observe(last_at - started)
+                # 요청을 합쳐 받은 구독자는 usage가 없으므로 청크 수로 근사
+                output_tokens = (usage.get("output_tokens", 0) - output_before) if usage is not None else 0
+                if last_at > first_at:
+                    OUTPUT_TOKENS_PER_SECOND.labels(route, label).observe((output_tokens or chunks) / (last_at - first_at))
+        except (GeneratorExit, asyncio.CancelledError):
+            # 클라이언트가 떠나 응답이 닫힘: 마지막 구독자였다면 아래 aclose로 업스트림 생성도 중단됨
+            STREAM_CANCELLATIONS.labels(route).inc()
+            generated = self.flights.sole_subscriber_output(key)
+            if generated is not None:
+                # 생성된 텍스트의 토큰 수를 추정해 max_tokens에서 뺀 값 (실제로 아낀 양의 상한)
+                OUTPUT_TOKENS_SAVED.labels(route, label).inc(max(max_tokens - estimate_tokens(generated), 0))
+            raise
+        except Overloaded:
+            raise
         except Exception as e:
-            error_msg = f"오류가 발생했습니다: {str(e)}"
-            print(f"Error in stream_chat: {error_msg}")
-            yield error_msg
+            # 오류 문구를 응답 청크로 내보내지 않음: 호출자가 스토리 기록 등에 저장하지 않도록 예외로 전달
+            print(f"Error in stream_chat: {e}")
+            raise
+        finally:
+            active.dec()
+            # GC를 기다리지 않고 바로 닫아 프로바이더 스트림을 즉시 정리
+            await stream.aclose()
     
-    def _stream_openai(self, messages: List[dict], model: str) -> Generator[str, None, None]:
-        if not hasattr(self, 'openai_client'):
-            yield "OpenAI API 키가 설정되지 않았습니다."
-            return
+    async def _stream_model(self, messages: List[dict], model: str, cache_system: bool = False, usage: Optional[Dict[str, int]] = None, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[Deadline] = None, max_tokens: int = 1000) -> AsyncGenerator[str, None]:
+        """모델 접두사에 따라 프로바이더별 스트리밍 호출 (실패 시 예외 발생)"""
+        # 프로바이더 호출 단위 토큰 사용량 (끝나면 지표와 호출자 usage에 반영)
+        call_usage: Dict[str, int] = {}
+        if model.startswith("openai-"):
+            factory = lambda: self._stream_openai(messages, model, call_usage, max_tokens)
+        elif model.startswith("claude-"):
+            factory = lambda: self._stream_claude(messages, model, cache_system, call_usage, max_tokens)
+        elif model.startswith("deepseek-"):
+            factory = lambda: self._stream_deepseek(messages, model, call_usage, max_tokens)
+        else:
+            raise ProviderError("지원하지 않는 모델입니다.")
+        
+        if deadline is None:
+            deadline = request_deadline()
+        # 차단 중인 프로바이더는 대기열에 넣지 않고 바로 실패
+        self.resilience.breaker(model).raise_if_open()
+        
+        provider = provider_for(model)
+        try:
+            # 스트림이 끝날 때까지 프로바이더 실행 슬롯을 점유
+            async with self.admission.slot(model, priority, deadline.remaining()):
+                async for chunk in self.resilience.stream(model, deadline, factory):
+                    yield chunk
+        except Exception as e:
+            ERRORS.labels(provider, model_label(model), type(e).__name__).inc()
+            raise
+        finally:
+            if call_usage:
+                record_token_usage(provider, model_label(model), call_usage)
+                record_usage(usage, **call_usage)
+    
+    async def _stream_openai(self, messages: List[dict], model: str, usage: Optional[Dict[str, int]] = None, max_tokens: int = 1000) -> AsyncGenerator[str, None]:
+        openai_client = self.providers.openai_client()
+        if openai_client is None:
+            raise ProviderNotConfigured("OpenAI API 키가 설정되지 않았습니다.")
             
         openai_model = "gpt-3.5-turbo" if "gpt3.5" in model else "gpt-4"
         
         print(f"Calling OpenAI {openai_model} with messages: {messages}")
-        response = self.openai_client.chat.completions.create(
+        response = await openai_client.chat.completions.create(
             model=openai_model,
             messages=messages,
             stream=True,
-            max_tokens=1000,
-            temperature=0.7
+            max_tokens=max_tokens,
+            temperature=0.7,
+            # 마지막 청크로 토큰 사용량(자동 프롬프트 캐시 적중 포함)을 받음
+            stream_options={"include_usage": True}
         )
         
-        for chunk in response:
-            if chunk.choices[0].delta.content is not None:
+        async for chunk in response:
+            if chunk.usage is not None:
+                record_openai_usage(usage, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content is not None:
                 yield chunk.choices[0].delta.content
     
-    def _stream_claude(self, messages: List[dict], model: str) -> Generator[str, None, None]:
-        if not hasattr(self, 'anthropic_client'):
-            yield "Claude API 키가 설정되지 않았습니다."
-            return
+    async def _stream_claude(self, messages: List[dict], model: str, cache_system: bool = False, usage: Optional[Dict[str, int]] = None, max_tokens: int = 1000) -> AsyncGenerator[str, None]:
+        anthropic_client = self.providers.anthropic_client()
+        if anthropic_client is None:
+            raise ProviderNotConfigured("Claude API 키가 설정되지 않았습니다.")
         
         # Claude는 system 메시지를 따로 처리
-        system_message = "당신은 도움이 되는 AI 어시스턴트입니다."
+        system_messages = [msg["content"] for msg in messages if msg["role"] == "system"]
+        system_message = system_messages[0] if system_messages else "당신은 도움이 되는 AI 어시스턴트입니다."
         user_messages = [msg for msg in messages if msg["role"] != "system"]
         
         print(f"Calling Claude with messages: {user_messages}")
         
-        with self.anthropic_client.messages.stream(
+        async with anthropic_client.messages.stream(
             model="claude-3-5-sonnet-20241022",
-            max_tokens=1000,
-            system=system_message,
+            max_tokens=max_tokens,
+            system=claude_system(system_message, cache_system),
             messages=user_messages
         ) as stream:
-            for text in stream.text_stream:
+            async for text in stream.text_stream:
                 yield text
+            final_message = await stream.get_final_message()
+            record_claude_usage(usage, final_message.usage)
     
-    def _stream_deepseek(self, messages: List[dict], model: str) -> Generator[str, None, None]:
-        if not self.deepseek_key:
-            yield "DeepSeek API 키가 설정되지 않았습니다."
-            return
+    async def _stream_deepseek(self, messages: List[dict], model: str, usage: Optional[Dict[str, int]] = None, max_tokens: int = 1000) -> AsyncGenerator[str, None]:
+        deepseek_client = self.providers.deepseek_client()
+        if deepseek_client is None:
+            raise ProviderNotConfigured("DeepSeek API 키가 설정되지 않았습니다.")
         
         print(f"Calling DeepSeek with messages: {messages}")
         
         try:
-            # DeepSeek API는 OpenAI 호환 API이므로 직접 호출
-            with httpx.Client(timeout=60.0) as client:
-                response = client.post(
-                    "https://api.deepseek.com/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.deepseek_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "deepseek-chat",
-                        "messages": messages,
-                        "stream": False,  # 스트리밍 대신 일반 응답
-                        "max_tokens": 1000,
-                        "temperature": 0.7
-                    }
-                )
-                
+            # DeepSeek API는 OpenAI 호환 SSE 스트리밍을 지원하므로 토큰 단위로 바로 전달
+            async with deepseek_client.stream(
+                "POST",
+                "/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.providers.deepseek_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": "deepseek-chat",
+                    "messages": messages,
+                    "stream": True,
+                    "stream_options": {"include_usage": True},
+                    "max_tokens": max_tokens,
+                    "temperature": 0.7
+                }
+            ) as response:
                 if response.status_code != 200:
-                    yield f"DeepSeek API 오류: HTTP {response.status_code} - {response.text}"
-                    return
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    raise ProviderError(f"DeepSeek API 오류: HTTP {response.status_code} - {body}")
                 
-                result = response.json()
-                if result.get("choices") and len(result["choices"]) > 0:
-                    content = result["choices"][0]["message"]["content"]
+                decoder = SSEDecoder()
+                received = False
+                async for raw in response.aiter_bytes():
+                    for event in decoder.feed(raw):
+                        content = self._deepseek_delta(event.data, usage)
+                        if content:
+                            received = True
+                            yield content
+                
+                for event in decoder.close():
+                    content = self._deepseek_delta(event.data, usage)
+                    if content:
+                        received = True
+                        yield content
+                
+                if not received:
+                    raise ProviderError("DeepSeek에서 응답을 받지 못했습니다.")
                     
-                    # 스트리밍 효과를 위해 문자 단위로 나누어 전송
-                    import time
-                    for i, char in enumerate(content):
-                        yield char
-                        # 더 자연스러운 타이핑 효과
-                        if char in [' ', '\n']:
-                            time.sleep(0.02)
-                        else:
-                            time.sleep(0.01)
-                else:
-                    yield "DeepSeek에서 응답을 받지 못했습니다."
-                        
-        except httpx.TimeoutException:
-            yield "DeepSeek API 타임아웃이 발생했습니다. 잠시 후 다시 시도해주세요."
-        except httpx.ConnectError:
-            yield "DeepSeek API에 연결할 수 없습니다. 네트워크 연결을 확인해주세요."
-        except Exception as e:
-            yield f"DeepSeek API 오류: {str(e)}"
\ No newline at end of file
+        except httpx.TimeoutException as e:
+            raise ProviderError("DeepSeek API 타임아웃이 발생했습니다. 잠시 후 다시 시도해주세요.") from e
+        except httpx.ConnectError as e:
+            raise ProviderError("DeepSeek API에 연결할 수 없습니다. 네트워크 연결을 확인해주세요.") from e
+    
+    @staticmethod
+    def _deepseek_delta(data: str, usage: Optional[Dict[str, int]] = None) -> str:
+        """DeepSeek 스트리밍 청크(JSON)에서 새로 생성된 텍스트 추출"""
+        if data == "[DONE]":
+            return ""
+        payload = json.loads(data)
+        if payload.get("usage"):
+            # DeepSeek는 디스크 기반 컨텍스트 캐시 적중 토큰을 prompt_cache_hit_tokens로 보고
+            record_usage(
+                usage,
+                input_tokens=payload["usage"].get("prompt_tokens", 0),
+                output_tokens=payload["usage"].get("completion_tokens", 0),
+                cache_read_tokens=payload["usage"].get("prompt_cache_hit_tokens", 0),
+            )
+        choices = payload.get("choices") or []
+        if not choices:
+            return ""
+        return choices[0].get("delta", {}).get("content") or ""
+
+
+# 전역 AIService 인스턴스
+ai_service = AIService()
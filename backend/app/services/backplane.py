@@ -0,0 +1,307 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .metrics import BACKPLANE_DELIVERIES, BACKPLANE_DELIVERY_LAG_SECONDS, BACKPLANE_MESSAGES, BACKPLANE_PUBLISH_SECONDS
+
+# (room_id, 인코딩된 프레임, 제외할 player_id, 메시지 type) -> 이 워커에서 실제로 보낸 연결 수
+LocalDelivery = Callable[[str, str, Optional[str], Optional[str]], Awaitable[int]]
+
+
+def encode_frame(message: Dict[str, Any]) -> str:
+    """방 메시지를 한 번만 인코딩 (모든 연결과 다른 워커가 같은 문자열을 공유)"""
+    return json.dumps(message)
+
+
+class RoomUpdate:
+    """update_room()이 mutate에 넘기는 방 하나의 변경 묶음 (한 트랜잭션으로 반영)"""
+
+    __slots__ = ("room_id", "room", "changed", "deleted", "player_rooms")
+
+    def __init__(self, room_id: str, room: Optional[Dict[str, Any]]):
+        self.room_id = room_id
+        # 현재 방 상태 (없으면 None, 새로 만들 때는 mutate가 채움)
+        self.room = room
+        self.changed = False
+        self.deleted = False
+        # 함께 반영할 플레이어-방 매핑 (값이 None이면 삭제)
+        self.player_rooms: Dict[str, Optional[str]] = {}
+
+    def save(self):
+        """수정한 room을 저장"""
+        self.changed = True
+
+    def delete(self):
+        """방 삭제"""
+        self.deleted = True
+
+    def set_player_room(self, player_id: str, room_id: Optional[str]):
+        self.player_rooms[player_id] = room_id
+
+
+# 방 하나를 읽고 고쳐서 돌려주는 동기 함수 (SQLite에서는 트랜잭션 안에서 작업 스레드로 실행되므로 await하지 않음)
+RoomMutation = Callable[[RoomUpdate], Any]
+
+
+class InProcessBackplane:
+    """워커 하나용 백플레인: 방 상태는 메모리 dict, 방 메시지는 이 프로세스의 연결로 바로 전달
+
+    방 상태는 get_room()으로 읽고 update_room()으로만 고칩니다. 읽기-수정-저장이 한 번에 일어나므로
+    공유 백플레인에서도 두 워커가 같은 방을 동시에 고쳐 한쪽 변경이 사라지지 않습니다.
+    """
+
+    kind = "memory"
+
+    def __init__(self):
+        self.rooms: Dict[str, Dict[str, Any]] = {}
+        self.player_rooms: Dict[str, str] = {}
+        self._deliver: Optional[LocalDelivery] = None
+        self._publish_seconds = BACKPLANE_PUBLISH_SECONDS.labels(self.kind)
+        self._messages = BACKPLANE_MESSAGES.labels(self.kind)
+        self._deliveries = BACKPLANE_DELIVERIES.labels(self.kind)
+        self.published = 0
+        # 다른 워커가 발행해 이 워커가 받은 메시지 수
+        self.received = 0
+        self.delivered = 0
+
+    def attach(self, deliver: LocalDelivery):
+        """ConnectionManager가 자기 로컬 연결로 보내는 함수를 등록"""
+        self._deliver = deliver
+
+    async def get_room(self, room_id: str) -> Optional[Dict[str, Any]]:
+        return self.rooms.get(room_id)
+
+    async def get_player_room(self, player_id: str) -> Optional[str]:
+        return self.player_rooms.get(player_id)
+
+    async def list_rooms(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self.rooms)
+
+    async def update_room(self, room_id: str, mutate: RoomMutation) -> Any:
+        """방을 읽어 mutate(update)를 실행하고 변경을 반영한 뒤 mutate의 반환값을 돌려줌"""
+        update = RoomUpdate(room_id, self.rooms.get(room_id))
+        result = mutate(update)
+        if update.deleted:
+            self.rooms.pop(room_id, None)
+        elif update.changed:
+            self.rooms[room_id] = update.room
+        for player_id, mapped in update.player_rooms.items():
+            if mapped is None:
+                self.player_rooms.pop(player_id, None)
+            else:
+                self.player_rooms[player_id] = mapped
+        return result
+
+    async def publish(self, room_id: str, message: Dict[str, Any], exclude_player: Optional[str] = None):
+        started = time.monotonic()
+        await self._deliver_local(room_id, encode_frame(message), exclude_player, message.get("type"))
+        self._publish_seconds.observe(time.monotonic() - started)
+        self._messages.inc()
+        self.published += 1
+
+    async def _deliver_local(self, room_id: str, frame: str, exclude_player: Optional[str], message_type: Optional[str]):
+        if self._deliver is None:
+            return
+        sent = await self._deliver(room_id, frame, exclude_player, message_type)
+        self._deliveries.inc(sent)
+        self.delivered += sent
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        handled = self.published + self.received
+        return {
+            "kind": self.kind,
+            "published": self.published,
+            "received": self.received,
+            "delivered": self.delivered,
+            # 메시지 하나당 이 워커에서 보낸 연결 수
+            "fanout": round(self.delivered / handled, 2) if handled else 0.0,
+        }
+
+
+class SQLiteBackplane(InProcessBackplane):
+    """같은 머신의 여러 uvicorn 워커가 로컬 SQLite(WAL) 파일 하나로 방을 공유
+
+    - 방 상태와 플레이어-방 매핑은 테이블에 저장 (모든 워커가 같은 내용을 봄)
+    - update_room()은 BEGIN IMMEDIATE 트랜잭션 안에서 읽기-수정-저장을 하므로 워커끼리 변경이 섞이지 않음
+    - 방 메시지는 자기 연결에 바로 보내고 room_events에 추가, 다른 워커는 poll_interval마다 새 이벤트를 읽어 전달
+    모든 sqlite 작업은 asyncio.to_thread 작업 스레드에서 연결 락을 잡고 실행해 잠긴 DB가 이벤트 루프를 막지 않습니다.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, path: str, poll_interval: float = 0.05, retention: float = 60.0):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._db: Optional[sqlite3.Connection] = None
+        # 연결 하나를 여러 작업 스레드가 번갈아 쓰므로 작업 단위로 직렬화
+        self._db_lock = threading.Lock()
+        self._poller: Optional[asyncio.Task] = None
+        self._last_event_id = 0
+        self._lag = BACKPLANE_DELIVERY_LAG_SECONDS.labels(self.kind)
+
+    def _conn(self) -> sqlite3.Connection:
+        # _db_lock을 잡은 작업 스레드에서만 호출
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS rooms (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS player_rooms (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS room_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, room_id TEXT NOT NULL, payload TEXT NOT NULL, "
+                "message_type TEXT, exclude_player TEXT, origin TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db = conn
+        return self._db
+
+    async def _run(self, work: Callable[..., Any], *args) -> Any:
+        return await asyncio.to_thread(self._locked, work, *args)
+
+    def _locked(self, work: Callable[..., Any], *args) -> Any:
+        with self._db_lock:
+            return work(self._conn(), *args)
+
+    async def get_room(self, room_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._select_value, "rooms", room_id)
+
+    async def get_player_room(self, player_id: str) -> Optional[str]:
+        return await self._run(self._select_value, "player_rooms", player_id)
+
+    async def list_rooms(self) -> Dict[str, Dict[str, Any]]:
+        rows = await self._run(lambda conn: conn.execute("SELECT key, value FROM rooms").fetchall())
+        return {key: json.loads(value) for key, value in rows}
+
+    @staticmethod
+    def _select_value(conn: sqlite3.Connection, table: str, key: str) -> Any:
+        row = conn.execute(f"SELECT value FROM {table} WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def update_room(self, room_id: str, mutate: RoomMutation) -> Any:
+        return await self._run(self._update_room, room_id, mutate)
+
+    def _update_room(self, conn: sqlite3.Connection, room_id: str, mutate: RoomMutation) -> Any:
+        # 쓰기 락을 먼저 잡아 다른 워커가 같은 방을 읽고 고치는 사이에 끼어들지 못하게 함
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            update = RoomUpdate(room_id, self._select_value(conn, "rooms", room_id))
+            result = mutate(update)
+            if update.deleted:
+                conn.execute("DELETE FROM rooms WHERE key = ?", (room_id,))
+            elif update.changed:
+                self._upsert(conn, "rooms", room_id, update.room)
+            for player_id, mapped in update.player_rooms.items():
+                if mapped is None:
+                    conn.execute("DELETE FROM player_rooms WHERE key = ?", (player_id,))
+                else:
+                    self._upsert(conn, "player_rooms", player_id, mapped)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, table: str, key: str, value: Any):
+        conn.execute(
+            f"INSERT INTO {table} (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value, ensure_ascii=False)),
+        )
+
+    async def publish(self, room_id: str, message: Dict[str, Any], exclude_player: Optional[str] = None):
+        started = time.monotonic()
+        frame = encode_frame(message)
+        await self._run(
+            lambda conn: conn.execute(
+                "INSERT INTO room_events (room_id, payload, message_type, exclude_player, origin, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (room_id, frame, message.get("type"), exclude_player, self.origin, time.time()),
+            )
+        )
+        await self._deliver_local(room_id, frame, exclude_player, message.get("type"))
+        self._publish_seconds.observe(time.monotonic() - started)
+        self._messages.inc()
+        self.published += 1
+
+    def start(self):
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        await asyncio.to_thread(self._close)
+
+    def _close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    async def _poll_loop(self):
+        # 시작 이전 이벤트는 다시 보내지 않음
+        self._last_event_id = await self._run(
+            lambda conn: conn.execute("SELECT COALESCE(MAX(id), 0) FROM room_events").fetchone()[0]
+        )
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self._poll()
+                if time.monotonic() - last_prune > self.retention:
+                    last_prune = time.monotonic()
+                    cutoff = time.time() - self.retention
+                    await self._run(lambda conn: conn.execute("DELETE FROM room_events WHERE created_at < ?", (cutoff,)))
+            except Exception as e:
+                print(f"[backplane] poll error: {e}")
+
+    async def _poll(self):
+        after = self._last_event_id
+        rows = await self._run(
+            lambda conn: conn.execute(
+                "SELECT id, room_id, payload, message_type, exclude_player, origin, created_at FROM room_events WHERE id > ? ORDER BY id",
+                (after,),
+            ).fetchall()
+        )
+        for event_id, room_id, payload, message_type, exclude_player, origin, created_at in rows:
+            self._last_event_id = event_id
+            if origin == self.origin:
+                continue
+            self._lag.observe(max(time.time() - created_at, 0.0))
+            self.received += 1
+            # 발행한 워커가 인코딩한 프레임을 그대로 전달
+            await self._deliver_local(room_id, payload, exclude_player, message_type)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({"path": self.path, "origin": self.origin})
+        return stats
+
+
+def backplane_from_env() -> InProcessBackplane:
+    """WS_BACKPLANE=memory(기본) | sqlite"""
+    kind = os.getenv("WS_BACKPLANE", "memory")
+    if kind == "sqlite":
+        return SQLiteBackplane(
+            os.getenv("WS_BACKPLANE_PATH", "data/ws_backplane.db"),
+            poll_interval=float(os.getenv("WS_BACKPLANE_POLL_MS", "50")) / 1000,
+        )
+    return InProcessBackplane()
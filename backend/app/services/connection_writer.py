@@ -0,0 +1,195 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, NamedTuple, Optional
+
+from fastapi import WebSocket
+
+from .metrics import WS_QUEUE_DEPTH, WS_QUEUE_DROPS, WS_SEND_FAILURES, WS_SENT_BYTES
+
+# 큐가 가득 찼을 때 정책
+POLICIES = ("coalesce", "drop", "disconnect")
+
+# 방 전체 상태를 담은 메시지: 같은 종류의 최신 메시지 하나만 있으면 됨 (coalesce 대상)
+SNAPSHOT_TYPES = frozenset({"room_info", "room_snapshot"})
+# 버려도 되는 알림 (drop 대상): 입장/퇴장 이벤트는 버리면 클라이언트가 다음 이벤트에서 seq 공백을 보고 스냅샷을 요청
+# 턴 이벤트는 대신할 메시지가 없으므로 버리지 않음
+NON_CRITICAL_TYPES = frozenset({"heartbeat_response", "player_joined", "player_left", "player_disconnected"})
+
+
+class _Outgoing(NamedTuple):
+    frame: str
+    message_type: Optional[str]
+    room_id: Optional[str]
+    enqueued_at: float
+
+
+class ConnectionWriter:
+    """연결 하나에 전용 writer 태스크를 두고 bounded 큐로 전송
+
+    게임 로직은 send()로 큐에 넣고 바로 돌아가며, 느린 클라이언트는 자기 큐만 채웁니다.
+    큐가 가득 차면 policy에 따라
+    - coalesce: 같은 종류의 이전 상태 메시지를 새 메시지로 대체, 없으면 drop처럼 처리
+    - drop: 중요하지 않은 알림부터 버림, 버릴 것이 없으면 연결 종료
+    - disconnect: 바로 연결 종료
+    """
+
+    def __init__(
+        self,
+        player_id: str,
+        websocket: WebSocket,
+        max_queue: int = 64,
+        policy: str = "coalesce",
+        send_timeout: float = 5.0,
+        on_failure: Optional[Callable[["ConnectionWriter", str], None]] = None,
+        on_sent: Optional[Callable[[str, float], None]] = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown queue policy: {policy}")
+        self.player_id = player_id
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        # (writer, 사유) - 전송 실패/큐 초과로 연결을 정리할 때
+        self.on_failure = on_failure
+        # (room_id, 큐에 넣은 뒤 소켓에 쓰기까지 걸린 시간)
+        self.on_sent = on_sent
+        self._queue: Deque[_Outgoing] = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+
+        self.sent = 0
+        self.sent_bytes = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    @classmethod
+    def from_env(cls, player_id: str, websocket: WebSocket, **kwargs) -> "ConnectionWriter":
+        """WS_SEND_QUEUE_SIZE / WS_QUEUE_POLICY"""
+        return cls(
+            player_id,
+            websocket,
+            max_queue=int(os.getenv("WS_SEND_QUEUE_SIZE", "64")),
+            policy=os.getenv("WS_QUEUE_POLICY", "coalesce"),
+            **kwargs,
+        )
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self):
+        """writer 태스크 중지 (남은 큐는 버림)"""
+        if self.closed and self._task is None:
+            return
+        self.closed = True
+        WS_QUEUE_DEPTH.labels().dec(len(self._queue))
+        self._queue.clear()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+    def send(self, frame: str, message_type: Optional[str] = None, room_id: Optional[str] = None) -> bool:
+        """큐에 넣고 바로 반환 (버려졌거나 연결이 닫혔으면 False)"""
+        if self.closed:
+            return False
+        if len(self._queue) >= self.max_queue and not self._make_room(message_type):
+            return False
+        self._queue.append(_Outgoing(frame, message_type, room_id, time.monotonic()))
+        WS_QUEUE_DEPTH.labels().inc()
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._ready.set()
+        return True
+
+    def _make_room(self, message_type: Optional[str]) -> bool:
+        """가득 찬 큐에 자리를 만들면 True, 새 메시지를 넣지 말아야 하면 False"""
+        if self.policy == "coalesce" and message_type in SNAPSHOT_TYPES:
+            kept = deque(item for item in self._queue if item.message_type != message_type)
+            removed = len(self._queue) - len(kept)
+            if removed:
+                self._queue = kept
+                WS_QUEUE_DEPTH.labels().dec(removed)
+                self._count_drop("coalesced", removed)
+                return True
+
+        if self.policy in ("coalesce", "drop"):
+            if message_type in NON_CRITICAL_TYPES:
+                self._count_drop("dropped", 1)
+                return False
+            for index, item in enumerate(self._queue):
+                if item.message_type in NON_CRITICAL_TYPES:
+                    del self._queue[index]
+                    WS_QUEUE_DEPTH.labels().dec()
+                    self._count_drop("dropped", 1)
+                    return True
+
+        # 더 버릴 수 있는 메시지가 없으면 따라오지 못하는 연결로 보고 종료
+        self._count_drop("overflow", 1)
+        self._fail("overflow")
+        return False
+
+    def _count_drop(self, reason: str, count: int):
+        if reason == "coalesced":
+            self.coalesced += count
+        else:
+            self.dropped += count
+        WS_QUEUE_DROPS.labels(reason).inc(count)
+
+    def _fail(self, reason: str):
+        WS_SEND_FAILURES.labels(reason).inc()
+        self.close()
+        if self.on_failure is not None:
+            self.on_failure(self, reason)
+        # 방에서 빠진 플레이어가 열린 소켓으로 계속 메시지를 보내지 않도록 이유와 관계없이 소켓도 닫음
+        # (멈춘 클라이언트에는 닫기 프레임도 못 보낼 수 있으므로 기다리지 않음)
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
+
+    async def _run(self):
+        while True:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            item = self._queue.popleft()
+            WS_QUEUE_DEPTH.labels().dec()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(item.frame), self.send_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                reason = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                print(f"[ws] send to {self.player_id} failed ({reason}): {e!r}")
+                self._fail(reason)
+                return
+            self.sent += 1
+            size = len(item.frame.encode("utf-8"))
+            self.sent_bytes += size
+            WS_SENT_BYTES.labels().inc(size)
+            if self.on_sent is not None and item.room_id is not None:
+                self.on_sent(item.room_id, time.monotonic() - item.enqueued_at)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "max_queue": self.max_queue,
+            "policy": self.policy,
+            "sent": self.sent,
+            "sent_bytes": self.sent_bytes,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,181 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Deque, Dict, Optional
+
+# 같은 요청에 대해 품질이 비슷한 백업 모델
+EQUIVALENT_MODELS = {
+    "openai-gpt3.5": "deepseek-chat",
+    "deepseek-chat": "openai-gpt3.5",
+    "openai-gpt4": "claude-3.5-sonnet",
+    "claude-3.5-sonnet": "openai-gpt4",
+}
+
+
+class _TTFTTracker:
+    """모델별 최근 첫 토큰 지연(TTFT) 표본"""
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(int(len(ordered) * q), len(ordered) - 1)
+        return ordered[index]
+
+
+class Hedger:
+    """첫 토큰이 늦을 때 동급 모델로 백업 요청을 보내고 먼저 응답한 스트림을 사용
+
+    - 헤지 지연: 주 모델 TTFT p95 (min_delay~max_delay로 제한, 표본이 적으면 default_delay)
+    - 먼저 첫 청크를 낸 스트림으로 확정하고 나머지는 취소
+    - 한쪽이 첫 청크 전에 실패하면 다른 쪽을 계속 기다림
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        default_delay: float = 1.5,
+        min_delay: float = 0.3,
+        max_delay: float = 5.0,
+        min_samples: int = 20,
+    ):
+        self.enabled = enabled
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+
+        self._ttft: Dict[str, _TTFTTracker] = {}
+        self._routes: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> "Hedger":
+        return cls(
+            enabled=os.getenv("AI_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes"),
+            default_delay=float(os.getenv("AI_HEDGE_DELAY", "1.5")),
+            min_delay=float(os.getenv("AI_HEDGE_MIN_DELAY", "0.3")),
+            max_delay=float(os.getenv("AI_HEDGE_MAX_DELAY", "5.0")),
+        )
+
+    def delay_for(self, model: str) -> float:
+        tracker = self._ttft.get(model)
+        if tracker is None or len(tracker.samples) < self.min_samples:
+            return self.default_delay
+        return min(max(tracker.percentile(0.95), self.min_delay), self.max_delay)
+
+    def record_ttft(self, model: str, seconds: float):
+        self._ttft.setdefault(model, _TTFTTracker()).add(seconds)
+
+    async def stream(
+        self,
+        route: str,
+        model: str,
+        factory: Callable[[str], AsyncIterator[str]],
+        is_available: Callable[[str], bool] = lambda model: True,
+    ) -> AsyncGenerator[str, None]:
+        """factory(model)로 만든 스트림을 헤지해서 전달"""
+        stats = self._routes.setdefault(route, {"requests": 0, "hedged": 0, "primary_wins": 0, "backup_wins": 0})
+        stats["requests"] += 1
+
+        backup_model = EQUIVALENT_MODELS.get(model)
+        if backup_model is not None and not is_available(backup_model):
+            backup_model = None
+
+        started = time.monotonic()
+        # 첫 청크를 기다리는 태스크 -> (모델, 스트림, 시작 시각)
+        pending: Dict[asyncio.Task, Any] = {}
+
+        def launch(candidate: str):
+            stream = factory(candidate)
+            task = asyncio.create_task(stream.__anext__())
+            pending[task] = (candidate, stream, time.monotonic())
+
+        winner = None
+        first_chunk = None
+        last_error: Optional[BaseException] = None
+        try:
+            launch(model)
+            hedge_at = started + self.delay_for(model) if backup_model else None
+
+            while pending and winner is None:
+                timeout = None
+                if hedge_at is not None:
+                    timeout = max(hedge_at - time.monotonic(), 0)
+                done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # 주 모델이 지연 시간 안에 첫 토큰을 내지 못함 → 백업 요청
+                    stats["hedged"] += 1
+                    launch(backup_model)
+                    hedge_at = None
+                    continue
+
+                for task in done:
+                    candidate, stream, launched = pending.pop(task)
+                    error = task.exception()
+                    if error is None and winner is None:
+                        winner = (candidate, stream)
+                        first_chunk = task.result()
+                        self.record_ttft(candidate, time.monotonic() - launched)
+                    elif error is None:
+                        await stream.aclose()
+                    elif isinstance(error, StopAsyncIteration):
+                        # 청크 없이 끝난 스트림은 응답으로 취급하지 않음
+                        pass
+                    else:
+                        last_error = error
+
+                # 주 모델이 첫 토큰 전에 실패하면 기다리지 않고 바로 백업 요청
+                if winner is None and not pending and hedge_at is not None:
+                    stats["hedged"] += 1
+                    launch(backup_model)
+                    hedge_at = None
+        finally:
+            # 확정되지 않은 나머지 스트림 취소
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending.keys(), return_exceptions=True)
+            for _, stream, _ in pending.values():
+                await stream.aclose()
+
+        if winner is None:
+            if last_error is not None:
+                raise last_error
+            return
+
+        winning_model, stream = winner
+        if winning_model == model:
+            stats["primary_wins"] += 1
+        else:
+            stats["backup_wins"] += 1
+
+        try:
+            yield first_chunk
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        routes = {}
+        for route, stats in self._routes.items():
+            routes[route] = {
+                **stats,
+                "hedge_rate": round(stats["hedged"] / stats["requests"], 3) if stats["requests"] else 0.0,
+            }
+        return {
+            "enabled": self.enabled,
+            "routes": routes,
+            "delays": {model: round(self.delay_for(model), 3) for model in self._ttft},
+        }
+
+
+# 전역 Hedger 인스턴스
+hedger = Hedger.from_env()
@@ -0,0 +1,137 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+JSONPath = Tuple[Any, ...]
+
+
+class _Frame:
+    """열려 있는 객체/배열 하나의 파싱 상태"""
+
+    __slots__ = ("kind", "key", "expect_key", "start", "index")
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.key: Optional[str] = None
+        # 객체에서 다음 문자열이 키인지 여부
+        self.expect_key = kind == "object"
+        # 현재 값이 시작된 위치 (-1이면 값 대기 중)
+        self.start = -1
+        self.index = 0
+
+
+class IncrementalJSONParser:
+    """토큰 스트림으로 들어오는 JSON 객체에서 완성된 값을 순서대로 꺼내는 파서
+
+    - 최상위 객체의 각 필드 값이 완성되면 (("필드",), 값)
+    - 최상위 필드가 배열이면 각 원소가 완성될 때마다 (("필드", 인덱스), 값)
+    첫 '{' 이전의 텍스트(코드 펜스 등)는 무시합니다. 전체 문서는 document()로 얻습니다.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.root_start = -1
+        self.root_end = -1
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._scalar_start = -1
+
+    def feed(self, chunk: str) -> List[Tuple[JSONPath, Any]]:
+        self.text += chunk
+        events: List[Tuple[JSONPath, Any]] = []
+        text = self.text
+        i = self.pos
+        end = len(text)
+
+        while i < end and self.root_end < 0:
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_string(i, events)
+                i += 1
+                continue
+
+            if self._scalar_start >= 0:
+                if ch in ",}] \t\r\n":
+                    self._complete_value(self._scalar_start, i, events)
+                    self._scalar_start = -1
+                else:
+                    i += 1
+                    continue
+
+            if not self._stack:
+                # 루트 객체 시작 전: '{'가 나올 때까지 건너뜀
+                if ch == "{":
+                    self.root_start = i
+                    self._stack.append(_Frame("object"))
+                i += 1
+                continue
+
+            frame = self._stack[-1]
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+                if not (frame.kind == "object" and frame.expect_key):
+                    frame.start = i
+            elif ch in "{[":
+                frame.start = i
+                self._stack.append(_Frame("object" if ch == "{" else "array"))
+            elif ch in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    self.root_end = i + 1
+                else:
+                    self._complete_value(self._stack[-1].start, i + 1, events)
+            elif ch == ",":
+                if frame.kind == "object":
+                    frame.expect_key = True
+                else:
+                    frame.index += 1
+            elif ch == ":":
+                frame.expect_key = False
+            elif ch not in " \t\r\n":
+                # 숫자, true/false/null
+                frame.start = i
+                self._scalar_start = i
+            i += 1
+
+        self.pos = i
+        return events
+
+    def _close_string(self, end: int, events: List[Tuple[JSONPath, Any]]):
+        frame = self._stack[-1]
+        if frame.kind == "object" and frame.expect_key:
+            frame.key = json.loads(self.text[self._string_start:end + 1])
+        else:
+            self._complete_value(self._string_start, end + 1, events)
+
+    def _complete_value(self, start: int, end: int, events: List[Tuple[JSONPath, Any]]):
+        """현재 프레임에서 값 하나가 끝남; 관심 있는 깊이면 이벤트로 변환"""
+        frame = self._stack[-1]
+        depth = len(self._stack)
+        path: Optional[JSONPath] = None
+        if depth == 1:
+            path = (frame.key,)
+        elif depth == 2 and frame.kind == "array":
+            path = (self._stack[0].key, frame.index)
+        frame.start = -1
+        if path is None:
+            return
+        try:
+            events.append((path, json.loads(self.text[start:end])))
+        except ValueError:
+            pass
+
+    def document(self) -> Any:
+        """닫힌 루트 객체 전체를 파싱 (아직 닫히지 않았으면 ValueError)"""
+        if self.root_end < 0:
+            raise ValueError("JSON 문서가 완성되지 않았습니다.")
+        return json.loads(self.text[self.root_start:self.root_end])
@@ -0,0 +1,240 @@
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# 이벤트 루프 한 스레드에서만 갱신하므로 락 없이 정수/실수 덧셈만 수행합니다.
+# 토큰 루프에서는 labels()로 미리 얻은 child를 재사용해 관측마다 새 객체를 만들지 않습니다.
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """라벨 값 조합별 child (같은 조합이면 같은 객체를 반환)"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._new_child()
+            self._children[values] = child
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """라벨 값 조합 하나에 대한 값 객체 생성"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._children.items():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_label_text(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # 마지막 칸은 +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), child.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labelnames, values, le)} {cumulative}")
+        labels = _label_text(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Prometheus 텍스트 형식(/metrics)으로 내보내는 지표 모음"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = ()) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 라벨 값이 사용자 입력으로 무한히 늘지 않도록 알려진 모델만 그대로 사용
+KNOWN_MODELS = {"openai-gpt3.5", "openai-gpt4", "claude-3.5-sonnet", "deepseek-chat"}
+
+
+def model_label(model: str) -> str:
+    return model if model in KNOWN_MODELS else "other"
+
+
+# 전역 MetricsRegistry 인스턴스와 AI 호출 지표
+metrics = MetricsRegistry()
+
+TTFT_SECONDS = metrics.histogram(
+    "ai_time_to_first_token_seconds", "요청부터 첫 토큰까지 걸린 시간", ("route", "model"),
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 30),
+)
+INTER_TOKEN_SECONDS = metrics.histogram(
+    "ai_inter_token_latency_seconds", "스트리밍 청크 사이 간격", ("route", "model"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+STREAM_DURATION_SECONDS = metrics.histogram(
+    "ai_stream_duration_seconds", "스트리밍 응답 전체 시간", ("route", "model"),
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+OUTPUT_TOKENS_PER_SECOND = metrics.histogram(
+    "ai_output_tokens_per_second", "첫 토큰 이후 출력 토큰 속도", ("route", "model"),
+    buckets=(1, 5, 10, 20, 35, 50, 75, 100, 200),
+)
+COMPLETION_DURATION_SECONDS = metrics.histogram(
+    "ai_completion_duration_seconds", "완료형(비스트리밍) 응답 시간", ("model",),
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "ai_admission_queue_wait_seconds", "프로바이더 실행 슬롯 대기 시간", ("provider",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PROMPT_TOKENS = metrics.counter("ai_prompt_tokens_total", "프로바이더가 보고한 입력 토큰 수", ("provider", "model"))
+COMPLETION_TOKENS = metrics.counter("ai_completion_tokens_total", "프로바이더가 보고한 출력 토큰 수", ("provider", "model"))
+CACHED_PROMPT_TOKENS = metrics.counter("ai_cached_prompt_tokens_total", "프롬프트 캐시에서 읽은 입력 토큰 수", ("provider", "model"))
+ERRORS = metrics.counter("ai_errors_total", "프로바이더 호출 오류 수", ("provider", "model", "error"))
+STREAM_CANCELLATIONS = metrics.counter("ai_stream_cancellations_total", "클라이언트 이탈로 중간에 닫힌 스트리밍 생성 수", ("route",))
+OUTPUT_TOKENS_SAVED = metrics.counter(
+    "ai_output_tokens_saved_total", "업스트림 생성을 중단해 아낀 출력 토큰 수 상한 추정 (max_tokens - 생성된 텍스트의 추정 토큰 수)", ("route", "model"),
+)
+ACTIVE_STREAMS = metrics.gauge("ai_active_streams", "진행 중인 스트리밍 생성 수", ("route",))
+SESSION_ENTRIES = metrics.gauge("game_sessions", "저장소에 있는 게임 세션 수", ("store",))
+SESSION_BYTES = metrics.gauge("game_session_bytes", "게임 세션 저장소 크기 (직렬화 기준 추정)", ("store",))
+SESSION_EVICTIONS = metrics.counter("game_session_evictions_total", "제거된 게임 세션 수", ("store", "reason"))
+SESSION_DB_PENDING = metrics.gauge("game_session_db_pending", "SQLite에 아직 쓰지 않은 세션 변경 수")
+SESSION_DB_WRITES = metrics.counter("game_session_db_writes_total", "SQLite에 커밋한 세션 행 수")
+SESSION_DB_FLUSH_SECONDS = metrics.histogram(
+    "game_session_db_flush_seconds", "write-behind 배치 커밋 시간", (),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+BACKPLANE_PUBLISH_SECONDS = metrics.histogram(
+    "ws_backplane_publish_seconds", "방 메시지 발행 시간 (로컬 전달 포함)", ("backplane",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+BACKPLANE_DELIVERY_LAG_SECONDS = metrics.histogram(
+    "ws_backplane_delivery_lag_seconds", "다른 워커가 발행한 방 메시지를 받기까지 걸린 시간", ("backplane",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+BACKPLANE_MESSAGES = metrics.counter("ws_backplane_messages_total", "발행한 방 메시지 수", ("backplane",))
+BACKPLANE_DELIVERIES = metrics.counter("ws_backplane_deliveries_total", "이 워커의 연결로 전달한 방 메시지 수 (fan-out)", ("backplane",))
+WS_BROADCAST_SECONDS = metrics.histogram(
+    "ws_broadcast_seconds", "방 메시지를 연결 큐에 넣은 뒤 소켓에 쓰기까지 걸린 시간",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+WS_SEND_FAILURES = metrics.counter("ws_send_failures_total", "WebSocket 전송 실패/큐 초과로 정리한 연결 수", ("reason",))
+WS_SENT_BYTES = metrics.counter("ws_sent_bytes_total", "WebSocket으로 보낸 프레임 바이트 수 (UTF-8)")
+WS_QUEUE_DEPTH = metrics.gauge("ws_send_queue_depth", "모든 연결의 전송 대기 메시지 수 합계")
+WS_QUEUE_DROPS = metrics.counter("ws_send_queue_drops_total", "큐가 가득 차서 버리거나 대체한 메시지 수", ("reason",))
+SSE_ACTIVE = metrics.gauge("sse_active_connections", "열려 있는 SSE 응답 수", ("route",))
+SSE_STREAMS = metrics.counter("sse_streams_total", "시작된 SSE 응답 수", ("route",))
+SSE_FRAMES = metrics.counter("sse_frames_total", "전송한 SSE 프레임 수", ("route",))
+SSE_BYTES = metrics.counter("sse_bytes_total", "전송한 SSE 프레임 바이트 수", ("route",))
+SSE_DELTAS = metrics.counter("sse_deltas_total", "프레임으로 묶기 전 토큰 청크 수", ("route",))
+SSE_RESUMES = metrics.counter("sse_resumes_total", "Last-Event-ID 재연결 처리 결과", ("route", "outcome"))
+SSE_REPLAY_BYTES = metrics.gauge("sse_replay_buffer_bytes", "재연결용 링 버퍼에 보관 중인 프레임 바이트 수")
+SSE_REPLAY_EVICTIONS = metrics.counter("sse_replay_evictions_total", "재연결용 버퍼 정리 수", ("reason",))
+
+
+def record_token_usage(provider: str, model: str, usage: Dict[str, int]):
+    """호출 하나의 usage 딕셔너리(record_usage 형식)를 토큰 카운터에 반영"""
+    PROMPT_TOKENS.labels(provider, model).inc(usage.get("input_tokens", 0))
+    COMPLETION_TOKENS.labels(provider, model).inc(usage.get("output_tokens", 0))
+    CACHED_PROMPT_TOKENS.labels(provider, model).inc(usage.get("cache_read_tokens", 0))
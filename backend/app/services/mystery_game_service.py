@@ -1,39 +1,191 @@
+import os
 import json
 import random
 import uuid
+import asyncio
 from typing import List, Dict, Any, Optional
 from ..services.simple_ai_service import SimpleAIService
+from ..services.warm_pool import WarmPool, parse_pool_keys
+from ..services.admission import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from ..services.resilience import Deadline
+from ..services.json_stream import IncrementalJSONParser
+from ..services.session_store import SessionStore
+from ..services.session_db import session_db
+from ..services.session_models import MysterySession
+
+# 난이도별 사건 구성
+DIFFICULTY_SETTINGS = {
+    "easy": {
+        "suspects": 3,
+        "clues": 5,
+        "red_herrings": 1,
+        "description": "초급 - 3명의 용의자, 단순한 사건"
+    },
+    "normal": {
+        "suspects": 4,
+        "clues": 7,
+        "red_herrings": 2,
+        "description": "중급 - 4명의 용의자, 적당한 복잡성"
+    },
+    "hard": {
+        "suspects": 5,
+        "clues": 10,
+        "red_herrings": 3,
+        "description": "고급 - 5명의 용의자, 복잡한 사건"
+    }
+}
+
+# 생성 중에 바로 보여줘도 되는 최상위 필드 (solution, clues는 절대 전송하지 않음)
+PUBLIC_CASE_FIELDS = ("case_title", "case_description", "location", "victim")
+# 용의자 정보 중 플레이어에게 공개하는 필드 (is_culprit, motive 제외)
+PUBLIC_SUSPECT_FIELDS = ("name", "description", "alibi")
+
+# 미리 생성해 둘 수 있는 모델 (임의의 모델 문자열로 풀 키가 무한히 늘지 않도록 제한)
+POOLED_MODELS = {"openai-gpt3.5", "openai-gpt4", "claude-3.5-sonnet"}
+
 
 class MysteryGameService:
     def __init__(self):
         self.ai_service = SimpleAIService()
-        self.mystery_contexts = {}
-        
-    def create_new_mystery(self, session_id: str, difficulty: str = "normal", model: str = "openai-gpt3.5") -> Dict[str, Any]:
+        # 유휴/메모리 예산 기준으로 정리되는 세션 저장소 (dict처럼 사용, 수정 후 save로 SQLite에 반영)
+        self.mystery_contexts = SessionStore.from_env("mystery", backend=session_db, session_type=MysterySession)
+        # (난이도, 모델)별로 미리 생성·검증해 둔 사건 풀
+        self.pool = WarmPool(
+            "mystery",
+            self._generate_mystery,
+            low_watermark=int(os.getenv("MYSTERY_POOL_LOW", "1")),
+            high_watermark=int(os.getenv("MYSTERY_POOL_HIGH", "3")),
+            max_concurrency=int(os.getenv("MYSTERY_POOL_CONCURRENCY", "2")),
+            persist_path=os.getenv("MYSTERY_POOL_PATH", "data/mystery_pool.json"),
+        )
+        self.pool_prewarm_keys = parse_pool_keys(os.getenv("MYSTERY_POOL_PREWARM", "normal:openai-gpt3.5"))
+        
+    async def create_new_mystery(self, session_id: str, difficulty: str = "normal", model: str = "openai-gpt3.5", deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """새로운 추리 게임 생성"""
+        # 미리 생성된 사건이 있으면 바로 사용하고, 없을 때만 즉시 생성
+        mystery_data = None
+        pool_key = self._pool_key(difficulty, model)
+        if pool_key:
+            mystery_data = self.pool.pop(pool_key)
+        if mystery_data is None:
+            mystery_data = await self._generate_mystery((difficulty, model), priority=PRIORITY_INTERACTIVE, deadline=deadline)
+        if mystery_data is None:
+            return {"error": "사건 생성 중 오류가 발생했습니다"}
         
-        difficulty_settings = {
-            "easy": {
-                "suspects": 3,
-                "clues": 5,
-                "red_herrings": 1,
-                "description": "초급 - 3명의 용의자, 단순한 사건"
-            },
-            "normal": {
-                "suspects": 4,
-                "clues": 7,
-                "red_herrings": 2,
-                "description": "중급 - 4명의 용의자, 적당한 복잡성"
-            },
-            "hard": {
-                "suspects": 5,
-                "clues": 10,
-                "red_herrings": 3,
-                "description": "고급 - 5명의 용의자, 복잡한 사건"
-            }
+        return self._register_mystery(session_id, difficulty, model, mystery_data)
+    
+    async def create_new_mystery_stream(self, session_id: str, difficulty: str = "normal", model: str = "openai-gpt3.5", deadline: Optional[Deadline] = None):
+        """새로운 추리 게임 생성 (스트리밍)
+        
+        공개 필드와 용의자가 완성되는 즉시 이벤트로 보내고, 전체 문서가 검증을 통과한 뒤에만 세션을 등록합니다.
+        """
+        pool_key = self._pool_key(difficulty, model)
+        mystery_data = self.pool.pop(pool_key) if pool_key else None
+        
+        if mystery_data is None:
+            from ..services.ai_service import ai_service
+            
+            system_prompt, creation_prompt = self._creation_prompts(difficulty)
+            parser = IncrementalJSONParser()
+            async for chunk in ai_service.stream_chat(
+                creation_prompt, [], model, system_prompt=system_prompt,
+                route="mystery.create", deadline=deadline, max_tokens=1500
+            ):
+                for path, value in parser.feed(chunk):
+                    event = self._public_event(path, value)
+                    if event is not None:
+                        yield event
+            
+            try:
+                mystery_data = parser.document()
+            except ValueError:
+                mystery_data = None
+            if not self._validate_mystery(mystery_data):
+                print(f"Invalid streamed mystery for {(difficulty, model)}")
+                yield {"error": "사건 생성 중 오류가 발생했습니다"}
+                return
+        else:
+            # 미리 생성된 사건은 같은 이벤트 형태로 바로 전송
+            for field in PUBLIC_CASE_FIELDS:
+                yield self._public_event((field,), mystery_data[field])
+            for index, suspect in enumerate(mystery_data["suspects"]):
+                yield self._public_event(("suspects", index), suspect)
+        
+        result = self._register_mystery(session_id, difficulty, model, mystery_data)
+        yield {"done": True, **result}
+    
+    def _public_event(self, path: tuple, value: Any) -> Optional[Dict[str, Any]]:
+        """파서 이벤트 중 플레이어에게 보내도 되는 것만 변환"""
+        if len(path) == 1 and path[0] in PUBLIC_CASE_FIELDS:
+            return {"field": path[0], "value": value}
+        if len(path) == 2 and path[0] == "suspects" and isinstance(value, dict):
+            return {"suspect": self._public_suspect(value), "index": path[1]}
+        return None
+    
+    def _public_suspect(self, suspect: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: suspect.get(field, "") for field in PUBLIC_SUSPECT_FIELDS}
+    
+    def _register_mystery(self, session_id: str, difficulty: str, model: str, mystery_data: Dict[str, Any]) -> Dict[str, Any]:
+        """검증된 사건으로 게임 세션을 등록하고 공개 정보를 반환"""
+        settings = DIFFICULTY_SETTINGS.get(difficulty, DIFFICULTY_SETTINGS["normal"])
+        
+        # 게임 세션 컨텍스트 저장
+        self.mystery_contexts[session_id] = MysterySession(
+            mystery_data, difficulty, model,
+            max_questions=settings["clues"] + 3,
+            dossier=self._compile_dossier(mystery_data),
+        )
+        
+        return {
+            "session_id": session_id,
+            "case_title": mystery_data["case_title"],
+            "case_description": mystery_data["case_description"],
+            "location": mystery_data["location"],
+            "victim": mystery_data["victim"],
+            "suspects": [self._public_suspect(suspect) for suspect in mystery_data["suspects"]],
+            "max_questions": settings["clues"] + 3,
+            "difficulty": settings["description"]
         }
+    
+    def _compile_dossier(self, mystery_info: Dict[str, Any]) -> str:
+        """NPC용 system prompt를 생성 (키 정렬·고정 구분자로 매번 같은 바이트열이 되도록)"""
+        suspects_json = json.dumps(mystery_info['suspects'], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        clues_json = json.dumps(mystery_info['clues'], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
         
-        settings = difficulty_settings.get(difficulty, difficulty_settings["normal"])
+        return f"""당신은 추리 게임의 NPC입니다. 다음 사건 정보를 바탕으로 플레이어의 질문에 답하세요:
+
+사건 정보:
+- 제목: {mystery_info['case_title']}
+- 상황: {mystery_info['case_description']}
+- 장소: {mystery_info['location']}
+- 피해자: {mystery_info['victim']}
+
+용의자들:
+{suspects_json}
+
+단서들:
+{clues_json}
+
+규칙:
+1. 질문에 대해 적절한 정보만 제공
+2. 너무 쉽게 답을 알려주지 않음
+3. 단서를 발견했을 때만 해당 정보 공개
+4. 자연스럽고 몰입감 있게 답변
+5. 한국어로 답변"""
+    
+    def _dossier(self, context: MysterySession) -> str:
+        if not context.dossier:
+            context.dossier = self._compile_dossier(context.mystery)
+        return context.dossier
+    
+    def _pool_key(self, difficulty: str, model: str) -> Optional[tuple]:
+        if difficulty in DIFFICULTY_SETTINGS and model in POOLED_MODELS:
+            return (difficulty, model)
+        return None
+    
+    def _creation_prompts(self, difficulty: str) -> tuple:
+        """사건 생성용 (system_prompt, 사용자 프롬프트)"""
+        settings = DIFFICULTY_SETTINGS.get(difficulty, DIFFICULTY_SETTINGS["normal"])
         
         system_prompt = f"""당신은 추리 게임 마스터입니다. 다음 조건으로 미스터리 사건을 생성하세요:
 
@@ -80,225 +232,215 @@ JSON 형식으로 응답:
 4. 함정 단서는 다른 용의자를 의심하게 만드는 내용"""
 
         creation_prompt = f"난이도 {difficulty}의 새로운 추리 사건을 생성해주세요."
+        return system_prompt, creation_prompt
+    
+    async def _generate_mystery(self, key: tuple, priority: int = PRIORITY_BACKGROUND, deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
+        """AI로 사건을 생성하고 검증까지 통과한 경우에만 반환
+
+        플레이어마다 다른 사건이 필요하므로 동일 요청 합치기는 쓰지 않습니다.
+        풀 채우기는 백그라운드 우선순위로, 즉시 생성 경로는 대화형 우선순위로 호출합니다.
+        """
+        difficulty, model = key
+        system_prompt, creation_prompt = self._creation_prompts(difficulty)
         
         # AI로부터 추리 사건 생성
-        mystery_response = self.ai_service.generate_response(creation_prompt, [], model, system_prompt=system_prompt)
+        mystery_response = await self.ai_service.generate_response(creation_prompt, [], model, system_prompt=system_prompt, priority=priority, deadline=deadline)
         
         try:
             # JSON 파싱 시도
             mystery_data = json.loads(mystery_response)
-            
-            # 게임 세션 컨텍스트 저장
-            self.mystery_contexts[session_id] = {
-                "mystery": mystery_data,
-                "difficulty": difficulty,
-                "model": model,
-                "questions_asked": [],
-                "clues_found": [],
-                "max_questions": settings["clues"] + 3,
-                "solved": False,
-                "attempts": 0
-            }
-            
-            return {
-                "session_id": session_id,
-                "case_title": mystery_data["case_title"],
-                "case_description": mystery_data["case_description"],
-                "location": mystery_data["location"],
-                "victim": mystery_data["victim"],
-                "suspects": [
-                    {
-                        "name": suspect["name"],
-                        "description": suspect["description"],
-                        "alibi": suspect["alibi"]
-                    } for suspect in mystery_data["suspects"]
-                ],
-                "max_questions": settings["clues"] + 3,
-                "difficulty": settings["description"]
-            }
-            
         except json.JSONDecodeError:
-            return {"error": "사건 생성 중 오류가 발생했습니다"}
+            return None
+        
+        if not self._validate_mystery(mystery_data):
+            print(f"Invalid mystery generated for {key}")
+            return None
+        return mystery_data
+    
+    def _validate_mystery(self, mystery_data: Any) -> bool:
+        """게임 진행에 필요한 필드와 진범 설정이 올바른지 확인"""
+        if not isinstance(mystery_data, dict):
+            return False
+        for field in ("case_title", "case_description", "location", "victim", "suspects", "clues", "solution"):
+            if field not in mystery_data:
+                return False
+        
+        suspects = mystery_data["suspects"]
+        if not isinstance(suspects, list) or not suspects:
+            return False
+        for suspect in suspects:
+            if not isinstance(suspect, dict) or not all(k in suspect for k in ("name", "description", "alibi")):
+                return False
+        
+        if not isinstance(mystery_data["clues"], list):
+            return False
+        for clue in mystery_data["clues"]:
+            if not isinstance(clue, dict) or "description" not in clue:
+                return False
+        
+        # 진범은 정확히 한 명이고 solution과 일치해야 함
+        culprits = [suspect["name"] for suspect in suspects if suspect.get("is_culprit")]
+        solution = mystery_data["solution"]
+        if len(culprits) != 1 or not isinstance(solution, dict):
+            return False
+        return str(solution.get("culprit", "")).strip() == str(culprits[0]).strip()
     
-    def ask_question(self, session_id: str, question: str) -> Dict[str, Any]:
+    async def ask_question(self, session_id: str, question: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """질문하기"""
-        if session_id not in self.mystery_contexts:
+        context = await self.mystery_contexts.aget(session_id)
+        if context is None:
             return {"error": "게임 세션을 찾을 수 없습니다"}
         
-        context = self.mystery_contexts[session_id]
-        
-        if context["solved"]:
+        if context.solved:
             return {"error": "이미 해결된 사건입니다"}
         
-        if len(context["questions_asked"]) >= context["max_questions"]:
-            return {"error": f"최대 질문 수({context['max_questions']}개)에 도달했습니다"}
+        if len(context.questions_asked) >= context.max_questions:
+            return {"error": f"최대 질문 수({context.max_questions}개)에 도달했습니다"}
         
         # 질문 기록
-        context["questions_asked"].append(question)
+        context.questions_asked.append(question)
         
         # AI에게 질문에 대한 답변 요청
-        mystery_info = context["mystery"]
+        mystery_info = context.mystery
         
-        system_prompt = f"""당신은 추리 게임의 NPC입니다. 다음 사건 정보를 바탕으로 플레이어의 질문에 답하세요:
-
-사건 정보:
-- 제목: {mystery_info['case_title']}
-- 상황: {mystery_info['case_description']}
-- 장소: {mystery_info['location']}
-- 피해자: {mystery_info['victim']}
-
-용의자들:
-{json.dumps(mystery_info['suspects'], ensure_ascii=False, indent=2)}
-
-단서들:
-{json.dumps(mystery_info['clues'], ensure_ascii=False, indent=2)}
-
-규칙:
-1. 질문에 대해 적절한 정보만 제공
-2. 너무 쉽게 답을 알려주지 않음
-3. 단서를 발견했을 때만 해당 정보 공개
-4. 자연스럽고 몰입감 있게 답변
-5. 한국어로 답변
-
-플레이어 질문: {question}"""
+        # 사건 파일은 생성 시 한 번만 만든 고정 prefix를 그대로 사용 (질문은 user 턴으로)
+        system_prompt = self._dossier(context)
 
         answer_prompt = f"플레이어가 '{question}'라고 질문했습니다. 적절한 답변을 해주세요."
         
         # AI로부터 답변 생성
-        answer_response = self.ai_service.generate_response(answer_prompt, [], context["model"], system_prompt=system_prompt)
+        answer_response = await self.ai_service.generate_response(
+            answer_prompt, [], context.model, system_prompt=system_prompt,
+            cache_system=True, usage=context.prompt_usage, deadline=deadline
+        )
         
         # 새로운 단서 발견 체크
         new_clue = self._check_new_clue(question, mystery_info["clues"])
-        if new_clue and new_clue not in context["clues_found"]:
-            context["clues_found"].append(new_clue)
+        if new_clue:
+            context.find_clue(new_clue)
+        self.mystery_contexts.save(session_id, context)
         
         return {
             "answer": answer_response,
-            "question_count": len(context["questions_asked"]),
-            "max_questions": context["max_questions"],
+            "question_count": len(context.questions_asked),
+            "max_questions": context.max_questions,
             "new_clue": new_clue,
-            "total_clues_found": len(context["clues_found"])
+            "total_clues_found": len(context.clues_found)
         }
     
-    def ask_question_stream(self, session_id: str, question: str):
+    async def ask_question_stream(self, session_id: str, question: str, deadline: Optional[Deadline] = None):
         """질문하기 (스트리밍)"""
-        if session_id not in self.mystery_contexts:
+        context = await self.mystery_contexts.aget(session_id)
+        if context is None:
             yield "오류: 게임 세션을 찾을 수 없습니다"
             return
         
-        context = self.mystery_contexts[session_id]
-        
-        if context["solved"]:
+        if context.solved:
             yield "이미 해결된 사건입니다"
             return
         
-        if len(context["questions_asked"]) >= context["max_questions"]:
-            yield f"최대 질문 수({context['max_questions']}개)에 도달했습니다"
+        if len(context.questions_asked) >= context.max_questions:
+            yield f"최대 질문 수({context.max_questions}개)에 도달했습니다"
             return
         
         # 질문 기록
-        context["questions_asked"].append(question)
+        context.questions_asked.append(question)
         
         # AI에게 질문에 대한 답변 요청
-        mystery_info = context["mystery"]
+        mystery_info = context.mystery
         
-        system_prompt = f"""당신은 추리 게임의 NPC입니다. 다음 사건 정보를 바탕으로 플레이어의 질문에 답하세요:
-
-사건 정보:
-- 제목: {mystery_info['case_title']}
-- 상황: {mystery_info['case_description']}
-- 장소: {mystery_info['location']}
-- 피해자: {mystery_info['victim']}
-
-용의자들:
-{json.dumps(mystery_info['suspects'], ensure_ascii=False, indent=2)}
-
-단서들:
-{json.dumps(mystery_info['clues'], ensure_ascii=False, indent=2)}
-
-규칙:
-1. 질문에 대해 적절한 정보만 제공
-2. 너무 쉽게 답을 알려주지 않음
-3. 단서를 발견했을 때만 해당 정보 공개
-4. 자연스럽고 몰입감 있게 답변
-5. 한국어로 답변
-
-플레이어 질문: {question}"""
+        # 사건 파일은 생성 시 한 번만 만든 고정 prefix를 그대로 사용 (질문은 user 턴으로)
+        system_prompt = self._dossier(context)
 
         answer_prompt = f"플레이어가 '{question}'라고 질문했습니다. 적절한 답변을 해주세요."
         
         # AI 서비스에서 스트리밍으로 답변 생성
-        from ..services.ai_service import AIService
-        ai_service = AIService()
+        from ..services.ai_service import ai_service
         
         answer_chunks = []
-        for chunk in ai_service.stream_chat(answer_prompt, [], context["model"], system_prompt=system_prompt):
-            answer_chunks.append(chunk)
-            yield chunk
+        try:
+            async for chunk in ai_service.stream_chat(
+                answer_prompt, [], context.model, system_prompt=system_prompt,
+                cache_system=True, usage=context.prompt_usage, route="mystery.question",
+                deadline=deadline
+            ):
+                answer_chunks.append(chunk)
+                yield chunk
+        except BaseException:
+            # 답변을 끝까지 받지 못한 질문(연결 끊김, 프로바이더 오류)은 질문 횟수에서 제외
+            if context.questions_asked and context.questions_asked[-1] == question:
+                context.questions_asked.pop()
+            raise
         
         # 완전한 답변을 대화 기록에 저장하고 새로운 단서 확인
         complete_answer = ''.join(answer_chunks)
         new_clue = self._check_new_clue(question, mystery_info["clues"])
-        if new_clue and new_clue not in context["clues_found"]:
-            context["clues_found"].append(new_clue)
+        if new_clue:
+            context.find_clue(new_clue)
+        self.mystery_contexts.save(session_id, context)
     
-    def make_accusation(self, session_id: str, accused_name: str, reasoning: str) -> Dict[str, Any]:
+    async def make_accusation(self, session_id: str, accused_name: str, reasoning: str) -> Dict[str, Any]:
         """범인 지목하기"""
-        if session_id not in self.mystery_contexts:
+        context = await self.mystery_contexts.aget(session_id)
+        if context is None:
             return {"error": "게임 세션을 찾을 수 없습니다"}
+        mystery_info = context.mystery
         
-        context = self.mystery_contexts[session_id]
-        mystery_info = context["mystery"]
-        
-        context["attempts"] += 1
+        context.attempts += 1
         
         # 정답 확인
         correct_culprit = mystery_info["solution"]["culprit"]
         is_correct = accused_name.strip() == correct_culprit.strip()
+        # 맞히거나 3번 틀리면 게임 종료
+        if is_correct or context.attempts >= 3:
+            context.solved = True
+        self.mystery_contexts.save(session_id, context)
         
         if is_correct:
-            context["solved"] = True
             return {
                 "correct": True,
                 "message": f"정답입니다! {accused_name}이(가) 진범입니다.",
                 "solution": mystery_info["solution"],
-                "attempts": context["attempts"],
-                "questions_used": len(context["questions_asked"])
+                "attempts": context.attempts,
+                "questions_used": len(context.questions_asked)
             }
         else:
             # 3번 틀리면 게임 오버
-            if context["attempts"] >= 3:
-                context["solved"] = True
+            if context.attempts >= 3:
                 return {
                     "correct": False,
                     "game_over": True,
                     "message": f"3번 모두 틀렸습니다. 정답은 {correct_culprit}이었습니다.",
                     "solution": mystery_info["solution"],
-                    "attempts": context["attempts"]
+                    "attempts": context.attempts
                 }
             else:
                 return {
                     "correct": False,
-                    "message": f"틀렸습니다. {accused_name}은(는) 범인이 아닙니다. ({context['attempts']}/3 시도)",
-                    "attempts": context["attempts"],
-                    "remaining_attempts": 3 - context["attempts"]
+                    "message": f"틀렸습니다. {accused_name}은(는) 범인이 아닙니다. ({context.attempts}/3 시도)",
+                    "attempts": context.attempts,
+                    "remaining_attempts": 3 - context.attempts
                 }
     
-    def get_game_status(self, session_id: str) -> Dict[str, Any]:
+    async def get_game_status(self, session_id: str) -> Dict[str, Any]:
         """게임 상태 조회"""
-        if session_id not in self.mystery_contexts:
+        context = await self.mystery_contexts.aget(session_id)
+        if context is None:
             return {"error": "게임 세션을 찾을 수 없습니다"}
         
-        context = self.mystery_contexts[session_id]
-        
         return {
             "session_id": session_id,
-            "questions_asked": len(context["questions_asked"]),
-            "max_questions": context["max_questions"],
-            "clues_found": len(context["clues_found"]),
-            "attempts": context["attempts"],
-            "solved": context["solved"],
-            "difficulty": context["difficulty"]
+            "questions_asked": len(context.questions_asked),
+            "max_questions": context.max_questions,
+            "clues_found": len(context.clues_found),
+            "attempts": context.attempts,
+            "solved": context.solved,
+            "difficulty": context.difficulty,
+            "prompt_cache": {
+                "input_tokens": context.prompt_usage.get("input_tokens", 0),
+                "cache_read_tokens": context.prompt_usage.get("cache_read_tokens", 0),
+                "cache_write_tokens": context.prompt_usage.get("cache_write_tokens", 0)
+            }
         }
     
     def _check_new_clue(self, question: str, clues: List[Dict]) -> Optional[Dict]:
@@ -0,0 +1,171 @@
+import os
+import httpx
+from openai import AsyncOpenAI
+from anthropic import AsyncAnthropic
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+
+# .env 파일 로드
+load_dotenv()
+
+# HTTP/2는 h2 패키지가 설치된 경우에만 사용 가능
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+
+
+class ProviderError(Exception):
+    """사용자에게 그대로 보여줄 수 있는 메시지를 가진 프로바이더 오류"""
+
+
+class ProviderNotConfigured(ProviderError):
+    """API 키가 없어 프로바이더를 사용할 수 없음"""
+
+
+def provider_for(model: str) -> str:
+    """모델 이름(예: openai-gpt3.5)이 속한 프로바이더 이름"""
+    if model.startswith("claude-"):
+        return "anthropic"
+    if model.startswith("deepseek-"):
+        return "deepseek"
+    return "openai"
+
+
+class ProviderPool:
+    """프로바이더별 keep-alive 커넥션 풀 (httpx.AsyncClient) 및 통계"""
+
+    def __init__(self, name: str, limits: httpx.Limits, timeout: httpx.Timeout, http2: bool = False, base_url: str = ""):
+        self.name = name
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=limits,
+            timeout=timeout,
+            http2=self.http2,
+            event_hooks={"request": [self._on_request]},
+        )
+
+    async def _on_request(self, request: httpx.Request):
+        """요청마다 카운트하고 httpcore trace 훅으로 새 커넥션 생성을 추적"""
+        self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name: str, info: dict):
+        # httpcore는 AsyncClient 경로에서 trace 콜백을 await 하므로 코루틴이어야 함
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """요청 수, 새로 연 커넥션 수와 커넥션 재사용 비율"""
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "http2": self.http2,
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0,
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class ProviderRegistry:
+    """프로세스 전역에서 공유하는 AI 프로바이더 클라이언트 레지스트리"""
+
+    def __init__(self):
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("AI_POOL_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("AI_POOL_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("AI_POOL_KEEPALIVE_EXPIRY", "30")),
+        )
+        self.timeout = httpx.Timeout(
+            float(os.getenv("AI_HTTP_TIMEOUT", "60")),
+            connect=float(os.getenv("AI_HTTP_CONNECT_TIMEOUT", "10")),
+        )
+        self.http2 = os.getenv("AI_HTTP2", "true").lower() in ("1", "true", "yes")
+
+        self.openai_key = os.getenv("OPENAI_API_KEY")
+        self.anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+        self.deepseek_key = os.getenv("DEEPSEEK_API_KEY")
+        print(f"OpenAI key exists: {'Yes' if self.openai_key else 'No'}")
+        print(f"Anthropic key exists: {'Yes' if self.anthropic_key else 'No'}")
+        print(f"DeepSeek key exists: {'Yes' if self.deepseek_key else 'No'}")
+
+        self.pools: Dict[str, ProviderPool] = {}
+        self._openai_client: Optional[AsyncOpenAI] = None
+        self._anthropic_client: Optional[AsyncAnthropic] = None
+
+    def pool(self, name: str, http2: bool = True, base_url: str = "") -> ProviderPool:
+        """프로바이더 이름별 커넥션 풀 (최초 사용 시 생성)"""
+        if name not in self.pools:
+            self.pools[name] = ProviderPool(name, self.limits, self.timeout, http2=self.http2 and http2, base_url=base_url)
+        return self.pools[name]
+
+    def openai_client(self) -> Optional[AsyncOpenAI]:
+        if not self.openai_key:
+            return None
+        if self._openai_client is None:
+            self._openai_client = AsyncOpenAI(
+                api_key=self.openai_key,
+                timeout=self.timeout,
+                # 재시도는 요청 마감 시각을 아는 resilience 계층에서만 수행
+                max_retries=0,
+                http_client=self.pool("openai").client,
+            )
+        return self._openai_client
+
+    def anthropic_client(self) -> Optional[AsyncAnthropic]:
+        if not self.anthropic_key:
+            return None
+        if self._anthropic_client is None:
+            self._anthropic_client = AsyncAnthropic(
+                api_key=self.anthropic_key,
+                timeout=self.timeout,
+                # 재시도는 요청 마감 시각을 아는 resilience 계층에서만 수행
+                max_retries=0,
+                http_client=self.pool("anthropic").client,
+            )
+        return self._anthropic_client
+
+    def deepseek_client(self) -> Optional[httpx.AsyncClient]:
+        if not self.deepseek_key:
+            return None
+        # DeepSeek 엔드포인트의 HTTP/2 지원이 문서화되어 있지 않아 HTTP/1.1 keep-alive만 사용
+        return self.pool("deepseek", http2=False, base_url=DEEPSEEK_BASE_URL).client
+
+    def has_provider(self, model: str) -> bool:
+        """모델 이름에 해당하는 프로바이더의 API 키가 설정되어 있는지"""
+        keys = {"openai": self.openai_key, "anthropic": self.anthropic_key, "deepseek": self.deepseek_key}
+        return bool(keys[provider_for(model)])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry,
+            },
+            "pools": {name: pool.stats() for name, pool in self.pools.items()},
+        }
+
+    async def aclose(self):
+        """애플리케이션 종료 시 모든 커넥션 풀 정리"""
+        for pool in self.pools.values():
+            await pool.aclose()
+        self.pools = {}
+        self._openai_client = None
+        self._anthropic_client = None
+
+
+# 전역 ProviderRegistry 인스턴스
+registry = ProviderRegistry()
@@ -0,0 +1,296 @@
+import os
+import time
+import random
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+import openai
+import anthropic
+
+from .provider_registry import ProviderError, provider_for
+
+
+class DeadlineExceeded(ProviderError):
+    """요청에 할당된 시간 안에 프로바이더 응답을 받지 못함"""
+
+    def __init__(self):
+        super().__init__("AI 응답 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.")
+
+
+class CircuitOpen(ProviderError):
+    """최근 실패가 많아 프로바이더 호출을 잠시 차단한 상태"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__("AI 서비스가 일시적으로 불안정합니다. 잠시 후 다시 시도해주세요.")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """라우터에서 만들어 프로바이더 호출까지 전달하는 요청 마감 시각"""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+REQUEST_DEADLINE = float(os.getenv("AI_REQUEST_DEADLINE", "60"))
+
+
+def request_deadline(seconds: Optional[float] = None) -> Deadline:
+    """요청 진입 시점의 마감 시각 (기본값 AI_REQUEST_DEADLINE초)"""
+    return Deadline(REQUEST_DEADLINE if seconds is None else seconds)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """일시적인 장애(타임아웃, 연결 실패, 429, 5xx)만 재시도/차단 대상으로 판단"""
+    if isinstance(error, DeadlineExceeded):
+        return True
+    if isinstance(error, ProviderError):
+        # 설정 누락, 과부하(우리 쪽 대기열), 차단 상태 등은 프로바이더 장애가 아님
+        return False
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if isinstance(error, (openai.APIConnectionError, anthropic.APIConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status == 429 or (isinstance(status, int) and status >= 500)
+
+
+class CircuitBreaker:
+    """프로바이더별 서킷 브레이커
+
+    - closed: 연속 failure_threshold번 실패하면 open
+    - open: recovery_time 동안 즉시 CircuitOpen으로 실패
+    - half_open: recovery_time이 지나면 half_open_probes개의 시험 요청만 통과, 성공 시 closed
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_time: float = 30.0, half_open_probes: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.half_open_probes = half_open_probes
+
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+
+        self.failures = 0
+        self.successes = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+
+    def raise_if_open(self):
+        """대기열에 들어가기 전에 차단 상태인지 확인 (상태는 바꾸지 않음)"""
+        if self.state == "open":
+            waited = time.monotonic() - self.opened_at
+            if waited < self.recovery_time:
+                self.short_circuited += 1
+                raise CircuitOpen(self.name, retry_after=self.recovery_time - waited)
+
+    def before_call(self):
+        self.raise_if_open()
+        if self.state == "open":
+            # 복구 대기 시간이 지나면 시험 요청만 통과
+            self.state = "half_open"
+            self._probes = 0
+        if self.state == "half_open":
+            if self._probes >= self.half_open_probes:
+                self.short_circuited += 1
+                raise CircuitOpen(self.name, retry_after=1.0)
+            self._probes += 1
+
+    def record_success(self):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.state = "closed"
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                print(f"[circuit] {self.name} opened after {self.consecutive_failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_ignored(self):
+        """프로바이더 장애와 무관하게 끝난 호출 (half_open 시험 슬롯만 반환)"""
+        if self.state == "half_open" and self._probes > 0:
+            self._probes -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failures": self.failures,
+            "successes": self.successes,
+            "short_circuited": self.short_circuited,
+            "times_opened": self.times_opened,
+        }
+
+
+class Resilience:
+    """마감 시각 안에서 지터 재시도 + 서킷 브레이커로 프로바이더 호출을 감쌈"""
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.25,
+        max_delay: float = 4.0,
+        stream_idle_timeout: float = 30.0,
+        failure_threshold: int = 5,
+        recovery_time: float = 30.0,
+    ):
+        self.attempts = max(attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stream_idle_timeout = stream_idle_timeout
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+        self.retries = 0
+        self.deadline_exceeded = 0
+
+    @classmethod
+    def from_env(cls) -> "Resilience":
+        return cls(
+            attempts=int(os.getenv("AI_RETRY_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("AI_RETRY_BASE_DELAY", "0.25")),
+            max_delay=float(os.getenv("AI_RETRY_MAX_DELAY", "4")),
+            stream_idle_timeout=float(os.getenv("AI_STREAM_IDLE_TIMEOUT", "30")),
+            failure_threshold=int(os.getenv("AI_BREAKER_FAILURES", "5")),
+            recovery_time=float(os.getenv("AI_BREAKER_RECOVERY", "30")),
+        )
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        provider = provider_for(model)
+        if provider not in self.breakers:
+            self.breakers[provider] = CircuitBreaker(provider, self.failure_threshold, self.recovery_time)
+        return self.breakers[provider]
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter: 0 ~ min(max_delay, base_delay * 2^attempt)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _record(self, breaker: CircuitBreaker, error: Optional[BaseException]):
+        if error is None:
+            breaker.record_success()
+        elif is_retryable(error):
+            breaker.record_failure()
+        else:
+            breaker.record_ignored()
+
+    async def _sleep_before_retry(self, attempt: int, deadline: Deadline, error: BaseException):
+        """남은 시간 안에 다시 시도할 수 있으면 대기, 아니면 마지막 오류를 그대로 발생"""
+        delay = self._backoff(attempt)
+        if attempt + 1 >= self.attempts or not is_retryable(error) or delay >= deadline.remaining():
+            raise error
+        self.retries += 1
+        await asyncio.sleep(delay)
+
+    async def call(self, model: str, deadline: Deadline, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """완료형 호출: 시도마다 남은 시간을 타임아웃으로 사용"""
+        breaker = self.breaker(model)
+        attempt = 0
+        while True:
+            if deadline.expired:
+                self.deadline_exceeded += 1
+                raise DeadlineExceeded()
+            breaker.before_call()
+            try:
+                result = await asyncio.wait_for(factory(), timeout=deadline.remaining())
+            except asyncio.TimeoutError:
+                self.deadline_exceeded += 1
+                error = DeadlineExceeded()
+                self._record(breaker, error)
+                raise error
+            except Exception as e:
+                self._record(breaker, e)
+                await self._sleep_before_retry(attempt, deadline, e)
+                attempt += 1
+                continue
+            except BaseException:
+                # 호출자 취소 등: 시험 요청 슬롯만 반환
+                breaker.record_ignored()
+                raise
+            self._record(breaker, None)
+            return result
+
+    async def stream(self, model: str, deadline: Deadline, factory: Callable[[], AsyncIterator[str]]) -> AsyncGenerator[str, None]:
+        """스트리밍 호출: 첫 청크까지는 마감 시각, 이후에는 청크 간 stream_idle_timeout 적용
+
+        첫 청크를 보내기 전에 실패한 경우에만 재시도합니다 (이미 보낸 토큰을 중복 전송하지 않도록).
+        """
+        breaker = self.breaker(model)
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            if deadline.expired:
+                self.deadline_exceeded += 1
+                raise DeadlineExceeded()
+            breaker.before_call()
+            stream = factory()
+            received = False
+            recorded = False
+            try:
+                try:
+                    # 시도마다 타임아웃 컨텍스트 하나: 첫 청크까지는 마감 시각, 이후에는 청크마다 유휴 시한으로 재설정
+                    async with asyncio.timeout(deadline.remaining()) as watchdog:
+                        async for chunk in stream:
+                            if not received:
+                                received = True
+                                # 첫 청크가 오면 프로바이더는 정상으로 판단
+                                self._record(breaker, None)
+                                recorded = True
+                            # 호출자가 청크를 처리하는 동안은 시간을 재지 않음
+                            watchdog.reschedule(None)
+                            yield chunk
+                            watchdog.reschedule(loop.time() + self.stream_idle_timeout)
+                except TimeoutError:
+                    self.deadline_exceeded += 1
+                    raise DeadlineExceeded()
+            except Exception as e:
+                if received:
+                    raise
+                self._record(breaker, e)
+                recorded = True
+                await self._sleep_before_retry(attempt, deadline, e)
+                attempt += 1
+                continue
+            finally:
+                if not recorded:
+                    # 호출자 취소 등 결과 없이 끝난 경우 시험 요청 슬롯만 반환
+                    breaker.record_ignored()
+                await stream.aclose()
+
+            if not received:
+                self._record(breaker, None)
+            return
+
+    def health(self) -> Dict[str, Any]:
+        """프로바이더별 서킷 상태 (health 출력용)"""
+        return {name: breaker.state for name, breaker in self.breakers.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "deadline_exceeded": self.deadline_exceeded,
+            "breakers": {name: breaker.stats() for name, breaker in self.breakers.items()},
+        }
+
+
+# 전역 Resilience 인스턴스
+resilience = Resilience.from_env()
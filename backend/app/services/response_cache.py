@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# .env 파일 로드
+load_dotenv()
+
+
+def request_key(model: str, messages: List[dict], **params) -> str:
+    """(model, system_prompt, messages) 요청을 정규화한 뒤 해시한 캐시 키"""
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CachePolicy:
+    """호출 지점별 캐시 사용 정책 (generate_response에 명시적으로 전달해야 캐시됨)"""
+
+    __slots__ = ("ttl", "disk")
+
+    def __init__(self, ttl: float = 600.0, disk: bool = False):
+        self.ttl = ttl
+        self.disk = disk
+
+
+class ResponseCache:
+    """생성 결과 캐시: 바이트 크기로 제한되는 LRU + TTL, 선택적 디스크 계층
+
+    get/set 인터페이스만 맞추면 다른 구현(예: Redis)으로 교체할 수 있습니다.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        # key -> (expires_at, value, size)
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value, _ = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+
+        if self.disk_dir:
+            stored = await asyncio.to_thread(self._read_disk, key)
+            if stored is not None:
+                expires_at, value = stored
+                self._store_memory(key, value, expires_at)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str, policy: CachePolicy):
+        expires_at = time.time() + policy.ttl
+        self._store_memory(key, value, expires_at)
+        if policy.disk and self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, value, expires_at)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+    def _store_memory(self, key: str, value: str, expires_at: float):
+        size = len(key) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, value, size)
+        self.current_bytes += size
+
+        # 용량 초과 시 가장 오래 사용되지 않은 항목부터 제거
+        while self.current_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if stored["expires_at"] <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return stored["expires_at"], stored["value"]
+
+    def _write_disk(self, key: str, value: str, expires_at: float):
+        # 임시 파일에 쓴 뒤 교체하여 재시작/동시 쓰기 중에도 깨진 파일이 남지 않도록 함
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Response cache disk write error: {e}")
+
+
+# 전역 ResponseCache 인스턴스
+response_cache = ResponseCache(
+    max_bytes=int(os.getenv("AI_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    disk_dir=os.getenv("AI_CACHE_DIR") or None,
+)
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .metrics import SESSION_DB_FLUSH_SECONDS, SESSION_DB_PENDING, SESSION_DB_WRITES
+
+# (store, session_id)
+RowKey = Tuple[str, str]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    store TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (store, session_id)
+)
+"""
+
+
+class SQLiteSessionBackend:
+    """게임 세션을 로컬 SQLite(WAL)에 보관하는 영속 계층
+
+    - 쓰기: save()는 메모리 대기열에만 넣고, flush_interval마다 모인 변경을 한 트랜잭션으로 커밋 (write-behind)
+      같은 세션을 여러 번 저장해도 flush 시점의 최신 상태 한 번만 씀
+    - 읽기: SessionStore의 메모리 캐시에 없을 때만 asyncio.to_thread 작업 스레드에서 조회
+      (WAL이라 커밋 중에도 읽기가 막히지 않음)
+    여러 워커가 같은 파일을 공유하며, 같은 세션을 동시에 고치면 마지막으로 커밋한 쪽이 남습니다.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.5, retention: float = 7 * 24 * 3600.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.retention = retention
+        # 대기 중인 변경: (store, session_id) -> (세션 또는 삭제면 None, updated_at, 직렬화 함수)
+        self._pending: Dict[RowKey, Tuple[Any, float, Optional[Callable[[Any], str]]]] = {}
+        self._reader: Optional[sqlite3.Connection] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._flusher: Optional[asyncio.Task] = None
+        # 종료 중 취소된 커밋 스레드와 마지막 flush가 겹치지 않도록 쓰기 연결을 직렬화
+        self._write_lock = threading.Lock()
+        # 읽기 연결 하나를 여러 작업 스레드가 번갈아 쓰므로 조회를 직렬화
+        self._read_lock = threading.Lock()
+
+        self.flushes = 0
+        self.rows_written = 0
+        self.flush_errors = 0
+        self.reads = 0
+        self._pending_gauge = SESSION_DB_PENDING.labels()
+        self._flush_seconds = SESSION_DB_FLUSH_SECONDS.labels()
+        self._writes = SESSION_DB_WRITES.labels()
+
+    @classmethod
+    def from_env(cls) -> Optional["SQLiteSessionBackend"]:
+        """SESSION_DB_PATH가 비어 있으면 영속 계층 없이 메모리만 사용"""
+        path = os.getenv("SESSION_DB_PATH", "data/sessions.db")
+        if not path:
+            return None
+        return cls(
+            path,
+            flush_interval=float(os.getenv("SESSION_DB_FLUSH_INTERVAL", "0.5")),
+            retention=float(os.getenv("SESSION_DB_RETENTION", str(7 * 24 * 3600))),
+        )
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=check_same_thread, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL에서는 NORMAL이면 커밋마다 fsync하지 않아도 DB가 깨지지 않음
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(SCHEMA)
+        return conn
+
+    def _read(self, sql: str, params: tuple) -> Optional[tuple]:
+        with self._read_lock:
+            if self._reader is None:
+                self._reader = self._connect(check_same_thread=False)
+            return self._reader.execute(sql, params).fetchone()
+
+    def load(self, store: str, session_id: str, loads: Callable[[str], Any] = json.loads) -> Optional[Tuple[Any, float]]:
+        """저장된 세션과 updated_at (대기열에 있는 최신 변경을 우선)"""
+        pending = self._pending.get((store, session_id))
+        if pending is not None:
+            context, updated_at, _ = pending
+            return (context, updated_at) if context is not None else None
+        self.reads += 1
+        row = self._read("SELECT data, updated_at FROM sessions WHERE store = ? AND session_id = ?", (store, session_id))
+        if row is None:
+            return None
+        return loads(row[0]), row[1]
+
+    def updated_at(self, store: str, session_id: str) -> Optional[float]:
+        """다른 워커가 고쳤는지 확인하는 가벼운 조회"""
+        self.reads += 1
+        row = self._read("SELECT updated_at FROM sessions WHERE store = ? AND session_id = ?", (store, session_id))
+        return row[0] if row else None
+
+    def is_pending(self, store: str, session_id: str) -> bool:
+        return (store, session_id) in self._pending
+
+    def save(self, store: str, session_id: str, context: Any, dumps: Callable[[Any], str] = json.dumps) -> float:
+        updated_at = time.time()
+        self._pending[(store, session_id)] = (context, updated_at, dumps)
+        self._pending_gauge.set(len(self._pending))
+        return updated_at
+
+    def delete(self, store: str, session_id: str):
+        self._pending[(store, session_id)] = (None, time.time(), None)
+        self._pending_gauge.set(len(self._pending))
+
+    def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        # 종료 전에 남은 변경을 모두 기록
+        await self.flush()
+        with self._write_lock, self._read_lock:
+            for conn in (self._reader, self._writer):
+                if conn is not None:
+                    conn.close()
+            self._reader = self._writer = None
+
+    async def _flush_loop(self):
+        last_purge = 0.0
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() - last_purge > 3600:
+                last_purge = time.monotonic()
+                await asyncio.to_thread(self._purge, time.time() - self.retention)
+
+    async def flush(self):
+        """대기 중인 변경을 한 트랜잭션으로 커밋"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._pending_gauge.set(0)
+        # 세션은 이벤트 루프에서만 수정되므로 직렬화는 여기서 하고 커밋만 스레드로 보냄
+        rows = [
+            (store, session_id, None if context is None else dumps(context), updated_at)
+            for (store, session_id), (context, updated_at, dumps) in batch.items()
+        ]
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(self._commit, rows)
+        except Exception as e:
+            self.flush_errors += 1
+            print(f"[session-db] flush failed ({len(rows)} rows): {e}")
+            # 그 사이 새로 저장된 변경이 있으면 그쪽을 유지
+            for key, value in batch.items():
+                self._pending.setdefault(key, value)
+            self._pending_gauge.set(len(self._pending))
+            return
+        self._flush_seconds.observe(time.monotonic() - started)
+        self._writes.inc(len(rows))
+        self.flushes += 1
+        self.rows_written += len(rows)
+
+    def _write_conn(self) -> sqlite3.Connection:
+        if self._writer is None:
+            # 쓰기는 asyncio.to_thread 작업 스레드에서 _write_lock을 잡고만 실행됨
+            self._writer = self._connect(check_same_thread=False)
+        return self._writer
+
+    def _commit(self, rows):
+        with self._write_lock:
+            conn = self._write_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for store, session_id, data, updated_at in rows:
+                    if data is None:
+                        conn.execute("DELETE FROM sessions WHERE store = ? AND session_id = ?", (store, session_id))
+                    else:
+                        conn.execute(
+                            "INSERT INTO sessions (store, session_id, data, updated_at) VALUES (?, ?, ?, ?) "
+                            "ON CONFLICT(store, session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                            (store, session_id, data, updated_at),
+                        )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _purge(self, older_than: float):
+        with self._write_lock:
+            deleted = self._write_conn().execute("DELETE FROM sessions WHERE updated_at < ?", (older_than,)).rowcount
+        if deleted:
+            print(f"[session-db] purged {deleted} sessions older than retention")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "rows_per_flush": round(self.rows_written / self.flushes, 2) if self.flushes else 0.0,
+            "flush_errors": self.flush_errors,
+            "reads": self.reads,
+        }
+
+
+# 전역 세션 DB (SESSION_DB_PATH가 비어 있으면 None)
+session_db = SQLiteSessionBackend.from_env()
@@ -0,0 +1,181 @@
+import sys
+import json
+from array import array
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+
+# 직렬화 형식 버전 (리스트 첫 원소)
+FORMAT_VERSION = 1
+
+
+class EntryKind(IntEnum):
+    """story_history 항목 종류 (array('B')에 1바이트로 저장)"""
+    STORY = 0
+    CHOICE = 1
+
+
+CHOICE_PREFIX = "플레이어 선택: "
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    # 장르, 모델, "1번 선택" 같은 짧고 반복되는 문자열은 세션끼리 같은 객체를 공유
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class StoryHistory:
+    """스토리 기록: 항목 종류는 array('B'), 본문은 문자열 리스트에 나눠 보관
+
+    항목마다 {"type", "content"} 딕셔너리를 만들지 않고, 선택 항목은 접두어 없이 행동 텍스트만 저장해
+    읽을 때 CHOICE_PREFIX를 붙입니다.
+    """
+
+    __slots__ = ("kinds", "texts")
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.texts: List[str] = []
+
+    def append(self, kind: EntryKind, text: str):
+        self.kinds.append(kind)
+        self.texts.append(_intern(text) if kind == EntryKind.CHOICE else text)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def kind(self, index: int) -> EntryKind:
+        return EntryKind(self.kinds[index])
+
+    def content(self, index: int) -> str:
+        text = self.texts[index]
+        return CHOICE_PREFIX + text if self.kinds[index] == EntryKind.CHOICE else text
+
+    def contents(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        stop = len(self.texts) if stop is None else stop
+        return [self.content(index) for index in range(start, stop)]
+
+
+class StorySession:
+    """스토리 어드벤처 세션 하나"""
+
+    __slots__ = ("genre", "model", "history", "turn", "summary", "summarized_upto")
+
+    def __init__(self, genre: str, model: str, opening: Optional[str] = None):
+        self.genre = _intern(genre)
+        self.model = _intern(model)
+        self.history = StoryHistory()
+        self.turn = 1
+        # 오래된 턴을 접어 넣은 누적 요약 (StoryContextBuilder가 갱신)
+        self.summary = ""
+        self.summarized_upto = 0
+        if opening is not None:
+            self.history.append(EntryKind.STORY, opening)
+
+    def add_turn(self, action_text: str, story: str):
+        """플레이어 행동과 그에 이어진 스토리를 기록하고 턴을 넘김"""
+        self.history.append(EntryKind.CHOICE, action_text)
+        self.history.append(EntryKind.STORY, story)
+        self.turn += 1
+
+    def dumps(self) -> str:
+        """딕셔너리 키 없이 위치 기반 리스트로 직렬화"""
+        return json.dumps(
+            [FORMAT_VERSION, self.genre, self.model, self.turn, self.summary, self.summarized_upto,
+             self.history.kinds.tolist(), self.history.texts],
+            ensure_ascii=False, separators=(",", ":"),
+        )
+
+    @classmethod
+    def loads(cls, data: str) -> "StorySession":
+        raw = json.loads(data)
+        if isinstance(raw, dict):
+            return cls._from_dict(raw)
+        _, genre, model, turn, summary, summarized_upto, kinds, texts = raw
+        session = cls(genre, model)
+        session.turn = turn
+        session.summary = summary
+        session.summarized_upto = summarized_upto
+        # 항목별 append 대신 배열을 한 번에 구성
+        session.history.kinds = array("B", kinds)
+        session.history.texts = [_intern(text) if kind == EntryKind.CHOICE else text for kind, text in zip(kinds, texts)]
+        return session
+
+    @classmethod
+    def _from_dict(cls, raw: Dict[str, Any]) -> "StorySession":
+        # 이전 딕셔너리 형식으로 저장된 세션
+        session = cls(raw["genre"], raw["model"])
+        session.turn = raw.get("turn", 1)
+        session.summary = raw.get("summary", "")
+        session.summarized_upto = raw.get("summarized_upto", 0)
+        for item in raw.get("story_history", []):
+            if item["type"] == "choice":
+                session.history.append(EntryKind.CHOICE, item["content"].replace(CHOICE_PREFIX, "", 1))
+            else:
+                session.history.append(EntryKind.STORY, item["content"])
+        return session
+
+
+class MysterySession:
+    """추리 게임 세션 하나 (찾은 단서는 mystery["clues"]의 인덱스로 보관)"""
+
+    __slots__ = (
+        "mystery", "difficulty", "model", "questions_asked", "clues_found",
+        "max_questions", "solved", "attempts", "dossier", "prompt_usage",
+    )
+
+    def __init__(self, mystery: Dict[str, Any], difficulty: str, model: str, max_questions: int, dossier: str = ""):
+        self.mystery = mystery
+        self.difficulty = _intern(difficulty)
+        self.model = _intern(model)
+        self.questions_asked: List[str] = []
+        self.clues_found = array("H")
+        self.max_questions = max_questions
+        self.solved = False
+        self.attempts = 0
+        # NPC 질문마다 재사용하는 바이트 단위로 고정된 사건 파일 (프롬프트 캐시 prefix)
+        self.dossier = dossier
+        # 질문 응답의 토큰 사용량 (프롬프트 캐시 적중 토큰 포함)
+        self.prompt_usage: Dict[str, int] = {}
+
+    def find_clue(self, clue: Dict[str, Any]) -> bool:
+        """아직 찾지 못한 단서면 기록하고 True"""
+        index = self.mystery["clues"].index(clue)
+        if index in self.clues_found:
+            return False
+        self.clues_found.append(index)
+        return True
+
+    def dumps(self) -> str:
+        return json.dumps(
+            [FORMAT_VERSION, self.mystery, self.difficulty, self.model, self.questions_asked,
+             self.clues_found.tolist(), self.max_questions, self.solved, self.attempts,
+             self.dossier, self.prompt_usage],
+            ensure_ascii=False, separators=(",", ":"),
+        )
+
+    @classmethod
+    def loads(cls, data: str) -> "MysterySession":
+        raw = json.loads(data)
+        if isinstance(raw, dict):
+            return cls._from_dict(raw)
+        _, mystery, difficulty, model, questions, clues, max_questions, solved, attempts, dossier, usage = raw
+        session = cls(mystery, difficulty, model, max_questions, dossier)
+        session.questions_asked = questions
+        session.clues_found.extend(clues)
+        session.solved = solved
+        session.attempts = attempts
+        session.prompt_usage = usage
+        return session
+
+    @classmethod
+    def _from_dict(cls, raw: Dict[str, Any]) -> "MysterySession":
+        # 이전 딕셔너리 형식으로 저장된 세션 (단서는 내용으로 인덱스를 찾음)
+        session = cls(raw["mystery"], raw["difficulty"], raw["model"], raw["max_questions"], raw.get("dossier", ""))
+        session.questions_asked = raw.get("questions_asked", [])
+        clues = raw["mystery"].get("clues", [])
+        for clue in raw.get("clues_found", []):
+            if clue in clues:
+                session.clues_found.append(clues.index(clue))
+        session.solved = raw.get("solved", False)
+        session.attempts = raw.get("attempts", 0)
+        session.prompt_usage = raw.get("prompt_usage", {})
+        return session
@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Set
+
+from .metrics import SESSION_BYTES, SESSION_ENTRIES, SESSION_EVICTIONS
+
+
+def dumps_session(value: Any) -> str:
+    """세션 클래스는 자체 dumps(), 그 외(딕셔너리 등)는 JSON"""
+    if hasattr(value, "dumps"):
+        return value.dumps()
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def estimate_size(value: Any) -> int:
+    """세션 하나의 대략적인 크기 (직렬화한 UTF-8 바이트 수 기준)"""
+    return len(dumps_session(value).encode("utf-8"))
+
+
+class SessionStore:
+    """게임 세션 컨텍스트 저장소: 메모리 예산 + 유휴 TTL + LRU 제거
+
+    dict처럼 `in`, [], get, pop으로 사용합니다(메모리 캐시만 봄). 꺼낸 세션은 호출자가 그대로 수정하므로
+    읽을 때마다 크기를 다시 재지 않고 '변경됨'으로 표시해 두었다가 sweeper가 주기적으로 다시 잽니다.
+    - idle_ttl초 동안 접근이 없는 세션은 sweeper가 제거
+    - 전체 크기가 max_bytes를 넘으면 가장 오래 사용되지 않은 세션부터 제거
+
+    backend가 있으면 메모리는 핫 캐시가 됩니다. 세션을 수정한 쪽은 save()로 알리고
+    (write-behind로 모아서 기록), 이벤트 루프에서는 aget()으로 꺼냅니다. aget()은 캐시에 없는 세션을
+    작업 스레드에서 backend로부터 읽어 오고, 캐시된 세션은 revalidate_interval마다 한 번
+    다른 워커가 더 최근에 저장했는지 확인합니다.
+    """
+
+    def __init__(self, name: str, max_bytes: int = 64 * 1024 * 1024, idle_ttl: float = 3600.0, sweep_interval: float = 30.0, backend=None, revalidate_interval: float = 1.0, session_type=None):
+        self.name = name
+        # backend에서 읽은 문자열을 되살릴 세션 클래스 (loads 클래스 메서드, 없으면 JSON)
+        self._deserialize = session_type.loads if session_type is not None else json.loads
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.backend = backend
+        self.revalidate_interval = revalidate_interval
+        # session_id -> 컨텍스트 (앞쪽이 가장 오래 사용되지 않은 세션)
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._last_access: Dict[str, float] = {}
+        self._dirty: Set[str] = set()
+        # backend 사용 시: 마지막 저장/로드 시각(updated_at)과 마지막 확인 시각
+        self._versions: Dict[str, float] = {}
+        self._checked: Dict[str, float] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        self.current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = {"idle": 0, "memory": 0}
+        self._entries_gauge = SESSION_ENTRIES.labels(name)
+        self._bytes_gauge = SESSION_BYTES.labels(name)
+
+    @classmethod
+    def from_env(cls, name: str, backend=None, session_type=None) -> "SessionStore":
+        """<NAME>_SESSION_MAX_BYTES / <NAME>_SESSION_IDLE_TTL, 공통 SESSION_SWEEP_INTERVAL / SESSION_REVALIDATE_INTERVAL"""
+        prefix = name.upper()
+        return cls(
+            name,
+            max_bytes=int(os.getenv(f"{prefix}_SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+            idle_ttl=float(os.getenv(f"{prefix}_SESSION_IDLE_TTL", "3600")),
+            sweep_interval=float(os.getenv("SESSION_SWEEP_INTERVAL", "30")),
+            backend=backend,
+            revalidate_interval=float(os.getenv("SESSION_REVALIDATE_INTERVAL", "1")),
+            session_type=session_type,
+        )
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __getitem__(self, session_id: str) -> Any:
+        context = self.get(session_id)
+        if context is None:
+            raise KeyError(session_id)
+        return context
+
+    def __setitem__(self, session_id: str, context: Any):
+        self._cache(session_id, context)
+        self.save(session_id, context)
+
+    def __delitem__(self, session_id: str):
+        if session_id not in self:
+            raise KeyError(session_id)
+        self.pop(session_id)
+
+    async def aget(self, session_id: str, default: Any = None) -> Any:
+        """캐시에 없거나 다른 워커가 고친 세션은 작업 스레드에서 backend를 읽은 뒤 get()"""
+        if session_id in self._entries:
+            await self._revalidate(session_id)
+        if session_id not in self._entries:
+            await self._load(session_id)
+        return self.get(session_id, default)
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        """메모리 캐시에서만 조회 (backend는 보지 않음)"""
+        context = self._entries.get(session_id)
+        if context is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(session_id)
+        self._last_access[session_id] = time.monotonic()
+        # 호출자가 수정할 수 있으므로 다음 sweep에서 크기를 다시 잼
+        self._dirty.add(session_id)
+        return context
+
+    def pop(self, session_id: str, default: Any = None) -> Any:
+        """캐시에서 꺼내고 backend의 세션도 삭제 (캐시에 없던 세션이면 default)"""
+        context = self._entries.get(session_id, default)
+        if session_id in self._entries:
+            self._remove(session_id)
+        if self.backend is not None:
+            self.backend.delete(self.name, session_id)
+        self._publish()
+        return context
+
+    def save(self, session_id: str, context: Any):
+        """세션을 수정한 뒤 호출: 크기를 다시 재고 backend가 있으면 write-behind 대기열에 넣음
+
+        수정한 객체를 그대로 받아 저장합니다. 스트리밍 중에 revalidate로 캐시의 객체가
+        다시 읽은 객체로 바뀌었거나 메모리 예산/유휴 TTL로 캐시에서 제거되었더라도
+        방금 수정한 쪽을 저장하고 캐시에 다시 넣습니다.
+        """
+        if self._entries.get(session_id) is not context:
+            self._cache(session_id, context)
+        self._resize(session_id)
+        self._dirty.discard(session_id)
+        if self.backend is not None:
+            self._versions[session_id] = self.backend.save(self.name, session_id, context, dumps_session)
+            self._checked[session_id] = time.monotonic()
+        self._enforce_budget()
+        self._publish()
+
+    def _cache(self, session_id: str, context: Any):
+        if session_id in self._entries:
+            self._remove(session_id)
+        self._entries[session_id] = context
+        self._last_access[session_id] = time.monotonic()
+        self._resize(session_id)
+        self._enforce_budget()
+        self._publish()
+
+    async def _load(self, session_id: str) -> Any:
+        """캐시에 없는 세션을 backend에서 읽어 캐시에 넣음 (재시작 후, 다른 워커가 만든 세션)"""
+        if self.backend is None:
+            return None
+        stored = await asyncio.to_thread(self.backend.load, self.name, session_id, self._deserialize)
+        # 읽는 동안 다른 요청이 먼저 캐시에 넣었으면 그 객체를 사용
+        if session_id in self._entries:
+            return self._entries[session_id]
+        if stored is None:
+            return None
+        context, updated_at = stored
+        self.loads += 1
+        self._cache(session_id, context)
+        self._versions[session_id] = updated_at
+        self._checked[session_id] = time.monotonic()
+        return context
+
+    async def _revalidate(self, session_id: str):
+        """다른 워커가 더 최근에 저장한 세션이면 다시 읽음 (revalidate_interval마다 최대 한 번 조회)"""
+        if self.backend is None or self.backend.is_pending(self.name, session_id):
+            return
+        now = time.monotonic()
+        if now - self._checked.get(session_id, 0.0) < self.revalidate_interval:
+            return
+        self._checked[session_id] = now
+        stored_at = await asyncio.to_thread(self.backend.updated_at, self.name, session_id)
+        # 조회하는 동안 이 워커가 저장했거나 제거했으면 다시 읽지 않음
+        if session_id not in self._entries or self.backend.is_pending(self.name, session_id):
+            return
+        if stored_at is not None and stored_at > self._versions.get(session_id, 0.0):
+            self.reloads += 1
+            self._remove(session_id)
+            await self._load(session_id)
+
+    def start(self):
+        """유휴 세션 정리와 크기 재측정을 하는 백그라운드 sweeper 시작"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"[session] {self.name} sweep error: {e}")
+
+    def sweep(self):
+        """변경된 세션 크기 재측정 → 유휴 세션 제거 → 예산 초과분 LRU 제거"""
+        for session_id in list(self._dirty):
+            if session_id in self._entries:
+                self._resize(session_id)
+        self._dirty.clear()
+
+        cutoff = time.monotonic() - self.idle_ttl
+        # LRU 순서이므로 앞쪽부터 보다가 최근 세션을 만나면 중단
+        for session_id in list(self._entries):
+            if self._last_access[session_id] > cutoff:
+                break
+            self._evict(session_id, "idle")
+
+        self._enforce_budget()
+        self._publish()
+
+    def _resize(self, session_id: str):
+        size = estimate_size(self._entries[session_id])
+        self.current_bytes += size - self._sizes.get(session_id, 0)
+        self._sizes[session_id] = size
+
+    def _enforce_budget(self):
+        # 방금 넣은 세션 하나만 남았으면 예산을 넘어도 유지
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            self._evict(next(iter(self._entries)), "memory")
+
+    def _evict(self, session_id: str, reason: str):
+        self._remove(session_id)
+        self.evictions[reason] += 1
+        SESSION_EVICTIONS.labels(self.name, reason).inc()
+
+    def _remove(self, session_id: str):
+        del self._entries[session_id]
+        self.current_bytes -= self._sizes.pop(session_id, 0)
+        self._last_access.pop(session_id, None)
+        self._dirty.discard(session_id)
+        self._versions.pop(session_id, None)
+        self._checked.pop(session_id, None)
+
+    def _publish(self):
+        self._entries_gauge.set(len(self._entries))
+        self._bytes_gauge.set(self.current_bytes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "idle_ttl": self.idle_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "evictions": dict(self.evictions),
+        }
@@ -1,33 +1,37 @@
-import os
-from openai import OpenAI
-from anthropic import Anthropic
-from typing import List
+import time
+from typing import Dict, List, Optional, Tuple
 from ..models import ChatMessage
-from dotenv import load_dotenv
-
-# .env 파일 로드
-load_dotenv()
+from .provider_registry import ProviderRegistry, ProviderNotConfigured, provider_for, registry
+from .response_cache import CachePolicy, ResponseCache, request_key, response_cache
+from .ai_service import claude_system, record_claude_usage, record_openai_usage, record_usage
+from .single_flight import SingleFlight, single_flight
+from .admission import PRIORITY_INTERACTIVE, AdmissionRegistry, Overloaded, admission as admission_registry
+from .resilience import Deadline, Resilience, request_deadline, resilience as resilience_instance
+from .metrics import COMPLETION_DURATION_SECONDS, ERRORS, model_label, record_token_usage
 
 class SimpleAIService:
-    def __init__(self):
-        # OpenAI 클라이언트
-        openai_key = os.getenv("OPENAI_API_KEY")
-        print(f"OpenAI key exists: {'Yes' if openai_key else 'No'}")
-        if openai_key:
-            self.openai_client = OpenAI(api_key=openai_key)
-        else:
+    def __init__(self, providers: ProviderRegistry = None, cache: ResponseCache = None, flights: SingleFlight = None, admission: AdmissionRegistry = None, resilience: Resilience = None):
+        # 프로세스 전역 커넥션 풀을 공유하는 프로바이더 레지스트리
+        self.providers = providers or registry
+        # 생성 결과 캐시 (cache_policy를 넘긴 호출만 사용)
+        self.cache = cache or response_cache
+        # 동일 요청 합치기 (single-flight)
+        self.flights = flights or single_flight
+        # 프로바이더별 동시 실행/속도 제한과 우선순위 대기열
+        self.admission = admission or admission_registry
+        # 마감 시각 안의 지터 재시도와 프로바이더별 서킷 브레이커
+        self.resilience = resilience or resilience_instance
+        if not self.providers.openai_key:
             print("WARNING: No OpenAI API key found!")
-            self.openai_client = None
-        
-        # Anthropic 클라이언트
-        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-        print(f"Anthropic key exists: {'Yes' if anthropic_key else 'No'}")
-        if anthropic_key:
-            self.anthropic_client = Anthropic(api_key=anthropic_key)
-        else:
-            self.anthropic_client = None
         
-    def generate_response(self, message: str, history: List[ChatMessage] = [], model: str = "openai-gpt3.5", system_prompt: str = None) -> str:
+    async def generate_response(self, message: str, history: List[ChatMessage] = [], model: str = "openai-gpt3.5", system_prompt: str = None, cache_policy: Optional[CachePolicy] = None, raise_errors: bool = False, cache_system: bool = False, usage: Optional[Dict[str, int]] = None, coalesce: bool = False, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[Deadline] = None) -> str:
+        """priority: 프로바이더 대기열 우선순위 (풀 채우기/요약 등 백그라운드 작업은 PRIORITY_BACKGROUND)
+        대기열이 가득 차면 대체 응답 대신 Overloaded를 발생 (캐시 정책이 있으면 캐시 응답을 먼저 사용)
+        deadline: 라우터에서 만든 요청 마감 시각 (없으면 AI_REQUEST_DEADLINE 기준으로 생성)
+        coalesce: 같은 요청이 진행 중이면 그 결과를 함께 사용 (결과가 같아도 되는 결정적 호출에서만 켬,
+            스토리/사건 생성처럼 플레이어마다 달라야 하는 호출은 끈 채로 둠).
+            합쳐진 호출은 먼저 시작한 호출의 deadline/priority로 한 번만 실행되고 토큰 사용량은 각 호출자의 usage에 반영
+        """
         messages = []
         
         # 시스템 프롬프트 추가
@@ -39,50 +43,114 @@ class SimpleAIService:
         
         messages.append({"role": "user", "content": message})
         
+        # 캐시 정책이 지정된 호출만 캐시 조회
+        key = request_key(model, messages, cache_system=cache_system)
+        if deadline is None:
+            deadline = request_deadline()
+        if cache_policy is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+        
         try:
-            if model.startswith("openai-"):
-                return self._call_openai(messages, model)
-            elif model.startswith("claude-"):
-                return self._call_claude(messages, model)
+            # coalesce=True면 동일한 요청이 동시에 진행 중일 때 그 결과를 함께 사용
+            if coalesce:
+                result, call_usage = await self.flights.call(key, lambda: self._call_model(messages, model, cache_system, priority, deadline))
             else:
-                return self._call_openai(messages, "openai-gpt3.5")
-                
+                result, call_usage = await self._call_model(messages, model, cache_system, priority, deadline)
+            # 합쳐진 호출도 각자의 usage에 같은 사용량을 기록
+            record_usage(usage, **call_usage)
+            
+        except Overloaded:
+            # 대체 응답을 만들려면 다시 프로바이더를 호출해야 하므로 과부하는 그대로 전달
+            raise
+        except ProviderNotConfigured as e:
+            if raise_errors:
+                raise
+            return str(e)
         except Exception as e:
             print(f"AI service error: {e}")
-            return f"죄송합니다. AI 서비스에 문제가 발생했습니다: {str(e)}"
+            # 백그라운드 생성 등 대체 응답이 필요 없는 호출은 예외를 그대로 전달
+            if raise_errors:
+                raise
+            if model.startswith("claude-"):
+                return f"죄송합니다. AI 서비스에 문제가 발생했습니다: {str(e)}"
+            return self._openai_fallback(messages)
+        
+        if not result:
+            if raise_errors:
+                raise ValueError("응답이 비어있습니다.")
+            return "응답이 비어있습니다."
+        
+        # 정상 응답만 캐시에 저장 (에러/대체 응답은 저장하지 않음)
+        if cache_policy is not None:
+            await self.cache.set(key, result, cache_policy)
+        return result
     
-    def _call_openai(self, messages: List[dict], model: str) -> str:
+    async def _call_model(self, messages: List[dict], model: str, cache_system: bool = False, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[Deadline] = None) -> Tuple[str, Dict[str, int]]:
+        """모델 접두사에 따라 프로바이더별 호출 (응답과 이 호출의 토큰 사용량을 반환)"""
+        if not model.startswith(("openai-", "claude-")):
+            model = "openai-gpt3.5"
+        
+        # 프로바이더 호출 단위 토큰 사용량 (지표는 여기서 한 번, 호출자 usage는 generate_response에서 반영)
+        call_usage: Dict[str, int] = {}
+        if model.startswith("claude-"):
+            factory = lambda: self._call_claude(messages, model, cache_system, call_usage)
+        else:
+            factory = lambda: self._call_openai(messages, model, call_usage)
+        
+        if deadline is None:
+            deadline = request_deadline()
+        # 차단 중인 프로바이더는 대기열에 넣지 않고 바로 실패
+        self.resilience.breaker(model).raise_if_open()
+        
+        provider = provider_for(model)
+        started = time.monotonic()
         try:
-            if not self.openai_client:
-                return "OpenAI API 키가 설정되지 않았습니다."
-            
-            openai_model_map = {
-                "openai-gpt3.5": "gpt-3.5-turbo",
-                "openai-gpt4": "gpt-4"
-            }
-            
-            actual_model = openai_model_map.get(model, "gpt-3.5-turbo")
-            print(f"OpenAI API 호출: {actual_model}")
-            print(f"메시지 개수: {len(messages)}")
-            
-            response = self.openai_client.chat.completions.create(
-                model=actual_model,
-                messages=messages,
-                max_tokens=1500,
-                temperature=0.7
-            )
-            
-            result = response.choices[0].message.content
-            print(f"OpenAI 응답 성공: {len(result)} 문자")
-            return result or "응답이 비어있습니다."
-            
+            async with self.admission.slot(model, priority, deadline.remaining()):
+                result = await self.resilience.call(model, deadline, factory)
         except Exception as e:
-            print(f"OpenAI API 에러: {e}")
-            # 에러 발생 시 더미 데이터 반환
-            user_message = messages[-1]["content"] if messages else ""
-            
-            if "스토리를 시작해주세요" in user_message:
-                return """**환상의 숲에서 깨어나다**
+            ERRORS.labels(provider, model_label(model), type(e).__name__).inc()
+            raise
+        finally:
+            if call_usage:
+                record_token_usage(provider, model_label(model), call_usage)
+        
+        COMPLETION_DURATION_SECONDS.labels(model_label(model)).observe(time.monotonic() - started)
+        return result, call_usage
+    
+    async def _call_openai(self, messages: List[dict], model: str, usage: Optional[Dict[str, int]] = None) -> str:
+        openai_client = self.providers.openai_client()
+        if not openai_client:
+            raise ProviderNotConfigured("OpenAI API 키가 설정되지 않았습니다.")
+        
+        openai_model_map = {
+            "openai-gpt3.5": "gpt-3.5-turbo",
+            "openai-gpt4": "gpt-4"
+        }
+        
+        actual_model = openai_model_map.get(model, "gpt-3.5-turbo")
+        print(f"OpenAI API 호출: {actual_model}")
+        print(f"메시지 개수: {len(messages)}")
+        
+        response = await openai_client.chat.completions.create(
+            model=actual_model,
+            messages=messages,
+            max_tokens=1500,
+            temperature=0.7
+        )
+        
+        record_openai_usage(usage, response.usage)
+        result = response.choices[0].message.content
+        print(f"OpenAI 응답 성공: {len(result or '')} 문자")
+        return result
+    
+    def _openai_fallback(self, messages: List[dict]) -> str:
+        """OpenAI 호출 실패 시 게임 진행용 더미 응답"""
+        user_message = messages[-1]["content"] if messages else ""
+        
+        if "스토리를 시작해주세요" in user_message:
+            return """**환상의 숲에서 깨어나다**
 
 깊은 숲속에서 당신은 갑작스럽게 눈을 뜹니다. 머리가 아프고 어떻게 여기까지 왔는지 기억이 나지 않습니다.
 
@@ -92,8 +160,8 @@ class SimpleAIService:
 1. 수정구에 다가가서 자세히 살펴본다
 2. 숲 밖으로 나가는 길을 찾는다  
 3. 돌기둥 뒤에 숨어서 상황을 관찰한다"""
-            else:
-                return f"""API 연결 문제로 임시 응답입니다.
+        else:
+            return f"""API 연결 문제로 임시 응답입니다.
 
 당신의 모험이 계속됩니다...
 
@@ -102,7 +170,7 @@ class SimpleAIService:
 2. 신중하게 주변을 탐색한다
 3. 다른 방법을 모색해본다"""
     
-    def _call_claude(self, messages: List[dict], model: str) -> str:
+    async def _call_claude(self, messages: List[dict], model: str, cache_system: bool = False, usage: Optional[Dict[str, int]] = None) -> str:
         # 시스템 메시지 분리
         system_content = ""
         user_messages = []
@@ -113,11 +181,16 @@ class SimpleAIService:
             else:
                 user_messages.append(msg)
         
-        response = self.anthropic_client.messages.create(
+        anthropic_client = self.providers.anthropic_client()
+        if not anthropic_client:
+            raise ProviderNotConfigured("Claude API 키가 설정되지 않았습니다.")
+        
+        response = await anthropic_client.messages.create(
             model="claude-3-5-sonnet-20241022",
             max_tokens=1500,
-            system=system_content if system_content else "You are a helpful assistant.",
+            system=claude_system(system_content if system_content else "You are a helpful assistant.", cache_system),
             messages=user_messages
         )
         
+        record_claude_usage(usage, response.usage)
         return response.content[0].text
\ No newline at end of file
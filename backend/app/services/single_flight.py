@@ -0,0 +1,127 @@
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+class _StreamFlight:
+    """진행 중인 업스트림 스트림 하나와 지금까지 받은 토큰"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        # 새 토큰이 들어오거나 종료될 때마다 set 후 새 Event로 교체
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class SingleFlight:
+    """동일한 요청이 동시에 들어오면 업스트림 호출을 하나로 합치는 계층
+
+    - stream(): 첫 요청이 연 스트림을 모든 대기자에게 나눠 줌 (늦게 합류하면 지금까지의 토큰을 먼저 재생,
+      업스트림 예외는 모든 구독자에게 다시 발생)
+    - call(): 완료형 호출의 결과(또는 예외)를 모든 대기자가 공유
+    구독자가 모두 떠나면 업스트림 스트림을 취소합니다.
+    """
+
+    def __init__(self):
+        self._streams: Dict[str, _StreamFlight] = {}
+        self._calls: Dict[str, asyncio.Task] = {}
+
+        self.upstream_streams = 0
+        self.coalesced_streams = 0
+        self.late_joins = 0
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncGenerator[str, None]:
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _StreamFlight()
+            self._streams[key] = flight
+            flight.task = asyncio.create_task(self._run_stream(flight, factory))
+            flight.task.add_done_callback(lambda _: self._finish_stream(key, flight))
+            self.upstream_streams += 1
+        else:
+            self.coalesced_streams += 1
+            if flight.chunks:
+                self.late_joins += 1
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(flight.chunks):
+                    chunk = flight.chunks[index]
+                    index += 1
+                    yield chunk
+                elif flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    break
+                else:
+                    await flight.changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # 더 이상 읽는 쪽이 없으면 업스트림 생성 중단 (새 요청이 취소 중인 스트림에 합류하지 않도록 즉시 제거)
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+                flight.task.cancel()
+
+    def sole_subscriber_output(self, key: str) -> Optional[str]:
+        """key 스트림이 아직 생성 중이고 구독자가 하나뿐이면 지금까지 생성된 텍스트, 아니면 None
+
+        구독자가 떠나기 직전에 호출하면 그 구독자가 떠날 때 업스트림 생성이 중단되는지 알 수 있습니다.
+        """
+        flight = self._streams.get(key)
+        if flight is None or flight.done or flight.subscribers != 1:
+            return None
+        return "".join(flight.chunks)
+
+    async def _run_stream(self, flight: _StreamFlight, factory: Callable[[], AsyncIterator[str]]):
+        async for chunk in factory():
+            flight.chunks.append(chunk)
+            flight.notify()
+
+    def _finish_stream(self, key: str, flight: _StreamFlight):
+        # 정상 종료/예외/취소 모두 여기서 정리 (시작 전에 취소된 경우 포함)
+        if self._streams.get(key) is flight:
+            del self._streams[key]
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            # 업스트림 예외는 모든 구독자에게 전달
+            flight.error = flight.task.exception()
+        flight.done = True
+        flight.notify()
+
+    async def call(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None) if self._calls.get(key) is task else None)
+            self.upstream_calls += 1
+        else:
+            self.coalesced_calls += 1
+
+        # 한 대기자가 취소되어도 다른 대기자를 위해 업스트림 호출은 계속 진행
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight_streams": len(self._streams),
+            "in_flight_calls": len(self._calls),
+            "upstream_streams": self.upstream_streams,
+            "coalesced_streams": self.coalesced_streams,
+            "late_joins": self.late_joins,
+            "upstream_calls": self.upstream_calls,
+            "coalesced_calls": self.coalesced_calls,
+        }
+
+
+# 전역 SingleFlight 인스턴스
+single_flight = SingleFlight()
@@ -0,0 +1,95 @@
+import codecs
+from typing import List, Optional
+
+
+class SSEEvent:
+    """파싱이 끝난 Server-Sent Event 하나"""
+
+    __slots__ = ("event", "data", "id")
+
+    def __init__(self, data: str, event: Optional[str] = None, id: Optional[str] = None):
+        self.data = data
+        self.event = event
+        self.id = id
+
+
+class SSEDecoder:
+    """바이트 스트림을 조각 단위로 받아 완성된 SSE 이벤트를 돌려주는 점진적 파서
+
+    네트워크 청크 경계가 UTF-8 문자나 줄 중간에 걸려도 안전하도록
+    디코딩과 줄 분리를 모두 버퍼링합니다.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+        self._data_lines: List[str] = []
+        self._event: Optional[str] = None
+        self._id: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """새 바이트 조각을 넣고 이번에 완성된 이벤트 목록을 반환"""
+        self._buffer += self._decoder.decode(chunk)
+        return self._drain_lines()
+
+    def close(self) -> List[SSEEvent]:
+        """스트림 종료 시 남은 버퍼를 처리"""
+        self._buffer += self._decoder.decode(b"", final=True)
+        if self._buffer:
+            self._buffer += "\n"
+        events = self._drain_lines()
+        event = self._dispatch()
+        if event:
+            events.append(event)
+        return events
+
+    def _drain_lines(self) -> List[SSEEvent]:
+        events = []
+        while True:
+            # 줄 끝은 \r\n, \n, 단독 \r 모두 허용 (SSE 명세)
+            lf = self._buffer.find("\n")
+            cr = self._buffer.find("\r", 0, lf if lf >= 0 else len(self._buffer))
+            if cr >= 0:
+                if cr + 1 == len(self._buffer):
+                    # 버퍼 끝의 \r은 다음 청크에서 \n이 이어질 수 있으므로 보류
+                    break
+                end, skip = cr, 2 if self._buffer[cr + 1] == "\n" else 1
+            elif lf >= 0:
+                end, skip = lf, 1
+            else:
+                break
+            line = self._buffer[:end]
+            self._buffer = self._buffer[end + skip:]
+
+            if line == "":
+                event = self._dispatch()
+                if event:
+                    events.append(event)
+            else:
+                self._process_line(line)
+        return events
+
+    def _process_line(self, line: str):
+        # ':'로 시작하는 줄은 주석 (keep-alive 등)
+        if line.startswith(":"):
+            return
+
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+
+        if field == "data":
+            self._data_lines.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            self._id = value
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if not self._data_lines:
+            self._event = None
+            return None
+        event = SSEEvent("\n".join(self._data_lines), self._event, self._id)
+        self._data_lines = []
+        self._event = None
+        return event
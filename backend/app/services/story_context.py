@@ -0,0 +1,126 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .admission import PRIORITY_BACKGROUND
+from .session_models import StorySession
+
+
+def estimate_tokens(text: str) -> int:
+    """토크나이저 없이 쓰는 대략적인 토큰 수 추정 (ASCII 약 4자당 1토큰, 한글 등은 1자당 1토큰)"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+class StoryContextBuilder:
+    """토큰 예산 안에서 스토리 프롬프트용 히스토리를 구성
+
+    최근 recent_turns 턴은 토큰 예산과 관계없이 항상 원문 그대로 두고, 그보다 오래된 부분은
+    context.summary에 누적 요약으로 접어 넣습니다. 요약 갱신은
+    응답 생성 경로를 막지 않도록 백그라운드 작업으로 수행합니다.
+    on_update: 요약을 반영한 뒤 (session_id, 세션)으로 호출 (세션 저장소에 변경 알림)
+    """
+
+    def __init__(self, ai_service, recent_turns: int = 3, token_budget: int = 3000, summary_max_chars: int = 1200, on_update: Optional[Callable[[str, StorySession], None]] = None):
+        self.ai_service = ai_service
+        self.on_update = on_update
+        # 스토리 1턴 = 플레이어 선택 + 스토리 응답 2개 항목
+        self.recent_entries = max(recent_turns, 1) * 2
+        self.token_budget = token_budget
+        self.summary_max_chars = summary_max_chars
+        self._summarizing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.summaries_created = 0
+        self.summary_failures = 0
+        # 요약에도 프롬프트에도 들어가지 못한 항목 수 (요약이 밀렸을 때 예산 초과분)
+        self.dropped_entries = 0
+
+    def build(self, context: StorySession) -> str:
+        """요약 + 최근 턴 원문으로 '이전 스토리' 텍스트 생성"""
+        history = context.history
+        summary = context.summary
+        summarized_upto = context.summarized_upto
+
+        budget = self.token_budget - (estimate_tokens(summary) if summary else 0)
+
+        # 최근 recent_entries개 항목은 예산과 관계없이 원문 그대로 포함
+        recent_start = max(len(history) - self.recent_entries, summarized_upto)
+        recent = [history.content(index) for index in range(recent_start, len(history))]
+        budget -= sum(estimate_tokens(content) for content in recent)
+
+        # 그보다 오래됐지만 아직 요약되지 않은 항목(요약 진행 중/실패)은 최신순으로 예산이 허락하는 만큼 포함
+        older: List[str] = []
+        index = recent_start - 1
+        while index >= summarized_upto:
+            content = history.content(index)
+            cost = estimate_tokens(content)
+            if cost > budget:
+                break
+            older.append(content)
+            budget -= cost
+            index -= 1
+        older.reverse()
+
+        dropped = index - summarized_upto + 1
+        if dropped:
+            self.dropped_entries += dropped
+            print(f"Story context: {dropped} unsummarized entries dropped (token budget {self.token_budget})")
+        entries = older + recent
+
+        parts = []
+        if summary:
+            parts.append(f"[지금까지의 줄거리 요약]\n{summary}")
+        parts.extend(entries)
+        return "\n\n".join(parts)
+
+    def schedule_summary(self, session_id: str, context: StorySession):
+        """최근 턴 범위를 벗어난 항목이 생기면 백그라운드에서 요약에 반영"""
+        target = len(context.history) - self.recent_entries
+        if target <= context.summarized_upto or session_id in self._summarizing:
+            return
+
+        self._summarizing.add(session_id)
+        task = asyncio.create_task(self._summarize(session_id, context, target))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, session_id: str, context: StorySession, target: int):
+        try:
+            new_text = "\n\n".join(context.history.contents(context.summarized_upto, target))
+            previous_summary = context.summary
+
+            system_prompt = f"""당신은 인터랙티브 {context.genre} 스토리의 줄거리를 관리합니다.
+기존 요약과 이어지는 내용을 합쳐 하나의 요약으로 다시 작성하세요.
+
+규칙:
+1. 등장인물, 장소, 소지품, 중요한 사건과 플레이어의 선택을 빠짐없이 유지
+2. {self.summary_max_chars}자 이내
+3. 요약만 출력
+4. 한국어로 작성"""
+
+            summary_prompt = f"기존 요약:\n{previous_summary or '(없음)'}\n\n이어지는 내용:\n{new_text}"
+
+            summary = await self.ai_service.generate_response(
+                summary_prompt, [], context.model, system_prompt=system_prompt, raise_errors=True,
+                priority=PRIORITY_BACKGROUND
+            )
+            context.summary = summary.strip()[: self.summary_max_chars * 2]
+            context.summarized_upto = target
+            self.summaries_created += 1
+            if self.on_update is not None:
+                self.on_update(session_id, context)
+        except Exception as e:
+            # 요약 실패 시 다음 턴에 다시 시도 (그 사이에는 원문이 예산 안에서 사용됨)
+            self.summary_failures += 1
+            print(f"Story summary error for {session_id}: {e}")
+        finally:
+            self._summarizing.discard(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "summaries_created": self.summaries_created,
+            "summary_failures": self.summary_failures,
+            "dropped_entries": self.dropped_entries,
+            "in_progress": len(self._summarizing),
+        }
+
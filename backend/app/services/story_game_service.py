@@ -1,25 +1,37 @@
+import os
+import re
 import json
 import random
+import asyncio
 from typing import List, Dict, Any, Optional
 from ..services.simple_ai_service import SimpleAIService
+from ..services.warm_pool import WarmPool, parse_pool_keys
+from ..services.admission import PRIORITY_BACKGROUND, Overloaded
+from ..services.resilience import Deadline
+from ..services.story_context import StoryContextBuilder
+from ..services.session_store import SessionStore
+from ..services.session_db import session_db
+from ..services.session_models import StorySession
+
+GENRE_PROMPTS = {
+    "fantasy": "판타지 세계에서 모험을 시작하는",
+    "sci-fi": "미래 우주에서 펼쳐지는 SF",
+    "mystery": "수상한 사건이 벌어지는 미스터리",
+    "horror": "오싹한 공포 요소가 담긴",
+    "romance": "로맨틱한 사랑 이야기의",
+    "adventure": "스릴 넘치는 모험"
+}
+
+# 오프닝을 미리 생성해 둘 수 있는 모델
+POOLED_MODELS = {"openai-gpt3.5", "openai-gpt4", "claude-3.5-sonnet"}
+
+# 풀에서 꺼낸 오프닝을 스트리밍 경로로 재생할 때의 조각 단위 (공백 포함 단어 단위)
+_REPLAY_CHUNK_PATTERN = re.compile(r"\S+\s*|\s+")
 
-class StoryGameService:
-    def __init__(self):
-        self.ai_service = SimpleAIService()
-        self.story_contexts = {}
-        
-    def start_new_story(self, session_id: str, genre: str = "fantasy", model: str = "openai-gpt3.5") -> Dict[str, Any]:
-        """새로운 스토리 시작"""
-        genre_prompts = {
-            "fantasy": "판타지 세계에서 모험을 시작하는",
-            "sci-fi": "미래 우주에서 펼쳐지는 SF",
-            "mystery": "수상한 사건이 벌어지는 미스터리",
-            "horror": "오싹한 공포 요소가 담긴",
-            "romance": "로맨틱한 사랑 이야기의",
-            "adventure": "스릴 넘치는 모험"
-        }
-        
-        system_prompt = f"""당신은 인터랙티브 {genre_prompts.get(genre, '모험')} 스토리텔러입니다.
+
+def _opening_prompts(genre: str):
+    """장르별 오프닝 생성용 (system_prompt, initial_prompt)"""
+    system_prompt = f"""당신은 인터랙티브 {GENRE_PROMPTS.get(genre, '모험')} 스토리텔러입니다.
 
 규칙:
 1. 2-3문단 분량의 생생한 스토리 작성
@@ -36,26 +48,55 @@ class StoryGameService:
 2. [선택지 2] 
 3. [선택지 3]"""
 
-        initial_prompt = f"{genre_prompts.get(genre, '모험')} 스토리를 시작해주세요. 주인공은 갑작스러운 상황에 놓이게 됩니다."
+    initial_prompt = f"{GENRE_PROMPTS.get(genre, '모험')} 스토리를 시작해주세요. 주인공은 갑작스러운 상황에 놓이게 됩니다."
+    return system_prompt, initial_prompt
+
+
+class StoryGameService:
+    def __init__(self):
+        self.ai_service = SimpleAIService()
+        # 유휴/메모리 예산 기준으로 정리되는 세션 저장소 (dict처럼 사용, 수정 후 save로 SQLite에 반영)
+        self.story_contexts = SessionStore.from_env("story", backend=session_db, session_type=StorySession)
+        # (장르, 모델)별로 미리 생성해 둔 오프닝 풀
+        self.opening_pool = WarmPool(
+            "story-opening",
+            self._generate_opening,
+            low_watermark=int(os.getenv("STORY_POOL_LOW", "1")),
+            high_watermark=int(os.getenv("STORY_POOL_HIGH", "3")),
+            max_concurrency=int(os.getenv("STORY_POOL_CONCURRENCY", "2")),
+            persist_path=os.getenv("STORY_POOL_PATH", "data/story_opening_pool.json"),
+        )
+        self.opening_pool_prewarm_keys = parse_pool_keys(os.getenv("STORY_POOL_PREWARM", "fantasy:openai-gpt3.5"))
+        # 토큰 예산 기반 히스토리 구성 (오래된 턴은 백그라운드에서 요약)
+        self.context_builder = StoryContextBuilder(
+            self.ai_service,
+            recent_turns=int(os.getenv("STORY_CONTEXT_RECENT_TURNS", "3")),
+            token_budget=int(os.getenv("STORY_CONTEXT_TOKEN_BUDGET", "3000")),
+            summary_max_chars=int(os.getenv("STORY_SUMMARY_MAX_CHARS", "1200")),
+            on_update=self.story_contexts.save,
+        )
+        
+    async def start_new_story(self, session_id: str, genre: str = "fantasy", model: str = "openai-gpt3.5", deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """새로운 스토리 시작"""
+        # 미리 생성된 오프닝이 있으면 바로 사용
+        story_response = self._pop_opening(genre, model)
         
         # AI로부터 초기 스토리 생성
-        try:
-            print(f"스토리 생성 시작 - AI Service Type: {type(self.ai_service)}")
-            story_response = self.ai_service.generate_response(initial_prompt, [], model, system_prompt=system_prompt)
-            print(f"Generated story: {story_response[:100]}...")
-        except Exception as e:
-            print(f"Story generation error: {e}")
-            story_response = f"스토리 생성 중 오류가 발생했습니다: {str(e)}"
+        if story_response is None:
+            system_prompt, initial_prompt = _opening_prompts(genre)
+            try:
+                print(f"스토리 생성 시작 - AI Service Type: {type(self.ai_service)}")
+                story_response = await self.ai_service.generate_response(initial_prompt, [], model, system_prompt=system_prompt, deadline=deadline)
+                print(f"Generated story: {story_response[:100]}...")
+            except Overloaded:
+                # 과부하 시 오류 문구로 세션을 만들지 않고 호출자에게 즉시 알림
+                raise
+            except Exception as e:
+                print(f"Story generation error: {e}")
+                story_response = f"스토리 생성 중 오류가 발생했습니다: {str(e)}"
         
         # 세션 컨텍스트 저장
-        self.story_contexts[session_id] = {
-            "genre": genre,
-            "model": model,
-            "story_history": [
-                {"type": "story", "content": story_response}
-            ],
-            "turn": 1
-        }
+        self.story_contexts[session_id] = StorySession(genre, model, opening=story_response)
         
         return {
             "session_id": session_id,
@@ -64,72 +105,58 @@ class StoryGameService:
             "genre": genre
         }
     
-    def start_new_story_stream(self, session_id: str, genre: str = "fantasy", model: str = "openai-gpt3.5"):
+    async def start_new_story_stream(self, session_id: str, genre: str = "fantasy", model: str = "openai-gpt3.5", deadline: Optional[Deadline] = None):
         """새로운 스토리 시작 (스트리밍)"""
-        genre_prompts = {
-            "fantasy": "판타지 세계에서 모험을 시작하는",
-            "sci-fi": "미래 우주에서 펼쳐지는 SF",
-            "mystery": "수상한 사건이 벌어지는 미스터리",
-            "horror": "오싹한 공포 요소가 담긴",
-            "romance": "로맨틱한 사랑 이야기의",
-            "adventure": "스릴 넘치는 모험"
-        }
-        
-        system_prompt = f"""당신은 인터랙티브 {genre_prompts.get(genre, '모험')} 스토리텔러입니다.
-
-규칙:
-1. 2-3문단 분량의 생생한 스토리 작성
-2. 마지막에 반드시 3가지 선택지 제공 (1, 2, 3번)
-3. 플레이어의 선택에 따라 스토리 전개
-4. 긴장감과 몰입감 있는 서술
-5. 한국어로 작성
-
-예시 형식:
-[스토리 내용]
-
-**선택하세요:**
-1. [선택지 1]
-2. [선택지 2] 
-3. [선택지 3]"""
-
-        initial_prompt = f"{genre_prompts.get(genre, '모험')} 스토리를 시작해주세요. 주인공은 갑작스러운 상황에 놓이게 됩니다."
-        
-        # AI 서비스에서 스트리밍으로 스토리 생성
-        from ..services.ai_service import AIService
-        ai_service = AIService()
-        
         story_chunks = []
-        for chunk in ai_service.stream_chat(initial_prompt, [], model, system_prompt=system_prompt):
-            story_chunks.append(chunk)
-            yield chunk
+        pooled_story = self._pop_opening(genre, model)
+        
+        if pooled_story is not None:
+            # 미리 생성된 오프닝을 일반 스트리밍과 같은 청크 형태로 재생
+            for chunk in _REPLAY_CHUNK_PATTERN.findall(pooled_story):
+                story_chunks.append(chunk)
+                yield chunk
+        else:
+            # AI 서비스에서 스트리밍으로 스토리 생성
+            from ..services.ai_service import ai_service
+            
+            system_prompt, initial_prompt = _opening_prompts(genre)
+            async for chunk in ai_service.stream_chat(initial_prompt, [], model, system_prompt=system_prompt, route="story.start", deadline=deadline):
+                story_chunks.append(chunk)
+                yield chunk
         
         # 완전한 스토리를 세션에 저장
         complete_story = ''.join(story_chunks)
-        self.story_contexts[session_id] = {
-            "genre": genre,
-            "model": model,
-            "story_history": [
-                {"type": "story", "content": complete_story}
-            ],
-            "turn": 1
-        }
+        self.story_contexts[session_id] = StorySession(genre, model, opening=complete_story)
     
-    def continue_story(self, session_id: str, choice: int, custom_action: str = None) -> Dict[str, Any]:
+    def _pop_opening(self, genre: str, model: str) -> Optional[str]:
+        if genre in GENRE_PROMPTS and model in POOLED_MODELS:
+            return self.opening_pool.pop((genre, model))
+        return None
+    
+    async def _generate_opening(self, key: tuple) -> Optional[str]:
+        """풀에 넣을 오프닝 생성 (사용자마다 다른 오프닝을 받도록 응답 캐시와 요청 합치기는 사용하지 않음)"""
+        genre, model = key
+        system_prompt, initial_prompt = _opening_prompts(genre)
+        # 에러 시 대체 응답 대신 예외를 받아 풀에 잘못된 오프닝이 들어가지 않도록 함
+        story_response = await self.ai_service.generate_response(initial_prompt, [], model, system_prompt=system_prompt, raise_errors=True, coalesce=False, priority=PRIORITY_BACKGROUND)
+        # 선택지가 없는 응답은 풀에 넣지 않음
+        if "선택" not in story_response:
+            return None
+        return story_response
+    
+    async def continue_story(self, session_id: str, choice: int, custom_action: str = None, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """선택에 따라 스토리 진행"""
-        if session_id not in self.story_contexts:
+        context = await self.story_contexts.aget(session_id)
+        if context is None:
             return {"error": "세션을 찾을 수 없습니다"}
         
-        context = self.story_contexts[session_id]
-        
         # 선택사항 또는 커스텀 액션 준비
         action_text = custom_action if custom_action else f"{choice}번 선택"
         
-        # 이전 스토리 히스토리 구성
-        history_text = "\n\n".join([
-            item["content"] for item in context["story_history"]
-        ])
+        # 이전 스토리 히스토리 구성 (오래된 턴은 요약, 최근 턴은 원문)
+        history_text = self.context_builder.build(context)
         
-        system_prompt = f"""당신은 인터랙티브 {context['genre']} 스토리텔러입니다.
+        system_prompt = f"""당신은 인터랙티브 {context.genre} 스토리텔러입니다.
 
 이전 스토리:
 {history_text}
@@ -151,43 +178,34 @@ class StoryGameService:
         continuation_prompt = f"플레이어가 '{action_text}'을(를) 선택했습니다. 스토리를 이어서 진행해주세요."
         
         # AI로부터 스토리 계속 생성
-        story_response = self.ai_service.generate_response(continuation_prompt, [], context["model"], system_prompt=system_prompt)
+        story_response = await self.ai_service.generate_response(continuation_prompt, [], context.model, system_prompt=system_prompt, deadline=deadline)
         
         # 컨텍스트 업데이트
-        context["story_history"].append({
-            "type": "choice", 
-            "content": f"플레이어 선택: {action_text}"
-        })
-        context["story_history"].append({
-            "type": "story", 
-            "content": story_response
-        })
-        context["turn"] += 1
+        context.add_turn(action_text, story_response)
+        self.story_contexts.save(session_id, context)
+        self.context_builder.schedule_summary(session_id, context)
         
         return {
             "session_id": session_id,
             "story": story_response,
-            "turn": context["turn"],
-            "genre": context["genre"]
+            "turn": context.turn,
+            "genre": context.genre
         }
     
-    def continue_story_stream(self, session_id: str, choice: int, custom_action: str = None):
+    async def continue_story_stream(self, session_id: str, choice: int, custom_action: str = None, deadline: Optional[Deadline] = None):
         """선택에 따라 스토리 진행 (스트리밍)"""
-        if session_id not in self.story_contexts:
+        context = await self.story_contexts.aget(session_id)
+        if context is None:
             yield "오류: 세션을 찾을 수 없습니다"
             return
         
-        context = self.story_contexts[session_id]
-        
         # 선택사항 또는 커스텀 액션 준비
         action_text = custom_action if custom_action else f"{choice}번 선택"
         
-        # 이전 스토리 히스토리 구성
-        history_text = "\n\n".join([
-            item["content"] for item in context["story_history"]
-        ])
+        # 이전 스토리 히스토리 구성 (오래된 턴은 요약, 최근 턴은 원문)
+        history_text = self.context_builder.build(context)
         
-        system_prompt = f"""당신은 인터랙티브 {context['genre']} 스토리텔러입니다.
+        system_prompt = f"""당신은 인터랙티브 {context.genre} 스토리텔러입니다.
 
 이전 스토리:
 {history_text}
@@ -209,51 +227,40 @@ class StoryGameService:
         continuation_prompt = f"플레이어가 '{action_text}'을(를) 선택했습니다. 스토리를 이어서 진행해주세요."
         
         # AI 서비스에서 스트리밍으로 스토리 생성
-        from ..services.ai_service import AIService
-        ai_service = AIService()
+        from ..services.ai_service import ai_service
         
         story_chunks = []
-        for chunk in ai_service.stream_chat(continuation_prompt, [], context["model"], system_prompt=system_prompt):
-            story_chunks.append(chunk)
-            yield chunk
+        try:
+            async for chunk in ai_service.stream_chat(continuation_prompt, [], context.model, system_prompt=system_prompt, route="story.continue", deadline=deadline):
+                story_chunks.append(chunk)
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            # 클라이언트가 떠나 생성이 중단됨: 잘린 턴은 기록하지 않고 이전 상태를 유지
+            print(f"[story] session {session_id} turn {context.turn} discarded after {len(story_chunks)} chunks")
+            raise
         
         # 완전한 스토리를 컨텍스트에 저장
         complete_story = ''.join(story_chunks)
-        context["story_history"].append({
-            "type": "choice", 
-            "content": f"플레이어 선택: {action_text}"
-        })
-        context["story_history"].append({
-            "type": "story", 
-            "content": complete_story
-        })
-        context["turn"] += 1
+        context.add_turn(action_text, complete_story)
+        self.story_contexts.save(session_id, context)
+        self.context_builder.schedule_summary(session_id, context)
     
-    def get_story_summary(self, session_id: str) -> Dict[str, Any]:
+    async def get_story_summary(self, session_id: str) -> Dict[str, Any]:
         """스토리 요약 가져오기"""
-        if session_id not in self.story_contexts:
+        context = await self.story_contexts.aget(session_id)
+        if context is None:
             return {"error": "세션을 찾을 수 없습니다"}
-        
-        context = self.story_contexts[session_id]
         return {
             "session_id": session_id,
-            "genre": context["genre"],
-            "turn": context["turn"],
-            "history_length": len(context["story_history"])
+            "genre": context.genre,
+            "turn": context.turn,
+            "history_length": len(context.history),
+            "summarized_entries": context.summarized_upto
         }
 
-    def start_cooperative_story(self, genre: str, model: str = "openai-gpt3.5") -> Dict[str, Any]:
+    async def start_cooperative_story(self, genre: str, model: str = "openai-gpt3.5") -> Dict[str, Any]:
         """협력 모드용 새로운 스토리 시작"""
-        genre_prompts = {
-            "fantasy": "판타지 세계에서 모험을 시작하는",
-            "sci-fi": "미래 우주에서 펼쳐지는 SF",
-            "mystery": "수상한 사건이 벌어지는 미스터리",
-            "horror": "오싹한 공포 요소가 담긴",
-            "romance": "로맨틱한 사랑 이야기의",
-            "adventure": "스릴 넘치는 모험"
-        }
-        
-        system_prompt = f"""당신은 멀티플레이어 협력 스토리텔러입니다. 여러 플레이어가 번갈아가며 {genre_prompts.get(genre, '모험')} 스토리를 만들어갑니다.
+        system_prompt = f"""당신은 멀티플레이어 협력 스토리텔러입니다. 여러 플레이어가 번갈아가며 {GENRE_PROMPTS.get(genre, '모험')} 스토리를 만들어갑니다.
 
 규칙:
 1. 흥미진진한 상황으로 스토리를 시작하세요
@@ -262,10 +269,10 @@ class StoryGameService:
 4. 생생하고 몰입감 있는 서술
 5. 한국어로 작성"""
 
-        initial_prompt = f"{genre_prompts.get(genre, '모험')} 협력 스토리를 시작해주세요. 플레이어들이 함께 이야기를 만들어갈 수 있는 흥미로운 상황으로 시작해주세요."
+        initial_prompt = f"{GENRE_PROMPTS.get(genre, '모험')} 협력 스토리를 시작해주세요. 플레이어들이 함께 이야기를 만들어갈 수 있는 흥미로운 상황으로 시작해주세요."
         
         try:
-            story_response = self.ai_service.generate_response(initial_prompt, [], model, system_prompt=system_prompt)
+            story_response = await self.ai_service.generate_response(initial_prompt, [], model, system_prompt=system_prompt)
         except Exception as e:
             print(f"Cooperative story generation error: {e}")
             story_response = f"신비로운 여행이 시작됩니다... (AI 오류: {str(e)})"
@@ -275,7 +282,7 @@ class StoryGameService:
             "genre": genre
         }
 
-    def continue_cooperative_story(self, current_story: str, genre: str, model: str = "openai-gpt3.5") -> Dict[str, Any]:
+    async def continue_cooperative_story(self, current_story: str, genre: str, model: str = "openai-gpt3.5") -> Dict[str, Any]:
         """협력 모드용 스토리 계속하기"""
         genre_prompts = {
             "fantasy": "판타지",
@@ -302,7 +309,7 @@ class StoryGameService:
         continuation_prompt = "위 스토리를 자연스럽게 이어서 계속 작성해주세요."
         
         try:
-            story_response = self.ai_service.generate_response(continuation_prompt, [], model, system_prompt=system_prompt)
+            story_response = await self.ai_service.generate_response(continuation_prompt, [], model, system_prompt=system_prompt)
         except Exception as e:
             print(f"Cooperative story continuation error: {e}")
             story_response = "갑자기 예상치 못한 일이 벌어졌습니다..."
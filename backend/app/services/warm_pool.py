@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+PoolKey = Tuple[str, ...]
+
+
+def parse_pool_keys(value: str) -> List[PoolKey]:
+    """프리웜 설정(예: "normal:openai-gpt3.5,easy:openai-gpt3.5")을 풀 키 목록으로 변환"""
+    keys = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if ":" not in item:
+            # 키는 (장르/난이도, 모델) 쌍이어야 하므로 모델이 빠진 항목은 무시
+            print(f"[warm-pool] ignoring pool key without ':' in prewarm setting: {item!r}")
+            continue
+        keys.append(tuple(part.strip() for part in item.split(":")))
+    return keys
+
+
+class WarmPool:
+    """키별로 미리 생성·검증해 둔 결과를 보관하고 백그라운드에서 다시 채우는 풀
+
+    - 키의 재고가 low_watermark 아래로 내려가면 high_watermark까지 채움
+    - 생성 작업은 max_concurrency개로 제한 (풀 전체 공유)
+    - persist_path가 있으면 재고가 바뀔 때마다(생성/꺼냄) JSON으로 저장해 재시작 후에도 재사용
+      (이미 내준 항목이 비정상 종료 후 다시 나가지 않도록 꺼낼 때도 저장)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        producer: Callable[[PoolKey], Awaitable[Optional[Any]]],
+        low_watermark: int = 1,
+        high_watermark: int = 3,
+        max_concurrency: int = 2,
+        persist_path: Optional[str] = None,
+        retry_delay: float = 30.0,
+    ):
+        self.name = name
+        self.producer = producer
+        self.low_watermark = low_watermark
+        self.high_watermark = max(high_watermark, low_watermark)
+        self.max_concurrency = max_concurrency
+        self.persist_path = persist_path
+        self.retry_delay = retry_delay
+
+        self.items: Dict[PoolKey, Deque[Any]] = {}
+        self._refill_tasks: Dict[PoolKey, asyncio.Task] = {}
+        self._cooldown_until: Dict[PoolKey, float] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._running = False
+        self._save_task: Optional[asyncio.Task] = None
+        self._save_requested = False
+
+        self.hits = 0
+        self.misses = 0
+        self.produced = 0
+        self.failed = 0
+
+    def start(self, prewarm_keys: Iterable[PoolKey] = ()):
+        """디스크에서 재고를 복원하고 지정된 키를 미리 채우기 시작"""
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._running = True
+        self._load()
+        for key in list(self.items.keys()) + [tuple(key) for key in prewarm_keys]:
+            self._ensure_refill(key)
+
+    async def stop(self):
+        self._running = False
+        tasks = list(self._refill_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refill_tasks = {}
+        if self._save_task is not None:
+            await asyncio.gather(self._save_task, return_exceptions=True)
+        await asyncio.to_thread(self._save, self._snapshot())
+
+    def pop(self, key: PoolKey) -> Optional[Any]:
+        """준비된 항목 하나를 꺼냄 (없으면 None) 후 필요 시 재충전 예약"""
+        queue = self.items.get(key)
+        item = queue.popleft() if queue else None
+        if item is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._schedule_save()
+        self._ensure_refill(key)
+        return item
+
+    def size(self, key: PoolKey) -> int:
+        queue = self.items.get(key)
+        return len(queue) if queue else 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "produced": self.produced,
+            "failed": self.failed,
+            "refilling": len(self._refill_tasks),
+            "sizes": {"/".join(key): len(queue) for key, queue in self.items.items()},
+            "low_watermark": self.low_watermark,
+            "high_watermark": self.high_watermark,
+        }
+
+    def _ensure_refill(self, key: PoolKey):
+        if not self._running or key in self._refill_tasks:
+            return
+        if self.size(key) >= self.low_watermark and key in self.items:
+            return
+        if self._cooldown_until.get(key, 0) > time.monotonic():
+            return
+        self.items.setdefault(key, deque())
+        task = asyncio.create_task(self._refill(key))
+        self._refill_tasks[key] = task
+        task.add_done_callback(lambda _: self._refill_tasks.pop(key, None))
+
+    async def _refill(self, key: PoolKey):
+        while self._running and self.size(key) < self.high_watermark:
+            needed = self.high_watermark - self.size(key)
+            results = await asyncio.gather(
+                *[self._produce_one(key) for _ in range(needed)],
+                return_exceptions=True
+            )
+            succeeded = [item for item in results if item is not None and not isinstance(item, BaseException)]
+            for item in succeeded:
+                self.items[key].append(item)
+            self.produced += len(succeeded)
+            self.failed += len(results) - len(succeeded)
+
+            if succeeded:
+                self._schedule_save()
+            if len(succeeded) < len(results):
+                # 생성 실패 시 (API 키 없음, 장애 등) 잠시 쉬었다가 다음 요청 때 재시도
+                self._cooldown_until[key] = time.monotonic() + self.retry_delay
+                print(f"[{self.name}] refill failed for {key}, retry after {self.retry_delay}s")
+                return
+
+    async def _produce_one(self, key: PoolKey) -> Optional[Any]:
+        async with self._semaphore:
+            return await self.producer(key)
+
+    def _schedule_save(self):
+        """스냅샷 저장 예약 (저장 중에 또 바뀌면 끝난 뒤 최신 상태로 한 번 더 저장)"""
+        if not self.persist_path:
+            return
+        self._save_requested = True
+        if self._save_task is None:
+            self._save_task = asyncio.create_task(self._save_loop())
+
+    async def _save_loop(self):
+        try:
+            while self._save_requested:
+                self._save_requested = False
+                await asyncio.to_thread(self._save, self._snapshot())
+        finally:
+            self._save_task = None
+
+    def _snapshot(self) -> List[Dict[str, Any]]:
+        return [{"key": list(key), "items": list(queue)} for key, queue in self.items.items() if queue]
+
+    def _save(self, snapshot: List[Dict[str, Any]]):
+        if not self.persist_path:
+            return
+        tmp_path = f"{self.persist_path}.{os.getpid()}.tmp"
+        try:
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.persist_path)
+        except OSError as e:
+            print(f"[{self.name}] pool save error: {e}")
+
+    def _load(self):
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[{self.name}] pool load error: {e}")
+            return
+        for entry in snapshot:
+            key = tuple(entry["key"])
+            self.items.setdefault(key, deque()).extend(entry["items"])
+        print(f"[{self.name}] restored {sum(len(q) for q in self.items.values())} pooled items")
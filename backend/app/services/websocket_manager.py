@@ -1,71 +1,140 @@
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Set
 from fastapi import WebSocket
+import os
 import json
 import asyncio
 from datetime import datetime
 import uuid
 
+from .backplane import InProcessBackplane, RoomUpdate, backplane_from_env
+from .connection_writer import ConnectionWriter
+from .metrics import WS_BROADCAST_SECONDS
+
+# 방 이벤트 프로토콜 버전 (이벤트마다 v로 전송)
+PROTOCOL_VERSION = 1
+
 
 class ConnectionManager:
-    def __init__(self):
-        # 활성 연결 관리
+    """방 상태 변경은 seq가 붙은 이벤트로 바뀐 필드(changes)와 추가된 턴(turn)만 전송
+
+    클라이언트는 seq가 건너뛰면 sync_room(since=마지막 seq)으로 그 이후 상태의 스냅샷을 받습니다.
+    """
+
+    def __init__(self, backplane: Optional[InProcessBackplane] = None, send_timeout: Optional[float] = None, story_service=None, ai_timeout: Optional[float] = None):
+        # 활성 연결 관리 (이 워커에 붙은 연결만)
         self.active_connections: Dict[str, WebSocket] = {}
-        # 방별 플레이어 관리
-        self.rooms: Dict[str, Dict[str, any]] = {}
-        # 플레이어별 방 정보
-        self.player_rooms: Dict[str, str] = {}
+        # 연결별 전송 큐와 writer 태스크 (게임 로직은 큐에 넣고 바로 진행)
+        self.writers: Dict[str, ConnectionWriter] = {}
+        # 메시지 전송 하나에 허용하는 시간 (넘기면 멈춘 연결로 보고 정리)
+        self.send_timeout = send_timeout if send_timeout is not None else float(os.getenv("WS_SEND_TIMEOUT", "5"))
+        # 방별 브로드캐스트 지연 (이 워커 기준): room_id -> {"count", "total", "max"}
+        self.broadcast_latency: Dict[str, Dict[str, float]] = {}
+        self.send_failures = {"timeout": 0, "error": 0, "overflow": 0}
+        self._broadcast_seconds = WS_BROADCAST_SECONDS.labels()
+        # 방 상태와 방 메시지 전달은 백플레인이 담당 (WS_BACKPLANE=sqlite면 워커끼리 공유)
+        # 방은 get_room()으로 읽고, 고칠 때는 update_room()에 넘긴 함수 안에서만 수정 (읽기-수정-저장이 한 번에 반영)
+        self.backplane = backplane or backplane_from_env()
+        self.backplane.attach(self._deliver_local)
+        # 협력 스토리 생성 (처음 쓸 때 만들고 재사용)
+        self._story_service = story_service
+        # AI 생성(오프닝, AI 턴)은 백그라운드 태스크로 실행하고 방마다 하나씩 순서대로 처리
+        self.ai_timeout = ai_timeout if ai_timeout is not None else float(os.getenv("WS_AI_TIMEOUT", "60"))
+        self._room_locks: Dict[str, asyncio.Lock] = {}
+        self._ai_tasks: Set[asyncio.Task] = set()
+        self.ai_timeouts = 0
+
+    @property
+    def story_service(self):
+        if self._story_service is None:
+            from .story_game_service import StoryGameService
+            self._story_service = StoryGameService()
+        return self._story_service
 
     async def connect(self, websocket: WebSocket, player_id: str):
         """새 클라이언트 연결"""
         await websocket.accept()
         self.active_connections[player_id] = websocket
+        previous = self.writers.pop(player_id, None)
+        if previous is not None:
+            previous.close()
+        writer = ConnectionWriter.from_env(
+            player_id, websocket,
+            send_timeout=self.send_timeout,
+            on_failure=self._on_writer_failure,
+            on_sent=self._record_broadcast
+        )
+        self.writers[player_id] = writer
+        writer.start()
         print(f"Player {player_id} connected. Active connections: {len(self.active_connections)}")
 
-    def disconnect(self, player_id: str):
-        """클라이언트 연결 해제"""
+    def disconnect(self, player_id: str, websocket: Optional[WebSocket] = None):
+        """클라이언트 연결 해제 (websocket을 주면 그 연결이 아직 이 플레이어의 현재 연결일 때만)"""
+        if websocket is not None and self.active_connections.get(player_id) is not websocket:
+            # 전송 실패로 이미 정리됐거나 같은 player_id로 다시 연결한 경우
+            return
         if player_id in self.active_connections:
             del self.active_connections[player_id]
+        writer = self.writers.pop(player_id, None)
+        if writer is not None:
+            writer.close()
         
-        # 플레이어가 속한 방에서 제거
-        if player_id in self.player_rooms:
-            room_id = self.player_rooms[player_id]
-            self.leave_room(player_id, room_id)
+        # 플레이어가 속한 방에서 제거하고 남은 플레이어들에게 알림 (백플레인 조회는 백그라운드에서)
+        asyncio.ensure_future(self._leave_on_disconnect(player_id))
         
         print(f"Player {player_id} disconnected. Active connections: {len(self.active_connections)}")
 
+    async def _leave_on_disconnect(self, player_id: str):
+        room_id = await self.get_player_room(player_id)
+        if room_id:
+            event = await self.leave_room(player_id, room_id, reason='player_disconnected')
+            if event is not None:
+                await self.send_room_message(event, room_id)
+
     async def send_personal_message(self, message: dict, player_id: str):
-        """특정 플레이어에게 메시지 전송"""
-        if player_id in self.active_connections:
-            try:
-                await self.active_connections[player_id].send_text(json.dumps(message))
-            except:
-                # 연결이 끊어진 경우
-                self.disconnect(player_id)
+        """특정 플레이어에게 메시지 전송 (전송 큐에 넣고 바로 반환)"""
+        writer = self.writers.get(player_id)
+        if writer is not None:
+            writer.send(json.dumps(message), message.get('type'))
 
     async def send_room_message(self, message: dict, room_id: str, exclude_player: Optional[str] = None):
-        """방의 모든 플레이어에게 메시지 전송"""
-        if room_id not in self.rooms:
-            return
+        """방의 모든 플레이어에게 메시지 전송 (다른 워커에 붙은 플레이어는 백플레인을 거쳐 전달)"""
+        await self.backplane.publish(room_id, message, exclude_player)
 
-        room = self.rooms[room_id]
-        disconnected_players = []
-        
-        for player_id in room['players']:
-            if player_id != exclude_player and player_id in self.active_connections:
-                try:
-                    await self.active_connections[player_id].send_text(json.dumps(message))
-                except:
-                    disconnected_players.append(player_id)
-        
-        # 연결이 끊어진 플레이어들을 정리
-        for player_id in disconnected_players:
-            self.disconnect(player_id)
+    async def _deliver_local(self, room_id: str, frame: str, exclude_player: Optional[str] = None, message_type: Optional[str] = None) -> int:
+        """이 워커에 연결된 방 플레이어의 전송 큐에 인코딩된 프레임을 넣고 넣은 수를 반환
+
+        실제 전송은 연결별 writer 태스크가 하므로 느린 연결 하나가 방 전체나 게임 로직을 막지 않습니다.
+        """
+        room = await self.backplane.get_room(room_id)
+        if room is None:
+            return 0
+
+        sent = 0
+        # 큐 초과로 연결이 정리되면 방에서도 빠지므로 목록을 복사해서 순회
+        for player_id in list(room['players']):
+            writer = self.writers.get(player_id)
+            if player_id != exclude_player and writer is not None:
+                if writer.send(frame, message_type, room_id):
+                    sent += 1
+        return sent
 
-    def create_room(self, host_player_id: str, player_name: str, game_settings: dict) -> str:
+    def _on_writer_failure(self, writer: ConnectionWriter, reason: str):
+        """전송 실패/큐 초과로 writer가 멈춘 연결 정리 (이미 재연결한 플레이어는 그대로 둠)"""
+        self.send_failures[reason] += 1
+        if self.writers.get(writer.player_id) is writer:
+            self.disconnect(writer.player_id)
+
+    def _record_broadcast(self, room_id: str, elapsed: float):
+        self._broadcast_seconds.observe(elapsed)
+        latency = self.broadcast_latency.setdefault(room_id, {"count": 0, "total": 0.0, "max": 0.0})
+        latency["count"] += 1
+        latency["total"] += elapsed
+        latency["max"] = max(latency["max"], elapsed)
+
+    async def create_room(self, host_player_id: str, player_name: str, game_settings: dict) -> str:
         """새 게임 방 생성"""
         room_id = str(uuid.uuid4())[:8].upper()
-        
-        self.rooms[room_id] = {
+        room = {
             'host': host_player_id,
             'players': {
                 host_player_id: {
@@ -80,225 +149,373 @@ class ConnectionManager:
             'created_at': datetime.now().isoformat(),
             'story_content': [],
             'current_turn': None,
-            'turn_start_time': None
+            'turn_start_time': None,
+            'seq': 0
         }
         
-        self.player_rooms[host_player_id] = room_id
+        def create(update: RoomUpdate):
+            update.room = room
+            update.save()
+            update.set_player_room(host_player_id, room_id)
+        
+        await self.backplane.update_room(room_id, create)
         return room_id
 
     async def join_room(self, player_id: str, player_name: str, room_id: str) -> dict:
         """기존 방에 참가"""
-        if room_id not in self.rooms:
-            return {'success': False, 'error': '존재하지 않는 방입니다.'}
-        
-        room = self.rooms[room_id]
-        
-        if len(room['players']) >= 4:
-            return {'success': False, 'error': '방이 가득 찼습니다.'}
-        
-        if room['game_state'] != 'waiting':
-            return {'success': False, 'error': '게임이 이미 시작되었습니다.'}
-        
-        # 플레이어 추가
-        room['players'][player_id] = {
-            'name': player_name,
-            'is_host': False,
-            'is_online': True,
-            'joined_at': datetime.now().isoformat()
-        }
-        
-        self.player_rooms[player_id] = room_id
+        def join(update: RoomUpdate) -> dict:
+            room = update.room
+            if room is None:
+                return {'success': False, 'error': '존재하지 않는 방입니다.'}
+            
+            if len(room['players']) >= 4:
+                return {'success': False, 'error': '방이 가득 찼습니다.'}
+            
+            if room['game_state'] != 'waiting':
+                return {'success': False, 'error': '게임이 이미 시작되었습니다.'}
+            
+            # 플레이어 추가
+            room['players'][player_id] = {
+                'name': player_name,
+                'is_host': False,
+                'is_online': True,
+                'joined_at': datetime.now().isoformat()
+            }
+            event = self._room_event(room_id, room, 'player_joined', {
+                'players': room['players'],
+                'player_count': len(room['players'])
+            }, player_id=player_id, player_name=player_name)
+            update.save()
+            update.set_player_room(player_id, room_id)
+            return {'success': True, 'event': event, 'room_info': self._room_info(room_id, room)}
+        
+        result = await self.backplane.update_room(room_id, join)
+        if not result['success']:
+            return result
         
         # 방의 다른 플레이어들에게 새 플레이어 참가 알림
-        await self.send_room_message({
-            'type': 'player_joined',
-            'player_id': player_id,
-            'player_name': player_name,
-            'room_info': self.get_room_info(room_id)
-        }, room_id, exclude_player=player_id)
+        await self.send_room_message(result.pop('event'), room_id, exclude_player=player_id)
         
-        return {'success': True, 'room_info': self.get_room_info(room_id)}
+        return result
 
-    def leave_room(self, player_id: str, room_id: str):
-        """방에서 나가기"""
-        if room_id not in self.rooms:
-            return
-        
-        room = self.rooms[room_id]
-        
-        if player_id in room['players']:
-            del room['players'][player_id]
-        
-        if player_id in self.player_rooms:
-            del self.player_rooms[player_id]
-        
-        # 방이 비어있으면 삭제
-        if len(room['players']) == 0:
-            del self.rooms[room_id]
-        else:
+    async def leave_room(self, player_id: str, room_id: str, reason: str = 'player_left') -> Optional[dict]:
+        """방에서 나가기 (방이 남아 있으면 다른 플레이어에게 보낼 이벤트를 반환)"""
+        def leave(update: RoomUpdate):
+            room = update.room
+            if room is None:
+                return None, False
+            
+            room['players'].pop(player_id, None)
+            update.set_player_room(player_id, None)
+            
+            # 방이 비어있으면 삭제
+            if len(room['players']) == 0:
+                update.delete()
+                return None, True
+            
             # 호스트가 나갔으면 다른 플레이어를 호스트로 지정
             if room['host'] == player_id:
                 new_host_id = list(room['players'].keys())[0]
                 room['host'] = new_host_id
                 room['players'][new_host_id]['is_host'] = True
+            event = self._room_event(room_id, room, reason, {
+                'host': room['host'],
+                'players': room['players'],
+                'player_count': len(room['players'])
+            }, player_id=player_id)
+            update.save()
+            return event, False
+        
+        event, deleted = await self.backplane.update_room(room_id, leave)
+        if deleted:
+            self.broadcast_latency.pop(room_id, None)
+            lock = self._room_locks.get(room_id)
+            if lock is not None and not lock.locked():
+                del self._room_locks[room_id]
+        return event
+
+    def _schedule_ai(self, room_id: str, job: Callable[[str], Awaitable[None]]):
+        """AI 생성 작업을 백그라운드로 실행 (같은 방의 작업은 방 락으로 하나씩)"""
+        async def run():
+            lock = self._room_locks.setdefault(room_id, asyncio.Lock())
+            async with lock:
+                try:
+                    await job(room_id)
+                except Exception as e:
+                    print(f"[ws] AI task for room {room_id} failed: {e}")
+
+        task = asyncio.create_task(run())
+        self._ai_tasks.add(task)
+        task.add_done_callback(self._ai_tasks.discard)
+
+    async def stop(self):
+        """종료 시 진행 중인 AI 작업 취소"""
+        tasks = list(self._ai_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     async def start_game(self, host_player_id: str, room_id: str) -> dict:
-        """게임 시작"""
-        if room_id not in self.rooms:
-            return {'success': False, 'error': '존재하지 않는 방입니다.'}
-        
-        room = self.rooms[room_id]
-        
-        if room['host'] != host_player_id:
-            return {'success': False, 'error': '호스트만 게임을 시작할 수 있습니다.'}
-        
-        # AI 플레이어가 없으면 자동으로 추가
-        ai_player_exists = any(player['name'] == 'AI 어시스턴트' for player in room['players'].values())
-        if not ai_player_exists:
-            ai_player_id = f"ai_{room_id}"
-            room['players'][ai_player_id] = {
-                'name': 'AI 어시스턴트',
-                'is_host': False,
-                'is_online': True,
-                'joined_at': datetime.now().isoformat()
-            }
-        
-        if len(room['players']) < 1:
-            return {'success': False, 'error': '최소 1명의 플레이어가 필요합니다.'}
-        
-        # 게임 시작
-        room['game_state'] = 'playing'
-        player_ids = list(room['players'].keys())
-        room['current_turn'] = player_ids[0]  # 첫 번째 플레이어부터 시작
-        room['turn_start_time'] = datetime.now().isoformat()
+        """게임 시작 (오프닝 생성은 백그라운드에서 하고 끝나면 game_started 전송)"""
+        def start(update: RoomUpdate) -> dict:
+            room = update.room
+            if room is None:
+                return {'success': False, 'error': '존재하지 않는 방입니다.'}
+            
+            if room['host'] != host_player_id:
+                return {'success': False, 'error': '호스트만 게임을 시작할 수 있습니다.'}
+            
+            if room['game_state'] != 'waiting':
+                return {'success': False, 'error': '게임이 이미 시작되었습니다.'}
+            
+            # AI 플레이어가 없으면 자동으로 추가
+            ai_player_exists = any(player['name'] == 'AI 어시스턴트' for player in room['players'].values())
+            if not ai_player_exists:
+                ai_player_id = f"ai_{room_id}"
+                room['players'][ai_player_id] = {
+                    'name': 'AI 어시스턴트',
+                    'is_host': False,
+                    'is_online': True,
+                    'joined_at': datetime.now().isoformat()
+                }
+            
+            # 오프닝을 만드는 동안은 참가/턴 제출을 막음
+            room['game_state'] = 'starting'
+            update.save()
+            return {'success': True}
         
-        # AI 스토리 시작 생성
-        from .story_game_service import StoryGameService
-        story_service = StoryGameService()
+        result = await self.backplane.update_room(room_id, start)
+        if result['success']:
+            self._schedule_ai(room_id, self._start_story)
+        return result
+
+    async def _start_story(self, room_id: str):
+        """AI 스토리 시작 생성 후 게임 시작"""
+        room = await self.backplane.get_room(room_id)
+        if room is None:
+            return
         
         try:
-            initial_story = story_service.start_cooperative_story(
-                room['game_settings']['genre'],
-                room['game_settings']['model']
+            initial_story = await asyncio.wait_for(
+                self.story_service.start_cooperative_story(
+                    room['game_settings']['genre'],
+                    room['game_settings']['model']
+                ),
+                self.ai_timeout
             )
             
-            room['story_content'] = [{
-                'player': 'AI',
-                'text': initial_story['story'],
-                'timestamp': datetime.now().isoformat()
-            }]
+            # 생성하는 동안 다른 워커에서 바뀌었을 수 있으므로 최신 방 상태에 반영
+            def begin(update: RoomUpdate) -> Optional[dict]:
+                room = update.room
+                if room is None or room['game_state'] != 'starting':
+                    return None
+                
+                # 게임 시작
+                room['game_state'] = 'playing'
+                player_ids = list(room['players'].keys())
+                room['current_turn'] = player_ids[0]  # 첫 번째 플레이어부터 시작
+                room['turn_start_time'] = datetime.now().isoformat()
+                turn = {
+                    'player': 'AI',
+                    'text': initial_story['story'],
+                    'timestamp': datetime.now().isoformat()
+                }
+                room['story_content'] = [turn]
+                event = self._room_event(room_id, room, 'game_started', {
+                    'game_state': room['game_state'],
+                    'current_turn': room['current_turn'],
+                    'players': room['players'],
+                    'player_count': len(room['players'])
+                }, turn=turn)
+                update.save()
+                return event
             
-            # 방의 모든 플레이어에게 게임 시작 알림
-            await self.send_room_message({
-                'type': 'game_started',
-                'room_info': self.get_room_info(room_id),
-                'story_content': room['story_content']
-            }, room_id)
+            event = await self.backplane.update_room(room_id, begin)
             
-            return {'success': True}
+            # 방의 모든 플레이어에게 게임 시작 알림
+            if event is not None:
+                await self.send_room_message(event, room_id)
             
         except Exception as e:
-            return {'success': False, 'error': f'스토리 생성 중 오류: {str(e)}'}
+            reason = self._ai_error(e)
+            print(f"Cooperative story start error: {reason}")
+            # 대기실로 되돌리고 호스트에게 알림
+            def reset(update: RoomUpdate) -> Optional[str]:
+                if update.room is None:
+                    return None
+                update.room['game_state'] = 'waiting'
+                update.save()
+                return update.room['host']
+            
+            host = await self.backplane.update_room(room_id, reset)
+            if host is not None:
+                await self.send_personal_message({
+                    'type': 'error',
+                    'message': f'스토리 생성 중 오류: {reason}'
+                }, host)
+
+    def _ai_error(self, error: Exception) -> str:
+        if isinstance(error, asyncio.TimeoutError):
+            self.ai_timeouts += 1
+            return f'{self.ai_timeout:g}초 안에 응답이 없습니다'
+        return str(error)
+
+    @staticmethod
+    def _advance_turn(room: dict) -> str:
+        """현재 턴 다음 플레이어로 차례를 넘기고 그 player_id를 반환"""
+        player_ids = list(room['players'].keys())
+        next_index = (player_ids.index(room['current_turn']) + 1) % len(player_ids)
+        room['current_turn'] = player_ids[next_index]
+        return room['current_turn']
 
     async def submit_turn(self, player_id: str, room_id: str, text: str) -> dict:
         """플레이어 턴 제출"""
-        if room_id not in self.rooms:
-            return {'success': False, 'error': '존재하지 않는 방입니다.'}
-        
-        room = self.rooms[room_id]
-        
-        if room['game_state'] != 'playing':
-            return {'success': False, 'error': '게임이 진행 중이 아닙니다.'}
+        def submit(update: RoomUpdate) -> dict:
+            room = update.room
+            if room is None:
+                return {'success': False, 'error': '존재하지 않는 방입니다.'}
+            
+            if room['game_state'] != 'playing':
+                return {'success': False, 'error': '게임이 진행 중이 아닙니다.'}
+            
+            if room['current_turn'] != player_id:
+                return {'success': False, 'error': '현재 당신의 차례가 아닙니다.'}
+            
+            # 턴 추가
+            player_name = room['players'][player_id]['name']
+            turn = {
+                'player': player_name,
+                'text': text,
+                'timestamp': datetime.now().isoformat()
+            }
+            room['story_content'].append(turn)
+            
+            # 다음 턴으로 이동
+            self._advance_turn(room)
+            room['turn_start_time'] = datetime.now().isoformat()
+            event = self._room_event(room_id, room, 'turn_submitted', {'current_turn': room['current_turn']}, turn=turn)
+            update.save()
+            return {'success': True, 'event': event}
         
-        if room['current_turn'] != player_id:
-            return {'success': False, 'error': '현재 당신의 차례가 아닙니다.'}
+        result = await self.backplane.update_room(room_id, submit)
+        if not result['success']:
+            return result
+        event = result.pop('event')
         
-        # 턴 추가
-        player_name = room['players'][player_id]['name']
-        room['story_content'].append({
-            'player': player_name,
-            'text': text,
-            'timestamp': datetime.now().isoformat()
-        })
+        # 방의 모든 플레이어에게 추가된 턴만 알림
+        await self.send_room_message(event, room_id)
         
-        # 다음 턴으로 이동
-        player_ids = list(room['players'].keys())
-        current_index = player_ids.index(player_id)
-        next_index = (current_index + 1) % len(player_ids)
-        room['current_turn'] = player_ids[next_index]
-        room['turn_start_time'] = datetime.now().isoformat()
+        # 다음 턴이 AI인 경우 백그라운드에서 AI 턴 생성 (제출한 플레이어는 기다리지 않음)
+        if event['changes']['current_turn'].startswith('ai_'):
+            self._schedule_ai(room_id, self.handle_ai_turn)
         
-        # 방의 모든 플레이어에게 업데이트 알림
-        await self.send_room_message({
-            'type': 'turn_submitted',
-            'room_info': self.get_room_info(room_id),
-            'story_content': room['story_content']
-        }, room_id)
-        
-        # 다음 턴이 AI인 경우 자동으로 AI 턴 생성
-        if room['current_turn'].startswith('ai_'):
-            await self.handle_ai_turn(room_id)
-        
-        return {'success': True}
+        return result
 
     async def handle_ai_turn(self, room_id: str):
         """AI 턴 자동 처리"""
-        if room_id not in self.rooms:
+        room = await self.backplane.get_room(room_id)
+        if room is None:
             return
         
-        room = self.rooms[room_id]
+        ai_player_id = room.get('current_turn') or ''
+        # 앞선 작업이 이미 턴을 넘겼으면 할 일이 없음
+        if not ai_player_id.startswith('ai_'):
+            return
         
         try:
-            # AI 스토리 생성
-            from .story_game_service import StoryGameService
-            story_service = StoryGameService()
-            
             # 현재 스토리 내용을 AI에게 전달
             current_story = "\n".join([turn['text'] for turn in room['story_content']])
             
-            ai_response = story_service.continue_cooperative_story(
-                current_story,
-                room['game_settings']['genre'],
-                room['game_settings']['model']
+            ai_response = await asyncio.wait_for(
+                self.story_service.continue_cooperative_story(
+                    current_story,
+                    room['game_settings']['genre'],
+                    room['game_settings']['model']
+                ),
+                self.ai_timeout
             )
             
-            # AI 턴 추가
-            room['story_content'].append({
-                'player': 'AI 어시스턴트',
-                'text': ai_response['continuation'],
-                'timestamp': datetime.now().isoformat()
-            })
+            def complete(update: RoomUpdate) -> Optional[dict]:
+                room = update.room
+                # 생성하는 동안 턴이 넘어갔으면 반영하지 않음
+                if room is None or room['current_turn'] != ai_player_id:
+                    return None
+                
+                # AI 턴 추가
+                turn = {
+                    'player': 'AI 어시스턴트',
+                    'text': ai_response['continuation'],
+                    'timestamp': datetime.now().isoformat()
+                }
+                room['story_content'].append(turn)
+                
+                # 다음 턴으로 이동
+                self._advance_turn(room)
+                room['turn_start_time'] = datetime.now().isoformat()
+                event = self._room_event(room_id, room, 'ai_turn_completed', {'current_turn': room['current_turn']}, turn=turn)
+                update.save()
+                return event
             
-            # 다음 턴으로 이동
-            player_ids = list(room['players'].keys())
-            ai_player_id = room['current_turn']
-            current_index = player_ids.index(ai_player_id)
-            next_index = (current_index + 1) % len(player_ids)
-            room['current_turn'] = player_ids[next_index]
-            room['turn_start_time'] = datetime.now().isoformat()
+            event = await self.backplane.update_room(room_id, complete)
             
             # 방의 모든 플레이어에게 AI 턴 알림
-            await self.send_room_message({
-                'type': 'ai_turn_completed',
-                'room_info': self.get_room_info(room_id),
-                'story_content': room['story_content']
-            }, room_id)
+            if event is not None:
+                await self.send_room_message(event, room_id)
             
         except Exception as e:
-            print(f"AI turn generation error: {e}")
+            print(f"AI turn generation error: {self._ai_error(e)}")
             # AI 턴 생성 실패 시 스킵하고 다음 플레이어로 이동
-            player_ids = list(room['players'].keys())
-            ai_player_id = room['current_turn']
-            current_index = player_ids.index(ai_player_id)
-            next_index = (current_index + 1) % len(player_ids)
-            room['current_turn'] = player_ids[next_index]
+            def skip(update: RoomUpdate) -> Optional[dict]:
+                room = update.room
+                if room is None or room['current_turn'] != ai_player_id or ai_player_id not in room['players']:
+                    return None
+                self._advance_turn(room)
+                event = self._room_event(room_id, room, 'turn_skipped', {'current_turn': room['current_turn']})
+                update.save()
+                return event
+            
+            event = await self.backplane.update_room(room_id, skip)
+            if event is not None:
+                await self.send_room_message(event, room_id)
 
-    def get_room_info(self, room_id: str) -> Optional[dict]:
-        """방 정보 조회"""
-        if room_id not in self.rooms:
+    def _room_event(self, room_id: str, room: dict, event_type: str, changes: Optional[dict] = None, turn: Optional[dict] = None, **extra) -> dict:
+        """방의 seq를 올리고 바뀐 필드와 추가된 턴만 담은 이벤트 생성 (update_room 안에서 호출)"""
+        room['seq'] = room.get('seq', 0) + 1
+        event = {'type': event_type, 'v': PROTOCOL_VERSION, 'room_id': room_id, 'seq': room['seq']}
+        if changes:
+            event['changes'] = changes
+        if turn is not None:
+            # 스냅샷 요청 시 since 이후 턴만 고를 수 있도록 턴에도 seq를 남김
+            turn['seq'] = room['seq']
+            event['turn'] = turn
+        event.update(extra)
+        return event
+
+    async def get_room_snapshot(self, room_id: str, since: int = 0) -> Optional[dict]:
+        """seq가 since인 상태 이후의 스냅샷: 현재 방 정보 + since 이후에 추가된 턴"""
+        room = await self.backplane.get_room(room_id)
+        if room is None:
             return None
         
-        room = self.rooms[room_id]
+        return {
+            'type': 'room_snapshot',
+            'v': PROTOCOL_VERSION,
+            'room_id': room_id,
+            'seq': room.get('seq', 0),
+            'since': since,
+            'room_info': self._room_info(room_id, room),
+            'story_content': [turn for turn in room['story_content'] if turn.get('seq', 0) > since]
+        }
+
+    async def get_room_info(self, room_id: str) -> Optional[dict]:
+        """방 정보 조회"""
+        room = await self.backplane.get_room(room_id)
+        if room is None:
+            return None
+        return self._room_info(room_id, room)
+
+    @staticmethod
+    def _room_info(room_id: str, room: dict) -> dict:
         return {
             'room_id': room_id,
             'host': room['host'],
@@ -306,12 +523,48 @@ class ConnectionManager:
             'game_state': room['game_state'],
             'game_settings': room['game_settings'],
             'current_turn': room.get('current_turn'),
-            'player_count': len(room['players'])
+            'player_count': len(room['players']),
+            'seq': room.get('seq', 0)
         }
 
-    def get_player_room(self, player_id: str) -> Optional[str]:
+    async def get_player_room(self, player_id: str) -> Optional[str]:
         """플레이어가 속한 방 ID 조회"""
-        return self.player_rooms.get(player_id)
+        return await self.backplane.get_player_room(player_id)
+
+    async def get_rooms(self) -> Dict[str, dict]:
+        """모든 방 (디버깅용)"""
+        return await self.backplane.list_rooms()
+
+    def get_broadcast_latency(self, room_id: str) -> Optional[dict]:
+        """이 워커에서 측정한 방 브로드캐스트 지연 (ms)"""
+        latency = self.broadcast_latency.get(room_id)
+        if latency is None:
+            return None
+        return {
+            'deliveries': latency['count'],
+            'avg_ms': round(latency['total'] / latency['count'] * 1000, 3),
+            'max_ms': round(latency['max'] * 1000, 3)
+        }
+
+    def get_connection_stats(self) -> dict:
+        """연결별 전송 큐 상태"""
+        return {player_id: writer.stats() for player_id, writer in self.writers.items()}
+
+    def stats(self) -> dict:
+        writers = list(self.writers.values())
+        return {
+            'active_connections': len(self.active_connections),
+            'send_timeout': self.send_timeout,
+            'send_failures': dict(self.send_failures),
+            'queue_depth': sum(writer.depth for writer in writers),
+            'max_queue_depth': max((writer.depth for writer in writers), default=0),
+            'dropped': sum(writer.dropped for writer in writers),
+            'coalesced': sum(writer.coalesced for writer in writers),
+            'rooms_measured': len(self.broadcast_latency),
+            'ai_tasks': len(self._ai_tasks),
+            'ai_timeout': self.ai_timeout,
+            'ai_timeouts': self.ai_timeouts
+        }
 
 
 # 전역 ConnectionManager 인스턴스
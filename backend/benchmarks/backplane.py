@@ -0,0 +1,107 @@
+"""방 메시지 백플레인별 발행 지연과 fan-out 비교
+
+워커 두 개(백플레인 인스턴스 두 개)에 방 플레이어를 반씩 나눠 붙이고, 한쪽에서 방 메시지를 발행합니다.
+- publish: 발행 호출 시간 (자기 워커 연결로 보내는 시간 포함)
+- remote: 발행 시작부터 다른 워커의 연결까지 전달되는 데 걸린 시간 (sqlite만)
+연결은 send_text를 흉내 내는 가짜 소켓이라 네트워크 비용은 빠져 있습니다.
+
+    cd backend && python -m benchmarks.backplane --messages 2000 --players 4
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from typing import Dict, List, Optional
+
+from app.services.backplane import InProcessBackplane, SQLiteBackplane
+
+
+class FakeWorker:
+    """ConnectionManager._deliver_local처럼 자기 워커에 붙은 플레이어에게만 보냄"""
+
+    def __init__(self, backplane: InProcessBackplane, local_players: List[str]):
+        self.backplane = backplane
+        self.local_players = set(local_players)
+        self.arrivals: Dict[int, float] = {}
+        backplane.attach(self.deliver)
+
+    async def deliver(self, room_id: str, frame: str, exclude_player: Optional[str], message_type: Optional[str]) -> int:
+        sent = 0
+        room = await self.backplane.get_room(room_id)
+        for player_id in room["players"]:
+            if player_id != exclude_player and player_id in self.local_players:
+                sent += 1
+        self.arrivals.setdefault(json.loads(frame)["seq"], time.perf_counter())
+        return sent
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)] * 1000
+
+
+async def run(kind: str, messages: int, players: int, poll_ms: float):
+    player_ids = [f"p{i}" for i in range(players)]
+    if kind == "memory":
+        backplanes = [InProcessBackplane()]
+        groups = [player_ids]
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "ws_backplane.db")
+        backplanes = [SQLiteBackplane(path, poll_interval=poll_ms / 1000) for _ in range(2)]
+        groups = [player_ids[::2], player_ids[1::2]]
+    workers = [FakeWorker(backplane, group) for backplane, group in zip(backplanes, groups)]
+    room = {"players": {player_id: {"name": player_id} for player_id in player_ids}}
+
+    def create(update):
+        update.room = room
+        update.save()
+
+    await backplanes[0].update_room("ROOM", create)
+    for backplane in backplanes:
+        backplane.start()
+
+    publish_times, started_at = [], {}
+    for seq in range(messages):
+        started = time.perf_counter()
+        started_at[seq] = started
+        await backplanes[0].publish("ROOM", {"type": "turn_submitted", "seq": seq, "text": "x" * 200})
+        publish_times.append(time.perf_counter() - started)
+        # 실제 방처럼 메시지 사이에 이벤트 루프가 돌 틈을 줌
+        await asyncio.sleep(0)
+
+    remote: List[float] = []
+    if len(workers) > 1:
+        deadline = time.perf_counter() + 5
+        while len(workers[1].arrivals) < messages and time.perf_counter() < deadline:
+            await asyncio.sleep(poll_ms / 1000)
+        remote = [workers[1].arrivals[seq] - started_at[seq] for seq in workers[1].arrivals]
+
+    stats = [backplane.stats() for backplane in backplanes]
+    for backplane in backplanes:
+        await backplane.stop()
+
+    delivered = sum(s["delivered"] for s in stats)
+    print(
+        f"{kind:<8}{percentile(publish_times, 0.5):>10.3f}{percentile(publish_times, 0.99):>10.3f}"
+        + (f"{percentile(remote, 0.5):>10.2f}{percentile(remote, 0.99):>10.2f}" if remote else f"{'-':>10}{'-':>10}")
+        + f"{delivered / messages:>8.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="방 메시지 백플레인 발행 지연 / fan-out")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--poll-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    print(f"{args.messages} messages, {args.players} players per room (ms)")
+    print(f"{'':<8}{'pub p50':>10}{'pub p99':>10}{'remote50':>10}{'remote99':>10}{'fanout':>8}")
+    for kind in ("memory", "sqlite"):
+        asyncio.run(run(kind, args.messages, args.players, args.poll_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""협력 스토리 한 판에 WebSocket으로 보내는 바이트 수: 이전 전체 상태 전송 vs seq 델타 이벤트
+
+ConnectionManager로 실제 게임(방 생성 → 참가 → 시작 → 턴 반복, AI 턴 포함)을 진행하고
+가짜 소켓이 받은 프레임 바이트를 셉니다. 이전 방식의 크기는 같은 시점의 방 상태로
+이전 메시지(room_info + story_content 전체)를 다시 만들어 계산합니다. AI 응답은 고정 문단입니다.
+
+    cd backend && python -m benchmarks.room_protocol --players 3 --turns 40
+"""
+import io
+import json
+import asyncio
+import argparse
+import contextlib
+from typing import Any, Dict, List, Optional
+
+from app.services.backplane import InProcessBackplane
+from app.services.websocket_manager import ConnectionManager
+
+PARAGRAPH = "어두운 숲 속에서 낯선 빛이 깜빡였다. 일행은 조심스럽게 발걸음을 옮기며 주위를 살핀다. "
+FULL_STATE_TYPES = ("game_started", "turn_submitted", "ai_turn_completed")
+
+
+class FakeStoryService:
+    async def start_cooperative_story(self, genre: str, model: str) -> Dict[str, Any]:
+        return {"story": PARAGRAPH * 2, "genre": genre}
+
+    async def continue_cooperative_story(self, current_story: str, genre: str, model: str) -> Dict[str, Any]:
+        return {"continuation": PARAGRAPH * 2}
+
+
+class FakeSocket:
+    def __init__(self):
+        self.bytes = 0
+        self.frames = 0
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_text(self, text: str):
+        self.bytes += len(text.encode("utf-8"))
+        self.frames += 1
+
+
+class LegacySizer(ConnectionManager):
+    """방 메시지마다 이전 형식으로 보냈을 때의 바이트 수를 함께 계산"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.legacy_bytes = 0
+
+    async def send_room_message(self, message: dict, room_id: str, exclude_player: Optional[str] = None):
+        room = await self.backplane.get_room(room_id)
+        if room is not None:
+            recipients = [p for p in room["players"] if p != exclude_player and p in self.writers]
+            self.legacy_bytes += len(self._legacy_frame(message, room_id, room).encode("utf-8")) * len(recipients)
+        await super().send_room_message(message, room_id, exclude_player)
+
+    def _legacy_frame(self, message: dict, room_id: str, room: Dict[str, Any]) -> str:
+        room_info = self._room_info(room_id, room)
+        room_info.pop("seq", None)
+        legacy: Dict[str, Any] = {"type": message["type"]}
+        if "player_id" in message:
+            legacy["player_id"] = message["player_id"]
+        if "player_name" in message:
+            legacy["player_name"] = message["player_name"]
+        legacy["room_info"] = room_info
+        if message["type"] in FULL_STATE_TYPES:
+            legacy["story_content"] = [
+                {key: value for key, value in turn.items() if key != "seq"}
+                for turn in room["story_content"]
+            ]
+        return json.dumps(legacy)
+
+
+async def play(players: int, turns: int):
+    manager = LegacySizer(backplane=InProcessBackplane(), story_service=FakeStoryService())
+    sockets: List[FakeSocket] = []
+    player_ids = [f"player-{i}" for i in range(players)]
+    for player_id in player_ids:
+        socket = FakeSocket()
+        sockets.append(socket)
+        await manager.connect(socket, player_id)
+
+    room_id = await manager.create_room(player_ids[0], "호스트", {"genre": "fantasy", "model": "openai-gpt3.5"})
+    for index, player_id in enumerate(player_ids[1:], start=1):
+        await manager.join_room(player_id, f"플레이어{index}", room_id)
+    await manager.start_game(player_ids[0], room_id)
+
+    submitted = 0
+    while submitted < turns:
+        room = await manager.backplane.get_room(room_id)
+        current = room["current_turn"]
+        # 오프닝/AI 턴은 백그라운드 태스크에서 생성되므로 끝날 때까지 양보
+        if room["game_state"] != "playing" or current.startswith("ai_"):
+            await asyncio.sleep(0)
+            continue
+        await manager.submit_turn(current, room_id, f"{submitted}번째 턴: 나는 빛을 향해 조심스럽게 다가간다.")
+        submitted += 1
+
+    await manager.stop()
+    await asyncio.sleep(0.01)
+    delta_bytes = sum(socket.bytes for socket in sockets)
+    story_turns = len((await manager.backplane.get_room(room_id))["story_content"])
+    for player_id in player_ids:
+        manager.disconnect(player_id)
+    return manager.legacy_bytes, delta_bytes, story_turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="협력 스토리 한 판의 WebSocket 전송 바이트 비교")
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=40, help="사람 플레이어가 제출하는 턴 수 (AI 턴은 별도)")
+    args = parser.parse_args()
+
+    print(f"{'players':>8}{'turns':>8}{'story':>8}{'before KB':>12}{'after KB':>12}{'saved':>8}")
+    for turns in sorted({10, args.turns // 2, args.turns}):
+        # ConnectionManager의 연결/해제 로그가 결과 표와 섞이지 않도록 게임 진행 중 출력은 버림
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy, delta, story_turns = asyncio.run(play(args.players, turns))
+        print(
+            f"{args.players:>8}{turns:>8}{story_turns:>8}{legacy / 1024:>12.1f}{delta / 1024:>12.1f}"
+            f"{(1 - delta / legacy) * 100:>7.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
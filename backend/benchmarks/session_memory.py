@@ -0,0 +1,106 @@
+"""세션 표현 방식별 메모리 사용량 비교
+
+딕셔너리 기반(이전 story_contexts 형식)과 StorySession 기반으로 같은 20턴 스토리 세션을 만들어
+세션당 바이트 수와 직렬화 크기/시간을 비교합니다. 스토리 본문 문자열은 미리 만들어 두고 양쪽이 공유하므로
+측정값은 본문을 제외한 컨테이너/메타데이터 비용입니다.
+
+    cd backend && python -m benchmarks.session_memory --sessions 5000 --turns 20
+"""
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from app.services.session_models import StorySession
+
+GENRES = ["fantasy", "sf", "mystery", "horror", "romance"]
+PARAGRAPH = "어두운 숲 속에서 낯선 빛이 깜빡였다. 당신은 조심스럽게 발걸음을 옮기며 주위를 살핀다. " * 6
+
+
+def make_texts(sessions: int, turns: int) -> List[List[str]]:
+    """세션마다 서로 다른 스토리 본문 (오프닝 + 턴별 응답)"""
+    return [[f"[{s}:{t}] {PARAGRAPH}" for t in range(turns + 1)] for s in range(sessions)]
+
+
+def build_dicts(texts: List[List[str]]) -> List[Dict[str, Any]]:
+    sessions = []
+    for index, story in enumerate(texts):
+        context = {
+            "genre": GENRES[index % len(GENRES)],
+            "model": "openai-gpt3.5",
+            "story_history": [{"type": "story", "content": story[0]}],
+            "turn": 1,
+        }
+        for turn, text in enumerate(story[1:]):
+            action_text = f"{turn % 3 + 1}번 선택"
+            context["story_history"].append({"type": "choice", "content": f"플레이어 선택: {action_text}"})
+            context["story_history"].append({"type": "story", "content": text})
+            context["turn"] += 1
+        sessions.append(context)
+    return sessions
+
+
+def build_sessions(texts: List[List[str]]) -> List[StorySession]:
+    sessions = []
+    for index, story in enumerate(texts):
+        session = StorySession(GENRES[index % len(GENRES)], "openai-gpt3.5", opening=story[0])
+        for turn, text in enumerate(story[1:]):
+            session.add_turn(f"{turn % 3 + 1}번 선택", text)
+        sessions.append(session)
+    return sessions
+
+
+def measure(build: Callable[[List[List[str]]], list], texts: List[List[str]]):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = build(texts)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return sessions, (after - before) / len(texts)
+
+
+def time_serialization(sessions: list, dumps: Callable[[Any], str], loads: Callable[[str], Any]):
+    started = time.perf_counter()
+    payloads = [dumps(session) for session in sessions]
+    dumped = time.perf_counter() - started
+    started = time.perf_counter()
+    for payload in payloads:
+        loads(payload)
+    loaded = time.perf_counter() - started
+    size = sum(len(payload.encode("utf-8")) for payload in payloads) / len(payloads)
+    return size, dumped / len(payloads) * 1e6, loaded / len(payloads) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="스토리 세션 표현 방식별 메모리 비교")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = make_texts(args.sessions, args.turns)
+    text_bytes = sum(len(text.encode("utf-8")) for text in texts[0])
+
+    dict_sessions, dict_bytes = measure(build_dicts, texts)
+    dict_serialized = time_serialization(
+        dict_sessions, lambda s: json.dumps(s, ensure_ascii=False), json.loads
+    )
+    del dict_sessions
+
+    slot_sessions, slot_bytes = measure(build_sessions, texts)
+    slot_serialized = time_serialization(slot_sessions, StorySession.dumps, StorySession.loads)
+
+    print(f"{args.sessions} sessions x {args.turns} turns (story text ~{text_bytes} UTF-8 bytes/session, shared)")
+    print(f"{'':<14}{'bytes/session':>14}{'serialized':>12}{'dumps us':>10}{'loads us':>10}")
+    for name, size, (serialized, dumps_us, loads_us) in (
+        ("dict", dict_bytes, dict_serialized),
+        ("StorySession", slot_bytes, slot_serialized),
+    ):
+        print(f"{name:<14}{size:>14.0f}{serialized:>12.0f}{dumps_us:>10.1f}{loads_us:>10.1f}")
+    print(f"overhead reduction: {(1 - slot_bytes / dict_bytes) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
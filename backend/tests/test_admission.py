@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, AdmissionController, Overloaded
+
+
+async def _hold(controller, priority, entered, release):
+    async with controller.slot(priority):
+        entered.append(priority)
+        await release.wait()
+
+
+def test_free_slot_is_admitted_without_queueing():
+    controller = AdmissionController("test", max_concurrency=2)
+
+    async def run():
+        async with controller.slot():
+            assert controller.active == 1
+
+    asyncio.run(run())
+    assert controller.active == 0
+    assert controller.admitted == 1 and controller.queued == 0
+
+
+def test_full_queue_rejects_same_priority_immediately():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1)
+
+    async def run():
+        entered, release = [], asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, PRIORITY_INTERACTIVE, entered, release))
+        waiter = asyncio.create_task(_hold(controller, PRIORITY_INTERACTIVE, entered, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded):
+            async with controller.slot(PRIORITY_INTERACTIVE):
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+
+    asyncio.run(run())
+    assert controller.rejected == 1
+    assert controller.admitted == 2
+
+
+def test_interactive_request_evicts_background_waiter():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1)
+
+    async def run():
+        entered, release = [], asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, PRIORITY_INTERACTIVE, entered, release))
+        await asyncio.sleep(0)
+        background = asyncio.create_task(_hold(controller, PRIORITY_BACKGROUND, entered, release))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(_hold(controller, PRIORITY_INTERACTIVE, entered, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded):
+            await background
+        release.set()
+        await asyncio.gather(holder, interactive)
+        return entered
+
+    assert asyncio.run(run()) == [PRIORITY_INTERACTIVE, PRIORITY_INTERACTIVE]
+    assert controller.evicted == 1
+    assert controller.active == 0 and controller.stats()["waiting"] == 0
+
+
+def test_waiters_are_released_in_priority_order():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4)
+
+    async def run():
+        entered, release = [], asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, PRIORITY_INTERACTIVE, entered, release))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(_hold(controller, priority, entered, release)) for priority in (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE)]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        return entered
+
+    assert asyncio.run(run()) == [PRIORITY_INTERACTIVE, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND]
+
+
+def test_waiter_fails_fast_after_max_wait():
+    controller = AdmissionController("test", max_concurrency=1, max_wait=0.02)
+
+    async def run():
+        entered, release = [], asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, PRIORITY_INTERACTIVE, entered, release))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            async with controller.slot():
+                pass
+        release.set()
+        await holder
+
+    asyncio.run(run())
+    assert controller.timed_out == 1
+    assert controller.active == 0 and controller.stats()["waiting"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    controller = AdmissionController("test", max_concurrency=1)
+
+    async def run():
+        entered, release = [], asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, PRIORITY_INTERACTIVE, entered, release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(_hold(controller, PRIORITY_INTERACTIVE, entered, release))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert controller.stats()["waiting"] == 0
+        release.set()
+        await holder
+
+    asyncio.run(run())
+    assert controller.active == 0 and controller.admitted == 1
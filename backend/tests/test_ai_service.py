@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionRegistry
+from app.services.ai_service import AIService
+from app.services.resilience import CircuitOpen, Deadline, DeadlineExceeded, Resilience
+from app.services.single_flight import SingleFlight
+
+
+class _Service(AIService):
+    def __init__(self, resilience):
+        super().__init__(flights=SingleFlight(), admission=AdmissionRegistry(), resilience=resilience)
+
+    async def _stream_openai(self, messages, model, usage=None, max_tokens=1000):
+        await asyncio.sleep(1)
+        yield "늦은 응답"
+
+
+def _stream(service, deadline=5.0):
+    async def run():
+        return [chunk async for chunk in service.stream_chat("안녕", model="openai-gpt3.5", hedge=False, deadline=Deadline(deadline))]
+
+    return asyncio.run(run())
+
+
+def test_open_circuit_is_raised_not_yielded_as_text():
+    resilience = Resilience(failure_threshold=1, recovery_time=60)
+    resilience.breaker("openai-gpt3.5").record_failure()
+
+    with pytest.raises(CircuitOpen):
+        _stream(_Service(resilience))
+
+
+def test_deadline_is_raised_not_yielded_as_text():
+    with pytest.raises(DeadlineExceeded):
+        _stream(_Service(Resilience(attempts=1)), deadline=0.02)
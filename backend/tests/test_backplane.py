@@ -0,0 +1,67 @@
+import asyncio
+
+from app.services.backplane import InProcessBackplane, SQLiteBackplane
+from app.services.websocket_manager import ConnectionManager
+
+
+def test_sqlite_update_room_does_not_lose_concurrent_updates(tmp_path):
+    path = str(tmp_path / "ws_backplane.db")
+
+    async def run():
+        # 워커 두 개가 같은 파일을 공유
+        workers = [SQLiteBackplane(path), SQLiteBackplane(path)]
+
+        def create(update):
+            update.room = {"count": 0}
+            update.save()
+
+        def increment(update):
+            update.room["count"] += 1
+            update.save()
+
+        await workers[0].update_room("ROOM", create)
+        await asyncio.gather(*[workers[i % 2].update_room("ROOM", increment) for i in range(40)])
+        room = await workers[1].get_room("ROOM")
+        for worker in workers:
+            await worker.stop()
+        return room
+
+    assert asyncio.run(run())["count"] == 40
+
+
+def test_join_and_leave_room_through_sqlite_backplane(tmp_path):
+    path = str(tmp_path / "ws_backplane.db")
+
+    async def run():
+        first = ConnectionManager(backplane=SQLiteBackplane(path))
+        second = ConnectionManager(backplane=SQLiteBackplane(path))
+        room_id = await first.create_room("host", "호스트", {"genre": "fantasy", "model": "openai-gpt3.5"})
+        results = await asyncio.gather(
+            first.join_room("p1", "하나", room_id),
+            second.join_room("p2", "둘", room_id),
+        )
+        info = await second.get_room_info(room_id)
+        mapped = await first.get_player_room("p2")
+        event = await second.leave_room("host", room_id)
+        after = await first.get_room_info(room_id)
+        for manager in (first, second):
+            await manager.backplane.stop()
+        return room_id, results, info, mapped, event, after
+
+    room_id, results, info, mapped, event, after = asyncio.run(run())
+    assert all(result["success"] for result in results)
+    assert set(info["players"]) == {"host", "p1", "p2"}
+    assert info["seq"] == 2
+    assert mapped == room_id
+    assert event["type"] == "player_left" and event["seq"] == 3
+    assert after["host"] in ("p1", "p2") and "host" not in after["players"]
+
+
+def test_leaving_last_player_deletes_room():
+    async def run():
+        manager = ConnectionManager(backplane=InProcessBackplane())
+        room_id = await manager.create_room("host", "호스트", {"genre": "fantasy", "model": "openai-gpt3.5"})
+        event = await manager.leave_room("host", room_id)
+        return event, await manager.get_rooms(), await manager.get_player_room("host")
+
+    assert asyncio.run(run()) == (None, {}, None)
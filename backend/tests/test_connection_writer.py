@@ -0,0 +1,63 @@
+import asyncio
+
+from app.services.connection_writer import ConnectionWriter
+
+
+class _Socket:
+    def __init__(self, delay: float = 0.0, error: bool = False):
+        self.delay = delay
+        self.error = error
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise RuntimeError("broken pipe")
+        self.sent.append(text)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+def _run_until_failure(socket: _Socket, **kwargs):
+    failures = []
+
+    async def run():
+        writer = ConnectionWriter("p1", socket, on_failure=lambda w, reason: failures.append(reason), **kwargs)
+        writer.start()
+        writer.send('{"type": "turn_submitted"}', "turn_submitted")
+        await asyncio.sleep(0.1)
+        return writer
+
+    writer = asyncio.run(run())
+    return writer, failures
+
+
+def test_send_timeout_closes_socket():
+    socket = _Socket(delay=1.0)
+    writer, failures = _run_until_failure(socket, send_timeout=0.01)
+    assert failures == ["timeout"]
+    assert writer.closed and socket.closed_with == 1013
+
+
+def test_send_error_closes_socket():
+    socket = _Socket(error=True)
+    writer, failures = _run_until_failure(socket)
+    assert failures == ["error"]
+    assert socket.closed_with == 1013
+
+
+def test_full_queue_coalesces_snapshots():
+    async def run():
+        socket = _Socket()
+        writer = ConnectionWriter("p1", socket, max_queue=2)
+        # writer 태스크를 시작하지 않아 큐가 비워지지 않음
+        writer.send("a", "room_info")
+        writer.send("b", "turn_submitted")
+        assert writer.send("c", "room_info")
+        return writer
+
+    writer = asyncio.run(run())
+    assert [item.frame for item in writer._queue] == ["b", "c"]
+    assert writer.coalesced == 1 and not writer.closed
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from app.services.provider_registry import ProviderPool
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_pool_client_counts_requests_and_reuses_connection():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    async def run():
+        pool = ProviderPool("test", httpx.Limits(max_connections=4), httpx.Timeout(5), base_url=base_url)
+        try:
+            first = await pool.client.get("/")
+            second = await pool.client.get("/")
+        finally:
+            await pool.aclose()
+        return pool, first, second
+
+    try:
+        pool, first, second = asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert first.status_code == 200 and first.text == "ok"
+    assert second.status_code == 200
+    stats = pool.stats()
+    assert stats["requests"] == 2
+    # 두 번째 요청은 keep-alive 커넥션을 재사용
+    assert stats["new_connections"] == 1
+    assert stats["reuse_ratio"] == 0.5
@@ -0,0 +1,179 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.resilience import CircuitBreaker, CircuitOpen, Deadline, DeadlineExceeded, Resilience
+
+
+def _collect(resilience, factory, deadline=10.0, pause=0.0):
+    async def run():
+        chunks = []
+        async for chunk in resilience.stream("openai-gpt3.5", Deadline(deadline), factory):
+            chunks.append(chunk)
+            if pause:
+                await asyncio.sleep(pause)
+        return chunks
+
+    return asyncio.run(run())
+
+
+def test_stream_idle_timeout_raises_deadline_exceeded():
+    resilience = Resilience(stream_idle_timeout=0.02)
+
+    async def stalls():
+        yield "a"
+        await asyncio.sleep(1)
+        yield "b"
+
+    with pytest.raises(DeadlineExceeded):
+        _collect(resilience, stalls)
+    assert resilience.deadline_exceeded == 1
+
+
+def test_stream_idle_timeout_ignores_time_spent_by_caller():
+    resilience = Resilience(stream_idle_timeout=0.02)
+
+    async def quick():
+        for chunk in "abc":
+            yield chunk
+
+    assert _collect(resilience, quick, pause=0.05) == ["a", "b", "c"]
+    assert resilience.deadline_exceeded == 0
+
+
+def test_first_chunk_is_bounded_by_deadline_not_idle_timeout():
+    resilience = Resilience(stream_idle_timeout=0.02)
+
+    async def slow_start():
+        await asyncio.sleep(0.1)
+        yield "a"
+
+    assert _collect(resilience, slow_start) == ["a"]
+
+    with pytest.raises(DeadlineExceeded):
+        _collect(Resilience(attempts=1), slow_start, deadline=0.02)
+
+
+def test_stream_retries_failure_before_first_chunk():
+    resilience = Resilience(attempts=3, base_delay=0.0)
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise httpx.ConnectError("connection refused")
+        yield "ok"
+
+    assert _collect(resilience, flaky) == ["ok"]
+    assert resilience.retries == 1
+    assert resilience.breaker("openai-gpt3.5").state == "closed"
+
+
+def _recovered(breaker):
+    # recovery_time을 기다리는 대신 열린 시각을 과거로 옮김
+    breaker.opened_at -= breaker.recovery_time + 1
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_time=30)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpen) as raised:
+        breaker.before_call()
+    assert 0 < raised.value.retry_after <= 30
+    assert breaker.times_opened == 1 and breaker.short_circuited == 1
+
+
+def test_success_resets_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_allows_one_probe_and_closes_on_success():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_time=30)
+    breaker.record_failure()
+    _recovered(breaker)
+
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_half_open_failure_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_time=30)
+    for _ in range(3):
+        breaker.record_failure()
+    _recovered(breaker)
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_ignored_probe_returns_the_slot():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_time=30)
+    breaker.record_failure()
+    _recovered(breaker)
+
+    breaker.before_call()
+    breaker.record_ignored()
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+def test_call_retries_retryable_errors():
+    resilience = Resilience(attempts=3, base_delay=0.0)
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise httpx.ConnectError("connection refused")
+        return "ok"
+
+    assert asyncio.run(resilience.call("openai-gpt3.5", Deadline(5), flaky)) == "ok"
+    assert resilience.retries == 2
+    assert resilience.breaker("openai-gpt3.5").consecutive_failures == 0
+
+
+def test_call_does_not_retry_other_errors():
+    resilience = Resilience(attempts=3, base_delay=0.0)
+    calls = []
+
+    async def broken():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(resilience.call("openai-gpt3.5", Deadline(5), broken))
+    assert len(calls) == 1
+    assert resilience.breaker("openai-gpt3.5").failures == 0
+
+
+def test_call_past_deadline_raises_deadline_exceeded():
+    resilience = Resilience()
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(resilience.call("openai-gpt3.5", Deadline(0.02), slow))
+    assert resilience.deadline_exceeded == 1
+    assert resilience.breaker("openai-gpt3.5").failures == 1
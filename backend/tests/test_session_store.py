@@ -0,0 +1,77 @@
+import asyncio
+
+from app.services.session_db import SQLiteSessionBackend
+from app.services.session_store import SessionStore
+
+
+def test_write_behind_coalesces_saves_into_one_row(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    store = SessionStore("test", backend=backend)
+
+    async def run():
+        for turn in range(3):
+            store.save("s1", {"turn": turn})
+        # flush 전에는 대기열에서 최신 상태를 읽음
+        assert backend.load("test", "s1")[0] == {"turn": 2}
+        assert backend.updated_at("test", "s1") is None
+        await backend.flush()
+        await backend.stop()
+
+    asyncio.run(run())
+    assert backend.flushes == 1 and backend.rows_written == 1
+
+    reopened = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    assert reopened.load("test", "s1")[0] == {"turn": 2}
+    asyncio.run(reopened.stop())
+
+
+def test_delete_is_written_behind(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    store = SessionStore("test", backend=backend)
+
+    async def run():
+        store.save("s1", {"turn": 1})
+        await backend.flush()
+        store.pop("s1")
+        assert backend.load("test", "s1") is None
+        await backend.flush()
+        assert backend.updated_at("test", "s1") is None
+        await backend.stop()
+
+    asyncio.run(run())
+
+
+def test_other_worker_loads_and_revalidates_session(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first_backend, second_backend = SQLiteSessionBackend(path), SQLiteSessionBackend(path)
+    first = SessionStore("test", backend=first_backend, revalidate_interval=0.0)
+    second = SessionStore("test", backend=second_backend, revalidate_interval=0.0)
+
+    async def run():
+        first.save("s1", {"turn": 1})
+        # 아직 커밋되지 않은 세션은 다른 워커에서 보이지 않음
+        assert await second.aget("s1") is None
+        await first_backend.flush()
+        assert await second.aget("s1") == {"turn": 1}
+
+        second.save("s1", {"turn": 2})
+        # 자기 워커의 대기 중인 변경이 있으면 다시 읽지 않음
+        assert await second.aget("s1") == {"turn": 2}
+        await second_backend.flush()
+        assert await first.aget("s1") == {"turn": 2}
+        await first_backend.stop()
+        await second_backend.stop()
+
+    asyncio.run(run())
+    assert first.reloads == 1 and second.loads == 1
+
+
+def test_memory_budget_evicts_least_recently_used():
+    store = SessionStore("test", max_bytes=50)
+    store["old"] = {"text": "a" * 10}
+    store["new"] = {"text": "b" * 10}
+    assert "old" in store
+    store.get("old")
+    store["newest"] = {"text": "c" * 10}
+    assert "new" not in store and "old" in store and "newest" in store
+    assert store.evictions["memory"] == 1
@@ -0,0 +1,47 @@
+import asyncio
+
+from app.services.admission import AdmissionRegistry
+from app.services.ai_service import record_usage
+from app.services.resilience import Resilience
+from app.services.simple_ai_service import SimpleAIService
+from app.services.single_flight import SingleFlight
+
+
+class _Providers:
+    openai_key = "test"
+
+
+class _Service(SimpleAIService):
+    def __init__(self):
+        super().__init__(providers=_Providers(), flights=SingleFlight(), admission=AdmissionRegistry(), resilience=Resilience())
+        self.calls = 0
+
+    async def _call_openai(self, messages, model, usage=None):
+        self.calls += 1
+        reply = f"reply {self.calls}"
+        await asyncio.sleep(0.01)
+        record_usage(usage, input_tokens=10, output_tokens=5)
+        return reply
+
+
+def test_generative_calls_are_not_coalesced_by_default():
+    service = _Service()
+
+    async def run():
+        return await asyncio.gather(*[service.generate_response("오프닝") for _ in range(2)])
+
+    assert sorted(asyncio.run(run())) == ["reply 1", "reply 2"]
+    assert service.calls == 2
+
+
+def test_coalesced_followers_get_their_own_usage():
+    service = _Service()
+    usages = [{}, {}]
+
+    async def run():
+        return await asyncio.gather(*[service.generate_response("질문", usage=usage, coalesce=True) for usage in usages])
+
+    assert asyncio.run(run()) == ["reply 1", "reply 1"]
+    assert service.calls == 1
+    for usage in usages:
+        assert usage["input_tokens"] == 10 and usage["output_tokens"] == 5
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+class _Upstream:
+    """청크를 하나씩 내보내고, 호출 횟수와 닫힘 여부를 기록하는 가짜 업스트림"""
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.calls = 0
+        self.closed = False
+        self.gate = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            yield self.chunks[0]
+            await self.gate.wait()
+            for chunk in self.chunks[1:]:
+                yield chunk
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.closed = True
+
+
+async def _read(stream, into):
+    async for chunk in stream:
+        into.append(chunk)
+
+
+def test_concurrent_subscribers_share_one_upstream():
+    flights = SingleFlight()
+
+    async def run():
+        upstream = _Upstream(["a", "b", "c"])
+        first, second = [], []
+        readers = [asyncio.create_task(_read(flights.stream("key", upstream), into)) for into in (first, second)]
+        await asyncio.sleep(0.01)
+        upstream.gate.set()
+        await asyncio.gather(*readers)
+        return upstream, first, second
+
+    upstream, first, second = asyncio.run(run())
+    assert first == second == ["a", "b", "c"]
+    assert upstream.calls == 1
+    assert flights.stats()["in_flight_streams"] == 0
+
+
+def test_late_join_replays_chunks_received_so_far():
+    flights = SingleFlight()
+
+    async def run():
+        upstream = _Upstream(["a", "b"])
+        first, late = [], []
+        reader = asyncio.create_task(_read(flights.stream("key", upstream), first))
+        await asyncio.sleep(0.01)
+        assert first == ["a"]
+        joiner = asyncio.create_task(_read(flights.stream("key", upstream), late))
+        await asyncio.sleep(0.01)
+        assert late == ["a"]
+        upstream.gate.set()
+        await asyncio.gather(reader, joiner)
+        return upstream, first, late
+
+    upstream, first, late = asyncio.run(run())
+    assert first == late == ["a", "b"]
+    assert upstream.calls == 1
+    assert flights.late_joins == 1
+
+
+def test_upstream_error_reaches_every_subscriber():
+    flights = SingleFlight()
+
+    async def run():
+        upstream = _Upstream(["a"], error=RuntimeError("boom"))
+        readers = [asyncio.create_task(_read(flights.stream("key", upstream), [])) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        upstream.gate.set()
+        return await asyncio.gather(*readers, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_last_subscriber_leaving_cancels_upstream():
+    flights = SingleFlight()
+
+    async def run():
+        upstream = _Upstream(["a", "b"])
+        first = flights.stream("key", upstream)
+        second = flights.stream("key", upstream)
+        assert await first.__anext__() == "a"
+        assert await second.__anext__() == "a"
+
+        await first.aclose()
+        await asyncio.sleep(0.01)
+        # 아직 읽는 구독자가 남아 있으면 계속 생성
+        assert not upstream.closed
+
+        await second.aclose()
+        await asyncio.sleep(0.01)
+        return upstream
+
+    upstream = asyncio.run(run())
+    assert upstream.closed
+    assert flights.stats()["in_flight_streams"] == 0
+
+
+def test_sole_subscriber_output_reports_generated_text():
+    flights = SingleFlight()
+
+    async def run():
+        upstream = _Upstream(["a", "b"])
+        stream = flights.stream("key", upstream)
+        await stream.__anext__()
+        output = flights.sole_subscriber_output("key")
+        joined = flights.stream("key", upstream)
+        await joined.__anext__()
+        shared = flights.sole_subscriber_output("key")
+        await stream.aclose()
+        await joined.aclose()
+        return output, shared
+
+    assert asyncio.run(run()) == ("a", None)
+
+
+def test_calls_share_result_and_survive_one_caller_cancelling():
+    flights = SingleFlight()
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def run():
+        cancelled = asyncio.create_task(flights.call("key", factory))
+        kept = asyncio.create_task(flights.call("key", factory))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await kept
+
+    assert asyncio.run(run()) == "result"
+    assert len(calls) == 1
+    assert flights.coalesced_calls == 1
@@ -0,0 +1,187 @@
+import asyncio
+import json
+
+import pytest
+
+from app.routers.sse import SSEEncoder, SSEReplayRegistry
+
+
+async def _events(items, pause=0.0):
+    for item in items:
+        if pause:
+            await asyncio.sleep(pause)
+        yield item
+
+
+def _payloads(frames):
+    return [json.loads(frame[len("data: "):]) for frame in frames]
+
+
+def _encode(encoder, events):
+    async def run():
+        return [frame async for frame in encoder.encode(events, "test")]
+
+    return _payloads(asyncio.run(run()))
+
+
+def test_first_chunk_is_sent_immediately_and_rest_are_merged():
+    encoder = SSEEncoder(flush_interval=10.0, flush_bytes=1024)
+    payloads = _encode(encoder, _events([{"chunk": "a"}, {"chunk": "b"}, {"chunk": "c"}, {"done": True}]))
+    assert payloads == [{"chunk": "a"}, {"chunk": "bc"}, {"done": True}]
+
+
+def test_buffer_is_flushed_after_interval_without_new_events():
+    encoder = SSEEncoder(flush_interval=0.01, flush_bytes=1024)
+
+    async def slow():
+        yield {"chunk": "a"}
+        yield {"chunk": "b"}
+        await asyncio.sleep(0.1)
+        yield {"chunk": "c"}
+
+    async def run():
+        frames = encoder.encode(slow(), "test")
+        seen = []
+        async for frame in frames:
+            seen.append(frame)
+            if len(seen) == 2:
+                # "b"는 "c"가 오기 전에 타이머로 먼저 전송되어야 함
+                assert json.loads(frame[len("data: "):]) == {"chunk": "b"}
+        return seen
+
+    assert _payloads(asyncio.run(run())) == [{"chunk": "a"}, {"chunk": "b"}, {"chunk": "c"}]
+
+
+def test_flush_bytes_and_changed_keys_split_frames():
+    encoder = SSEEncoder(flush_interval=10.0, flush_bytes=4)
+    events = [{"chunk": "x"}, {"chunk": "ab"}, {"chunk": "cd"}, {"chunk": "e", "turn": 2}, {"chunk": "f"}]
+    assert _encode(encoder, _events(events)) == [
+        {"chunk": "x"}, {"chunk": "abcd"}, {"chunk": "e", "turn": 2}, {"chunk": "f"},
+    ]
+
+
+def test_upstream_error_is_raised_after_buffered_chunks():
+    encoder = SSEEncoder(flush_interval=10.0, flush_bytes=1024)
+
+    async def failing():
+        yield {"chunk": "a"}
+        yield {"chunk": "b"}
+        raise RuntimeError("boom")
+
+    async def run():
+        seen = []
+        with pytest.raises(RuntimeError):
+            async for frame in encoder.encode(failing(), "test"):
+                seen.append(frame)
+        return seen
+
+    assert _payloads(asyncio.run(run())) == [{"chunk": "a"}, {"chunk": "b"}]
+
+
+def test_closing_the_encoder_closes_upstream():
+    encoder = SSEEncoder(flush_interval=10.0, flush_bytes=1024)
+    state = {"closed": False}
+
+    async def endless():
+        try:
+            while True:
+                yield {"chunk": "a"}
+                await asyncio.sleep(0)
+        finally:
+            state["closed"] = True
+
+    async def run():
+        frames = encoder.encode(endless(), "test")
+        await frames.__anext__()
+        await frames.aclose()
+
+    asyncio.run(run())
+    assert state["closed"]
+
+
+async def _frames(count, gate=None):
+    for index in range(count):
+        if gate is not None and index == count - 1:
+            await gate.wait()
+        yield f"data: {index}\n\n"
+
+
+def _ids(frames):
+    return [frame.split("\n", 1)[0] for frame in frames]
+
+
+def test_resume_replays_frames_after_last_event_id():
+    registry = SSEReplayRegistry()
+
+    async def run():
+        buffer = registry.start(_frames(3), "chat")
+        first = [frame async for frame in registry.subscribe(buffer, 0)]
+        resumed = [frame async for frame in registry.resume(f"{buffer.stream_id}:1", "chat")]
+        return buffer, first, resumed
+
+    buffer, first, resumed = asyncio.run(run())
+    assert _ids(first) == [f"id: {buffer.stream_id}:{seq}" for seq in (1, 2, 3)]
+    assert resumed == first[1:]
+    assert registry.resumed["replay"] == 1
+
+
+def test_resume_follows_a_live_stream():
+    registry = SSEReplayRegistry()
+
+    async def run():
+        gate = asyncio.Event()
+        buffer = registry.start(_frames(3, gate), "chat")
+        await asyncio.sleep(0.01)
+        resumed = registry.resume(f"{buffer.stream_id}:1", "chat")
+        assert registry.resumed["live"] == 1
+        reader = asyncio.ensure_future(_collect(resumed))
+        await asyncio.sleep(0.01)
+        gate.set()
+        return await reader
+
+    assert [frame.split("\n", 1)[1] for frame in asyncio.run(run())] == ["data: 1\n\n", "data: 2\n\n"]
+
+
+async def _collect(frames):
+    return [frame async for frame in frames]
+
+
+def test_unknown_or_mismatched_id_is_expired():
+    registry = SSEReplayRegistry()
+
+    async def run():
+        buffer = registry.start(_frames(1), "chat")
+        await asyncio.sleep(0.01)
+        return registry.resume(f"{buffer.stream_id}:1", "story.continue"), registry.resume("missing:1", "chat")
+
+    assert asyncio.run(run()) == (None, None)
+    assert registry.resumed["expired"] == 2
+
+
+def test_evicted_frames_report_resume_failed():
+    registry = SSEReplayRegistry(max_events=2)
+
+    async def run():
+        buffer = registry.start(_frames(4), "chat")
+        await asyncio.sleep(0.01)
+        return [frame async for frame in registry.resume(f"{buffer.stream_id}:0", "chat")]
+
+    frames = asyncio.run(run())
+    assert len(frames) == 1 and '"resume_failed": true' in frames[0]
+
+
+def test_abandoned_stream_is_cancelled_after_grace():
+    registry = SSEReplayRegistry(grace=0.01)
+
+    async def run():
+        gate = asyncio.Event()
+        buffer = registry.start(_frames(3, gate), "chat")
+        follower = registry.subscribe(buffer, 0)
+        await follower.__anext__()
+        await follower.aclose()
+        await asyncio.sleep(0.05)
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert buffer.done and registry.cancelled == 1
+    assert '"truncated": true' in buffer.frames[-1][1]
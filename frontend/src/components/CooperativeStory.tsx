@@ -17,8 +17,20 @@ interface StoryTurn {
   player: string;
   text: string;
   timestamp: number;
+  seq?: number;
 }
 
+// 서버가 seq를 붙여 보내는 방 이벤트 (바뀐 필드 changes와 추가된 턴 turn만 포함)
+const ROOM_EVENT_TYPES = [
+  'player_joined',
+  'player_left',
+  'player_disconnected',
+  'game_started',
+  'turn_submitted',
+  'ai_turn_completed',
+  'turn_skipped'
+];
+
 const CooperativeStory: React.FC<CooperativeStoryProps> = ({ onBack, darkMode }) => {
   const [gameState, setGameState] = useState<'setup' | 'waiting' | 'playing'>('setup');
   const [roomId, setRoomId] = useState('');
@@ -34,6 +46,9 @@ const CooperativeStory: React.FC<CooperativeStoryProps> = ({ onBack, darkMode })
   const [isConnected, setIsConnected] = useState(false);
   const websocket = useRef<WebSocket | null>(null);
   const playerIdRef = useRef<string>('');
+  // 마지막으로 적용한 방 이벤트 seq (공백이 생기면 sync_room으로 스냅샷 요청)
+  const lastSeqRef = useRef(0);
+  const syncingRef = useRef(false);
 
   const genres = [
     { id: 'fantasy', name: '판타지', desc: '마법과 모험이 가득한 세계' },
@@ -64,6 +79,77 @@ const CooperativeStory: React.FC<CooperativeStoryProps> = ({ onBack, darkMode })
     }
   }, [gameState, isMyTurn, turnTimeLeft]);
 
+  const toPlayers = (playersInfo: Record<string, any>): Player[] =>
+    Object.entries(playersInfo).map(([id, player]) => ({
+      id,
+      name: player.name,
+      isHost: player.is_host,
+      isOnline: player.is_online
+    }));
+
+  const applyRoomInfo = (info: any) => {
+    setPlayers(toPlayers(info.players));
+    if (info.game_state === 'playing') setGameState('playing');
+    setCurrentTurn(info.current_turn);
+    setIsMyTurn(info.current_turn === playerIdRef.current);
+  };
+
+  const applyChanges = (changes: any) => {
+    if (!changes) return;
+    if (changes.players) setPlayers(toPlayers(changes.players));
+    if (changes.game_state === 'playing') setGameState('playing');
+    if ('current_turn' in changes) {
+      setCurrentTurn(changes.current_turn);
+      setIsMyTurn(changes.current_turn === playerIdRef.current);
+    }
+  };
+
+  const resetSeq = (seq: number) => {
+    lastSeqRef.current = seq;
+    syncingRef.current = false;
+  };
+
+  const requestSync = () => {
+    if (syncingRef.current) return;
+    syncingRef.current = true;
+    websocket.current?.send(JSON.stringify({
+      type: 'sync_room',
+      since: lastSeqRef.current
+    }));
+  };
+
+  // seq가 붙은 방 이벤트와 스냅샷 처리 (처리했으면 true)
+  const handleRoomEvent = (message: any): boolean => {
+    if (message.type === 'room_snapshot') {
+      resetSeq(message.seq);
+      applyRoomInfo(message.room_info);
+      // since까지는 가지고 있던 턴, 그 이후는 스냅샷의 턴으로 교체
+      setStoryContent(prev => [
+        ...prev.filter(turn => (turn.seq ?? 0) <= message.since),
+        ...message.story_content
+      ]);
+      return true;
+    }
+
+    if (!ROOM_EVENT_TYPES.includes(message.type) || typeof message.seq !== 'number') return false;
+
+    // 이미 적용한 이벤트
+    if (message.seq <= lastSeqRef.current) return true;
+
+    // 중간 이벤트를 놓쳤으면 마지막 seq 이후 스냅샷을 받을 때까지 적용하지 않음
+    if (message.seq > lastSeqRef.current + 1) {
+      requestSync();
+      return true;
+    }
+
+    lastSeqRef.current = message.seq;
+    applyChanges(message.changes);
+    if (message.turn) {
+      setStoryContent(prev => message.type === 'game_started' ? [message.turn] : [...prev, message.turn]);
+    }
+    return true;
+  };
+
   const createRoom = () => {
     if (!playerName.trim()) return;
     
@@ -93,45 +179,19 @@ const CooperativeStory: React.FC<CooperativeStoryProps> = ({ onBack, darkMode })
       const message = JSON.parse(event.data);
       console.log('WebSocket 메시지:', message);
       
+      if (handleRoomEvent(message)) return;
+      
       if (message.type === 'room_created') {
         setRoomId(message.room_id);
-        const playerData = Object.entries(message.room_info.players).map(([id, player]) => ({
-          id,
-          name: player.name,
-          isHost: player.is_host,
-          isOnline: player.is_online
-        }));
-        setPlayers(playerData);
+        resetSeq(message.room_info.seq ?? 0);
+        setPlayers(toPlayers(message.room_info.players));
         setGameState('waiting');
       } else if (message.type === 'room_joined') {
-        const playerData = Object.entries(message.room_info.players).map(([id, player]) => ({
-          id,
-          name: player.name,
-          isHost: player.is_host,
-          isOnline: player.is_online
-        }));
-        setPlayers(playerData);
-      } else if (message.type === 'player_joined') {
-        const playerData = Object.entries(message.room_info.players).map(([id, player]) => ({
-          id,
-          name: player.name,
-          isHost: player.is_host,
-          isOnline: player.is_online
-        }));
-        setPlayers(playerData);
-      } else if (message.type === 'game_started') {
-        setGameState('playing');
-        setStoryContent(message.story_content);
-        setCurrentTurn(message.room_info.current_turn);
-        setIsMyTurn(message.room_info.current_turn === playerIdRef.current);
-      } else if (message.type === 'turn_submitted') {
-        setStoryContent(message.story_content);
-        setCurrentTurn(message.room_info.current_turn);
-        setIsMyTurn(message.room_info.current_turn === playerIdRef.current);
-      } else if (message.type === 'ai_turn_completed') {
-        setStoryContent(message.story_content);
-        setCurrentTurn(message.room_info.current_turn);
-        setIsMyTurn(message.room_info.current_turn === playerIdRef.current);
+        resetSeq(message.room_info.seq ?? 0);
+        setPlayers(toPlayers(message.room_info.players));
+      } else if (message.type === 'error') {
+        // 오프닝 생성 실패 등: 방은 대기실 상태로 유지
+        alert(`오류: ${message.message}`);
       }
     };
 
@@ -171,36 +231,12 @@ const CooperativeStory: React.FC<CooperativeStoryProps> = ({ onBack, darkMode })
       const message = JSON.parse(event.data);
       console.log('WebSocket 메시지 (참가자):', message);
       
+      if (handleRoomEvent(message)) return;
+      
       if (message.type === 'room_joined') {
-        const playerData = Object.entries(message.room_info.players).map(([id, player]) => ({
-          id,
-          name: player.name,
-          isHost: player.is_host,
-          isOnline: player.is_online
-        }));
-        setPlayers(playerData);
+        resetSeq(message.room_info.seq ?? 0);
+        setPlayers(toPlayers(message.room_info.players));
         setGameState('waiting');
-      } else if (message.type === 'player_joined') {
-        const playerData = Object.entries(message.room_info.players).map(([id, player]) => ({
-          id,
-          name: player.name,
-          isHost: player.is_host,
-          isOnline: player.is_online
-        }));
-        setPlayers(playerData);
-      } else if (message.type === 'game_started') {
-        setGameState('playing');
-        setStoryContent(message.story_content);
-        setCurrentTurn(message.room_info.current_turn);
-        setIsMyTurn(message.room_info.current_turn === playerIdRef.current);
-      } else if (message.type === 'turn_submitted') {
-        setStoryContent(message.story_content);
-        setCurrentTurn(message.room_info.current_turn);
-        setIsMyTurn(message.room_info.current_turn === playerIdRef.current);
-      } else if (message.type === 'ai_turn_completed') {
-        setStoryContent(message.story_content);
-        setCurrentTurn(message.room_info.current_turn);
-        setIsMyTurn(message.room_info.current_turn === playerIdRef.current);
       } else if (message.type === 'error') {
         alert(`오류: ${message.message}`);
         setGameState('setup');